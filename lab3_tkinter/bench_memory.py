@@ -0,0 +1,99 @@
+import argparse
+import gc
+import tracemalloc
+
+from models import Student, Course
+
+
+class LegacyCourse:
+    """Course as previously stored: a plain object with a ``__dict__``."""
+
+    def __init__(self, course_id, course_name):
+        self.course_id = course_id
+        self.course_name = course_name
+
+
+class LegacyStudent:
+    """Student as previously stored: a ``__dict__`` and a list of course objects."""
+
+    def __init__(self, name, age, email, student_id, registered_courses=None):
+        self.name = name
+        self.age = age
+        self.email = email
+        self.student_id = student_id
+        self.registered_courses = registered_courses if registered_courses is not None else []
+
+
+def build_legacy(students, courses, fan_out):
+    """
+    Builds a roster with the previous representation.
+
+    :param students: Number of students.
+    :type students: int
+    :param courses: Number of courses.
+    :type courses: int
+    :param fan_out: Courses each student is registered to.
+    :type fan_out: int
+    """
+    course_list = [LegacyCourse(f"C{i}", f"Course {i}") for i in range(courses)]
+    return course_list, [
+        LegacyStudent(f"Student {i}", 18 + i % 10, f"s{i}@school.edu", f"S{i}",
+                      [course_list[(i + k) % courses] for k in range(fan_out)])
+        for i in range(students)
+    ]
+
+
+def build_compact(students, courses, fan_out):
+    """
+    Builds the same roster with the slotted :mod:`models` records.
+
+    :param students: Number of students.
+    :type students: int
+    :param courses: Number of courses.
+    :type courses: int
+    :param fan_out: Courses each student is registered to.
+    :type fan_out: int
+    """
+    course_list = [Course(f"C{i}", f"Course {i}") for i in range(courses)]
+    return course_list, [
+        Student(f"Student {i}", 18 + i % 10, f"s{i}@school.edu", f"S{i}",
+                [course_list[(i + k) % courses].course_id for k in range(fan_out)])
+        for i in range(students)
+    ]
+
+
+def measure(build, *args):
+    """
+    Returns the bytes still allocated after building a roster.
+
+    :param build: :func:`build_legacy` or :func:`build_compact`.
+    :type build: callable
+    :rtype: int
+    """
+    gc.collect()
+    tracemalloc.start()
+    roster = build(*args)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del roster
+    return size
+
+
+def main(argv=None):
+    """Compares the memory used by both representations and prints a summary."""
+    parser = argparse.ArgumentParser(description="Compare record model memory usage.")
+    parser.add_argument("--students", type=int, default=100000)
+    parser.add_argument("--courses", type=int, default=200)
+    parser.add_argument("--fan-out", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    legacy = measure(build_legacy, args.students, args.courses, args.fan_out)
+    compact = measure(build_compact, args.students, args.courses, args.fan_out)
+    print(f"{args.students} students, {args.courses} courses, {args.fan_out} courses per student")
+    print(f"legacy:  {legacy / 2 ** 20:8.1f} MiB ({legacy / args.students:6.0f} B/student)")
+    print(f"compact: {compact / 2 ** 20:8.1f} MiB ({compact / args.students:6.0f} B/student)")
+    print(f"saving:  {100 * (1 - compact / legacy):8.1f} %")
+
+
+if __name__ == "__main__":
+    main()
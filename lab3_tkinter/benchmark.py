@@ -0,0 +1,543 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from record_view import ListRows
+from registry import RECORD_TYPES
+from service import SchoolService
+
+#: Roster sizes, in students, benchmarked when none are given.
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+#: Average number of courses each student is registered to.
+DEFAULT_FAN_OUT = 4
+
+#: Number of queries timed per search criterion.
+SEARCH_QUERIES = 200
+
+#: Rows rendered when timing the record display, like a Treeview page.
+PAGE_SIZE = 50
+
+#: Courses and students added, and registrations made, one at a time by
+#: :meth:`Benchmark.click_operations`.
+CLICK_OPERATIONS = 200
+
+#: Relative slowdown, in percent, reported as a regression by ``compare``.
+DEFAULT_THRESHOLD = 10.0
+
+#: Durations below this many seconds are too noisy to be flagged as regressions.
+MIN_COMPARED_SECONDS = 0.005
+
+#: Word lists used to generate names.
+FIRST_NAMES = ("Ada", "Alan", "Grace", "Linus", "Barbara", "Dennis", "Frances", "Ken", "Radia", "Guido",
+               "Margaret", "John", "Sophie", "Nadim", "Joseph", "Karen", "Edsger", "Donald", "Hedy", "Tim")
+LAST_NAMES = ("Lovelace", "Turing", "Hopper", "Torvalds", "Liskov", "Ritchie", "Allen", "Thompson",
+              "Perlman", "Rossum", "Hamilton", "McCarthy", "Wilson", "Succar", "Rizk", "Jones",
+              "Dijkstra", "Knuth", "Lamarr", "Berners-Lee")
+SUBJECTS = ("Math", "Physics", "Chemistry", "Biology", "History", "Literature", "Programming",
+            "Databases", "Networks", "Statistics", "Philosophy", "Economics")
+
+
+class Roster:
+    """
+    Synthetic school data, generated up front so it is not part of the timings.
+
+    :ivar courses: ``(course_id, course_name)`` pairs.
+    :ivar students: ``(name, age, email, student_id)`` tuples.
+    :ivar instructors: ``(name, age, email, instructor_id)`` tuples.
+    :ivar registrations: ``(student_id, course_id)`` pairs.
+    :ivar assignments: ``(instructor_id, course_id)`` pairs.
+    """
+
+    def __init__(self):
+        self.courses = []
+        self.students = []
+        self.instructors = []
+        self.registrations = []
+        self.assignments = []
+
+
+def generate_roster(students, courses=None, fan_out=DEFAULT_FAN_OUT, seed=0):
+    """
+    Generates a reproducible roster.
+
+    Course popularity follows a Zipf-like distribution, so a few courses
+    are very large and most are small, and each student takes between
+    ``fan_out - 2`` and ``fan_out + 2`` distinct courses. There is one
+    instructor per two courses.
+
+    :param students: Number of students.
+    :type students: int
+    :param courses: Number of courses; one per 50 students (at least 20) if omitted.
+    :type courses: int
+    :param fan_out: Average number of courses per student.
+    :type fan_out: int
+    :param seed: Seed of the random generator.
+    :type seed: int
+    :rtype: Roster
+    """
+    rng = random.Random(seed)
+    courses = courses or max(20, students // 50)
+    roster = Roster()
+    roster.courses = [(f"C{i}", f"Course {i} {rng.choice(SUBJECTS)}") for i in range(courses)]
+    course_ids = [course_id for course_id, _ in roster.courses]
+    rng.shuffle(course_ids)
+    cum_weights = []
+    total = 0.0
+    for rank in range(courses):
+        total += 1 / (rank + 1) ** 0.8
+        cum_weights.append(total)
+
+    for i in range(students):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}"
+        student_id = f"S{i}"
+        roster.students.append((name, 17 + rng.randrange(10), f"s{i}@school.edu", student_id))
+        count = min(courses, max(1, fan_out + rng.randint(-2, 2)))
+        for course_id in dict.fromkeys(rng.choices(course_ids, cum_weights=cum_weights, k=count)):
+            roster.registrations.append((student_id, course_id))
+
+    for i in range(max(1, courses // 2)):
+        instructor_id = f"I{i}"
+        roster.instructors.append((f"Dr {rng.choice(LAST_NAMES)} {i}", 30 + rng.randrange(35),
+                                   f"i{i}@school.edu", instructor_id))
+        for course_id in (course_ids[2 * i % courses], course_ids[(2 * i + 1) % courses]):
+            roster.assignments.append((instructor_id, course_id))
+    return roster
+
+
+class Result:
+    """
+    Measurement of one operation on one roster size.
+
+    :ivar operation: Operation name, e.g. ``"add_student"``.
+    :ivar size: Number of students in the roster.
+    :ivar count: Number of times the operation ran.
+    :ivar seconds: Total wall-clock time.
+    :ivar peak_bytes: Peak memory allocated by Python during the operation,
+        or ``None`` when memory was not traced.
+    """
+
+    def __init__(self, operation, size, count, seconds, peak_bytes=None):
+        self.operation = operation
+        self.size = size
+        self.count = count
+        self.seconds = seconds
+        self.peak_bytes = peak_bytes
+
+    def to_dict(self):
+        """Returns the result as a JSON-serializable dictionary."""
+        return {
+            "operation": self.operation,
+            "size": self.size,
+            "count": self.count,
+            "seconds": self.seconds,
+            "per_op_us": 1e6 * self.seconds / self.count if self.count else None,
+            "peak_bytes": self.peak_bytes,
+        }
+
+
+class Benchmark:
+    """
+    Times the school data operations on one synthetic roster.
+
+    Every operation goes through :class:`service.SchoolService`, the same
+    code path as the GUI handlers, but without Tk. :meth:`run` executes the
+    operations in dependency order (courses and students must exist before
+    registrations, data must be saved before it is loaded).
+
+    :param roster: The roster to use.
+    :type roster: Roster
+    :param workdir: Directory for the data files written by the benchmark.
+    :type workdir: str
+    :param trace_memory: Whether to record the peak memory of each operation.
+        Tracing slows Python down, so timings are not comparable with
+        untraced runs.
+    :type trace_memory: bool
+    :param sqlite: Whether to run on a :class:`storage.SQLiteStorage` backend.
+    :type sqlite: bool
+    """
+
+    def __init__(self, roster, workdir, trace_memory=False, sqlite=False):
+        self.roster = roster
+        self.workdir = workdir
+        self.trace_memory = trace_memory
+        self.sqlite = sqlite
+        self.size = len(roster.students)
+        self.data_file = os.path.join(workdir, f"bench_{self.size}.ndjson")
+        self.results = []
+        self.service = self._new_service()
+        self.queries = self._queries(random.Random(self.size))
+
+    def _new_service(self):
+        if not self.sqlite:
+            return SchoolService()
+        from storage import SQLiteStorage
+        path = os.path.join(self.workdir, f"bench_{self.size}.db")
+        if os.path.exists(path):
+            os.remove(path)
+        return SchoolService(SQLiteStorage(path))
+
+    def _queries(self, rng):
+        students = self.roster.students
+        courses = self.roster.courses
+        picks = [students[rng.randrange(len(students))] for _ in range(SEARCH_QUERIES)] if students else []
+        return {
+            "Name": [name.split()[rng.randrange(2)][:4].lower() for name, _, _, _ in picks],
+            "ID": [student_id[:max(2, len(student_id) - 2)] for _, _, _, student_id in picks],
+            "Course": [courses[rng.randrange(len(courses))][1].split()[-1][:5] for _ in range(SEARCH_QUERIES)],
+        }
+
+    def measure(self, operation, count, job):
+        """
+        Runs ``job()`` once and records its duration as ``count`` operations.
+
+        :param operation: The operation name.
+        :type operation: str
+        :param count: Number of operations performed by ``job``.
+        :type count: int
+        :param job: Callable performing the operations.
+        :type job: callable
+        :return: The value returned by ``job``.
+        """
+        gc.collect()
+        if self.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            value = job()
+        finally:
+            seconds = time.perf_counter() - start
+            peak = None
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+        self.results.append(Result(operation, self.size, count, seconds, peak))
+        return value
+
+    def run(self, operations=None, tk_root=None):
+        """
+        Runs the benchmarked operations.
+
+        :param operations: Names of the operations to run; all if omitted.
+        :type operations: collections.abc.Container
+        :param tk_root: Optional Tk root, used to also time the Treeview.
+        :return: The collected results.
+        :rtype: list[Result]
+        """
+        setup = set(self.SETUP)
+        if operations is not None and "load_data" in operations:
+            setup.add("save_data")
+        for operation, method in self.OPERATIONS:
+            if operations is None or operation in operations:
+                method(self)
+            elif operation in setup:
+                method(self, timed=False)
+        if tk_root is not None and (operations is None or "display_all_records_tk" in operations):
+            self.display_all_records_tk(tk_root)
+        self.service.close()
+        return self.results
+
+    def add_course(self, timed=True):
+        """Adds every course of the roster, in one registry batch like an import."""
+        courses = self.roster.courses
+
+        def job():
+            with self.service.registry.batch():
+                for course_id, course_name in courses:
+                    self.service.add_course(course_id, course_name)
+        self._time("add_course", len(courses), job, timed)
+
+    def add_student(self, timed=True):
+        """Adds every student and instructor of the roster, in one registry batch."""
+        students = self.roster.students
+        instructors = self.roster.instructors
+
+        def job():
+            with self.service.registry.batch():
+                for name, age, email, student_id in students:
+                    self.service.add_student(name, age, email, student_id)
+                for name, age, email, instructor_id in instructors:
+                    self.service.add_instructor(name, age, email, instructor_id)
+        self._time("add_student", len(students) + len(instructors), job, timed)
+
+    def register_student_to_course(self, timed=True):
+        """Registers students and assigns instructors to their courses, in one registry batch."""
+        registrations = self.roster.registrations
+        assignments = self.roster.assignments
+
+        def job():
+            with self.service.registry.batch():
+                for student_id, course_id in registrations:
+                    self.service.register_student(student_id, course_id)
+                for instructor_id, course_id in assignments:
+                    self.service.assign_instructor(instructor_id, course_id)
+        self._time("register_student_to_course", len(registrations) + len(assignments), job, timed)
+
+    def search_records(self):
+        """Runs :data:`SEARCH_QUERIES` searches per criterion and resolves the first page of hits."""
+        # Build the search index outside of the timed query loop, like the app does at startup.
+        self.measure("build_search_index", self.size, lambda: self.service.search_index)
+        for criterion, texts in self.queries.items():
+            def job():
+                for text in texts:
+                    ListRows.from_keys(self.service.search(criterion, text), self.service.row).page(0, PAGE_SIZE)
+            self.measure(f"search_records[{criterion}]", len(texts), job)
+
+    def display_all_records(self):
+        """Builds the row source of the record view and reads its first page."""
+        def job():
+            if self.service.storage is not None:
+                from storage import StorageRows
+                source = StorageRows(self.service.storage)
+            else:
+                source = ListRows(row for record_type in RECORD_TYPES
+                                  for row in self.service.registry.rows(record_type))
+            return len(source), source.page(0, PAGE_SIZE)
+        self.measure("display_all_records", 1, job)
+
+    def display_all_records_tk(self, root):
+        """Times filling and drawing a :class:`record_view.RecordView` with every record."""
+        from record_view import RecordView
+        view = RecordView(root)
+        view.grid(row=0, column=0)
+        root.update()
+        registry = self.service.registry
+
+        def job():
+            view.set_rows(row for record_type in RECORD_TYPES for row in registry.rows(record_type))
+            root.update_idletasks()
+        self.measure("display_all_records_tk", 1, job)
+        view.frame.destroy()
+
+    def save_data(self, timed=True):
+        """Saves every record to a newline-delimited JSON file."""
+        self._time("save_data", self.size, lambda: self.service.save(path=self.data_file), timed)
+
+    def load_data(self):
+        """Reads the saved file back, then replaces the current records with it."""
+        loaded = self.measure("load_data", self.size, lambda: self.service.read(self.data_file))
+        self.measure("replace_records", self.size, lambda: self.service.replace(loaded))
+
+    def click_operations(self):
+        """
+        Adds courses and students and registers them one at a time, like
+        clicks in the GUI, recorded as ``add_course[click]``,
+        ``add_student[click]`` and ``register_student_to_course[click]``.
+
+        Unlike the batched operations, each change is committed on its own
+        by a storage backend and inserted into a search index that is
+        already built, as after startup.
+        """
+        service = self.service
+        # Builds, or brings up to date, the search index outside of the timings.
+        service.search("Name", "a", PAGE_SIZE)
+        courses = [(f"K{i}", f"Click Course {i}") for i in range(CLICK_OPERATIONS)]
+        students = [(f"Click Student {i}", 20, f"k{i}@school.edu", f"K{i}") for i in range(CLICK_OPERATIONS)]
+
+        def add_courses():
+            for course_id, course_name in courses:
+                service.add_course(course_id, course_name)
+
+        def add_students():
+            for name, age, email, student_id in students:
+                service.add_student(name, age, email, student_id)
+
+        def register():
+            for (course_id, _), (_, _, _, student_id) in zip(courses, students):
+                service.register_student(student_id, course_id)
+        self.measure("add_course[click]", len(courses), add_courses)
+        self.measure("add_student[click]", len(students), add_students)
+        self.measure("register_student_to_course[click]", len(students), register)
+
+    def _time(self, operation, count, job, timed):
+        if timed:
+            self.measure(operation, count, job)
+        else:
+            job()
+
+    #: Operations in execution order.
+    OPERATIONS = (
+        ("add_course", add_course),
+        ("add_student", add_student),
+        ("register_student_to_course", register_student_to_course),
+        ("search_records", search_records),
+        ("display_all_records", display_all_records),
+        ("save_data", save_data),
+        ("load_data", load_data),
+        ("click_operations", click_operations),
+    )
+
+    #: Operations that always run, untimed if not selected, for later ones to make sense.
+    SETUP = ("add_course", "add_student", "register_student_to_course")
+
+
+def open_display():
+    """
+    Returns a withdrawn Tk root, or ``None`` when no display is available.
+
+    Run the benchmark under ``xvfb-run`` to time the Treeview on a headless
+    machine.
+    """
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception:
+        return None
+    root.withdraw()
+    return root
+
+
+def revision():
+    """Returns the current git revision, or ``None`` outside a checkout."""
+    try:
+        output = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return output.stdout.strip() or None
+
+
+def run(sizes, fan_out=DEFAULT_FAN_OUT, operations=None, trace_memory=False, sqlite=False, use_tk=True,
+        seed=0, log=None):
+    """
+    Benchmarks every roster size and returns a JSON-serializable report.
+
+    :param sizes: Roster sizes, in students.
+    :type sizes: list[int]
+    :param log: Optional ``log(message)`` callback for progress messages.
+    :type log: callable
+    :rtype: dict
+    """
+    tk_root = open_display() if use_tk else None
+    results = []
+    with tempfile.TemporaryDirectory(prefix="school-bench-") as workdir:
+        for size in sizes:
+            if log:
+                log(f"generating {size} students...")
+            roster = generate_roster(size, fan_out=fan_out, seed=seed)
+            benchmark = Benchmark(roster, workdir, trace_memory, sqlite)
+            for result in benchmark.run(operations, tk_root):
+                results.append(result.to_dict())
+                if log:
+                    log(format_result(result.to_dict()))
+            del benchmark, roster
+    if tk_root is not None:
+        tk_root.destroy()
+    return {
+        "revision": revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "fan_out": fan_out,
+        "seed": seed,
+        "backend": "sqlite" if sqlite else "memory",
+        "trace_memory": trace_memory,
+        "tk": tk_root is not None,
+        "results": results,
+    }
+
+
+def format_result(result):
+    """Formats one result dictionary as a table line."""
+    peak = result.get("peak_bytes")
+    peak = f"{peak / 2 ** 20:9.1f} MiB" if peak is not None else ""
+    per_op = result.get("per_op_us")
+    per_op = f"{per_op:12.2f} us/op" if per_op is not None else ""
+    return f"{result['size']:>8} {result['operation']:<34} {result['seconds']:10.4f} s {per_op} {peak}"
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares two reports produced by :func:`run`.
+
+    :param baseline: The reference report.
+    :type baseline: dict
+    :param current: The report to check.
+    :type current: dict
+    :param threshold: Slowdown, in percent, above which an operation regresses.
+    :type threshold: float
+    :return: ``(lines, regressions)``: a printable table and the number of
+        operations slower than the threshold. Operations faster than
+        :data:`MIN_COMPARED_SECONDS` are listed but never counted.
+    :rtype: tuple
+    """
+    before = {(r["size"], r["operation"]): r for r in baseline["results"]}
+    lines = [f"{'size':>8} {'operation':<28} {'before':>10} {'after':>10} {'change':>8}"]
+    regressions = 0
+    for result in current["results"]:
+        old = before.get((result["size"], result["operation"]))
+        if old is None or not old["seconds"]:
+            continue
+        change = 100 * (result["seconds"] / old["seconds"] - 1)
+        flag = ""
+        if change > threshold and result["seconds"] >= MIN_COMPARED_SECONDS:
+            regressions += 1
+            flag = "  REGRESSION"
+        lines.append(f"{result['size']:>8} {result['operation']:<34} {old['seconds']:10.4f} "
+                     f"{result['seconds']:10.4f} {change:+7.1f}%{flag}")
+    return lines, regressions
+
+
+def main(argv=None):
+    """
+    Command-line entry point.
+
+    ``python benchmark.py run --sizes 1000 100000 --output results.json``
+    benchmarks the operations and ``python benchmark.py compare old.json
+    new.json`` reports the operations that got slower.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the school data operations.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                            help="roster sizes in students (default: %(default)s)")
+    run_parser.add_argument("--fan-out", type=int, default=DEFAULT_FAN_OUT,
+                            help="average courses per student (default: %(default)s)")
+    run_parser.add_argument("--operations", nargs="+",
+                            choices=[name for name, _ in Benchmark.OPERATIONS] + ["display_all_records_tk"],
+                            help="only run these operations")
+    run_parser.add_argument("--memory", action="store_true", help="record the peak memory of each operation")
+    run_parser.add_argument("--sqlite", action="store_true", help="use a SQLite storage backend")
+    run_parser.add_argument("--no-tk", action="store_true", help="do not time the Treeview even if a display exists")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--output", help="JSON file to write the results to")
+
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                                help="slowdown in percent reported as a regression (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+        with open(args.current, encoding="utf-8") as file:
+            current = json.load(file)
+        lines, regressions = compare(baseline, current, args.threshold)
+        print("\n".join(lines))
+        print(f"{regressions} regression(s) above {args.threshold}%")
+        return 1 if regressions else 0
+
+    report = run(args.sizes, args.fan_out, args.operations, args.memory, args.sqlite, not args.no_tk, args.seed,
+                 log=lambda message: print(message, file=sys.stderr))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
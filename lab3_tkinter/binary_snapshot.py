@@ -0,0 +1,895 @@
+import bisect
+import heapq
+import mmap
+import os
+import struct
+from itertools import chain, islice
+
+import persistence
+from models import RECORD_CLASSES
+from registry import Registry, RECORD_TYPES
+from storage import Storage
+from validation import email_key
+
+#: Conventional extension of binary snapshot files.
+SNAPSHOT_SUFFIX = ".snap"
+
+#: Default binary snapshot file.
+SNAPSHOT_FILE = "school_data" + SNAPSHOT_SUFFIX
+
+MAGIC = b"SCHLSNAP"
+
+#: Format version, bumped on any incompatible layout change.
+VERSION = 1
+
+#: ``magic, version, section count``.
+HEADER = struct.Struct("<8sII")
+
+#: Section directory entry: ``name, offset, size in bytes, item count``.
+SECTION = struct.Struct("<16sQQQ")
+
+#: Course table entry: ``id offset, id length, name offset, name length``
+#: into the string pool.
+COURSE = struct.Struct("<IIII")
+
+#: Student and instructor table entry: string pool offset and length of the
+#: ID, name and email, the age, then the first index and number of entries
+#: of the person in its link table.
+PERSON = struct.Struct("<IIIIIIqII")
+
+U32 = struct.Struct("<I")
+RANGE = struct.Struct("<II")
+
+PEOPLE_TYPES = ("Student", "Instructor")
+ID_FIELDS = {"Student": "student_id", "Instructor": "instructor_id", "Course": "course_id"}
+COURSE_FIELDS = {"Student": "registered_courses", "Instructor": "assigned_courses"}
+
+# Sections, per record type:
+#   <type>.rec    fixed-width record table, in insertion order
+#   <type>.ids    u32 record indices sorted by (lowercase ID, ID)
+#   <type>.names  u32 record indices sorted by (name, index)
+#   <type>.keys   "\n" + lowercase name of each record, concatenated
+#   <type>.koff   u32 offset of each record's entry in <type>.keys
+# and, for students and instructors:
+#   <type>.link   u32 course indices, referenced by the record table
+#   <type>.rev    u32 person indices grouped by course
+#   <type>.revix  (start, count) of each course's group in <type>.rev
+#   <type>.mails  u32 record indices sorted by (email key, index); optional,
+#                 snapshots written before it was added are scanned instead
+
+
+def _dict_rows(source):
+    if isinstance(source, Registry):
+        source = persistence.snapshot(source)
+    if hasattr(source, "iter_dicts"):
+        for record_type in persistence.WRITE_ORDER:
+            for data in source.iter_dicts(record_type):
+                yield record_type, data
+        return
+    for record_type, record, course_ids in source:
+        yield record_type, record.to_dict(course_ids)
+
+
+def _u32_array(values):
+    return struct.pack(f"<{len(values)}I", *values)
+
+
+def write(source, path=SNAPSHOT_FILE, progress=None):
+    """
+    Writes records to a binary snapshot file.
+
+    The file is written next to ``path`` and moved into place once
+    complete, like :func:`persistence.save`.
+
+    :param source: A registry, entries produced by :func:`persistence.snapshot`,
+        or a storage such as :meth:`SnapshotStorage.view`.
+    :param path: Destination file.
+    :type path: str
+    :param progress: Optional ``progress(done, total)`` callback, called every
+        :data:`persistence.PROGRESS_INTERVAL` records; ``total`` is 0 when
+        unknown. Raising from it aborts the write.
+    :type progress: callable
+    :return: Number of records written.
+    :rtype: int
+    :raises ValueError: If the strings exceed the 4 GiB pool of this version.
+    """
+    total = len(source) if isinstance(source, list) else 0
+    pool = bytearray()
+
+    def intern(text):
+        data = str(text).encode("utf-8")
+        offset = len(pool)
+        pool.extend(data)
+        return offset, len(data)
+
+    ids = {record_type: [] for record_type in RECORD_TYPES}
+    names = {record_type: [] for record_type in RECORD_TYPES}
+    tables = {record_type: bytearray() for record_type in RECORD_TYPES}
+    links = {record_type: [] for record_type in PEOPLE_TYPES}
+    emails = {record_type: [] for record_type in PEOPLE_TYPES}
+    course_index = {}
+    count = 0
+    for record_type, data in _dict_rows(source):
+        record_id = str(data[ID_FIELDS[record_type]])
+        if record_type == "Course":
+            name = data["course_name"]
+            course_index[record_id] = len(ids["Course"])
+            tables["Course"] += COURSE.pack(*intern(record_id), *intern(name))
+        else:
+            name = data["name"]
+            start = len(links[record_type])
+            links[record_type].extend(course_index[course_id] for course_id in data.get(COURSE_FIELDS[record_type], ())
+                                      if course_id in course_index)
+            tables[record_type] += PERSON.pack(*intern(record_id), *intern(name), *intern(data["email"]),
+                                               int(data["age"]), start, len(links[record_type]) - start)
+            emails[record_type].append(data["email"])
+        ids[record_type].append(record_id)
+        names[record_type].append(name)
+        count += 1
+        if progress is not None and count % persistence.PROGRESS_INTERVAL == 0:
+            progress(count, total)
+    if len(pool) >= 1 << 32:
+        raise ValueError("Too much text for a version 1 snapshot.")
+
+    sections = {"pool": (bytes(pool), len(pool))}
+    for record_type in RECORD_TYPES:
+        record_ids = ids[record_type]
+        record_names = names[record_type]
+        size = len(record_ids)
+        sections[f"{record_type}.rec"] = (bytes(tables[record_type]), size)
+        sections[f"{record_type}.ids"] = (_u32_array(sorted(range(size), key=lambda i: (record_ids[i].lower(), record_ids[i]))), size)
+        sections[f"{record_type}.names"] = (_u32_array(sorted(range(size), key=lambda i: (record_names[i], i))), size)
+        keys = [b"\n" + name.lower().encode("utf-8") for name in record_names]
+        offsets = []
+        position = 0
+        for key in keys:
+            offsets.append(position)
+            position += len(key)
+        sections[f"{record_type}.keys"] = (b"".join(keys), size)
+        sections[f"{record_type}.koff"] = (_u32_array(offsets), size)
+    for record_type in PEOPLE_TYPES:
+        keys = [email_key(email) for email in emails[record_type]]
+        sections[f"{record_type}.mails"] = (_u32_array(sorted(range(len(keys)), key=lambda i: (keys[i], i))), len(keys))
+        groups = [[] for _ in ids["Course"]]
+        table = tables[record_type]
+        person_links = links[record_type]
+        for person in range(len(ids[record_type])):
+            start, length = PERSON.unpack_from(table, person * PERSON.size)[7:]
+            for course in person_links[start:start + length]:
+                groups[course].append(person)
+        ranges = bytearray()
+        members = []
+        for group in groups:
+            ranges += RANGE.pack(len(members), len(group))
+            members.extend(group)
+        sections[f"{record_type}.link"] = (_u32_array(person_links), len(person_links))
+        sections[f"{record_type}.rev"] = (_u32_array(members), len(members))
+        sections[f"{record_type}.revix"] = (bytes(ranges), len(groups))
+
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, "wb") as file:
+            offset = HEADER.size + SECTION.size * len(sections)
+            directory = []
+            for name, (data, items) in sections.items():
+                offset += -offset % 8
+                directory.append(SECTION.pack(name.encode("ascii"), offset, len(data), items))
+                offset += len(data)
+            file.write(HEADER.pack(MAGIC, VERSION, len(sections)))
+            file.write(b"".join(directory))
+            for data, _ in sections.values():
+                file.write(b"\0" * (-file.tell() % 8))
+                file.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    if progress is not None:
+        progress(count, count)
+    return count
+
+
+def generation_path(path, generation):
+    """
+    Returns the file name of a generation of a snapshot.
+
+    Generation 0 is ``path`` itself; later ones insert their number before
+    the extension, e.g. ``school_data.2.snap``.
+
+    :type path: str
+    :type generation: int
+    :rtype: str
+    """
+    if not generation:
+        return path
+    stem, suffix = os.path.splitext(path)
+    return f"{stem}.{generation}{suffix}"
+
+
+def _generations(path):
+    stem, suffix = os.path.splitext(path)
+    prefix = os.path.basename(stem) + "."
+    found = [0] if os.path.exists(path) else []
+    for name in os.listdir(os.path.dirname(path) or "."):
+        number = name[len(prefix):len(name) - len(suffix)]
+        if name.startswith(prefix) and name.endswith(suffix) and number.isdigit():
+            found.append(int(number))
+    return sorted(found)
+
+
+def current_file(path):
+    """
+    Returns the newest generation of a snapshot on disk, or ``path``.
+
+    :type path: str
+    :rtype: str
+    """
+    generations = _generations(path)
+    return generation_path(path, generations[-1]) if generations else path
+
+
+def _settle(path):
+    # Moves the newest generation back to ``path`` and deletes the older
+    # ones, as far as the OS allows: Windows refuses while they are mapped,
+    # and they are then dealt with on a later open or save.
+    generations = _generations(path)
+    current = generation_path(path, generations[-1]) if generations else path
+    if current != path:
+        try:
+            os.replace(current, path)
+            current = path
+        except OSError:
+            pass
+    for generation in generations[:-1]:
+        if generation:
+            try:
+                os.remove(generation_path(path, generation))
+            except OSError:
+                pass
+    return current
+
+
+class SnapshotFile:
+    """
+    Read-only, memory-mapped view of a binary snapshot.
+
+    Opening a snapshot only reads its header; records are decoded from the
+    mapped pages when asked for, so the cost of a lookup does not depend
+    on the size of the file. IDs and names are found by binary search in
+    the sorted index sections and name substrings by scanning the
+    lowercase name section at C speed.
+
+    :param path: The snapshot file.
+    :type path: str
+    :raises ValueError: If the file is not a snapshot of a supported version.
+    """
+
+    def __init__(self, path=SNAPSHOT_FILE):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, sections = HEADER.unpack_from(self._map, 0)
+        except (ValueError, OSError, struct.error):
+            self._file.close()
+            raise ValueError(f"{path} is not a binary snapshot")
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} binary snapshot")
+        self._sections = {}
+        for k in range(sections):
+            name, offset, size, items = SECTION.unpack_from(self._map, HEADER.size + k * SECTION.size)
+            self._sections[name.rstrip(b"\0").decode("ascii")] = (offset, size, items)
+        self._pool = self._sections["pool"][0]
+
+    def close(self):
+        """Unmaps and closes the file."""
+        self._map.close()
+        self._file.close()
+
+    def count(self, record_type):
+        """Returns the number of records of a type."""
+        return self._sections[f"{record_type}.rec"][2]
+
+    def _u32(self, section, index):
+        return U32.unpack_from(self._map, self._sections[section][0] + 4 * index)[0]
+
+    def _u32_run(self, section, start, length):
+        return struct.unpack_from(f"<{length}I", self._map, self._sections[section][0] + 4 * start)
+
+    def _text(self, offset, length):
+        start = self._pool + offset
+        return self._map[start:start + length].decode("utf-8")
+
+    def _entry(self, record_type, index):
+        entry = COURSE if record_type == "Course" else PERSON
+        return entry.unpack_from(self._map, self._sections[f"{record_type}.rec"][0] + index * entry.size)
+
+    def record_id(self, record_type, index):
+        """Returns the ID of the record at an index."""
+        entry = self._entry(record_type, index)
+        return self._text(entry[0], entry[1])
+
+    def name(self, record_type, index):
+        """Returns the display name of the record at an index."""
+        entry = self._entry(record_type, index)
+        return self._text(entry[2], entry[3])
+
+    def row(self, record_type, index):
+        """Returns the ``(record_type, name, record_id)`` display row of a record."""
+        entry = self._entry(record_type, index)
+        return record_type, self._text(entry[2], entry[3]), self._text(entry[0], entry[1])
+
+    def email(self, record_type, index):
+        """Returns the email of the student or instructor at an index."""
+        entry = self._entry(record_type, index)
+        return self._text(entry[4], entry[5])
+
+    def link_count(self, record_type):
+        """Returns the number of course links of the students or instructors."""
+        return self._sections[f"{record_type}.link"][2]
+
+    def course_indices(self, record_type, index):
+        """Returns the course indices linked to a student or instructor."""
+        entry = self._entry(record_type, index)
+        return self._u32_run(f"{record_type}.link", entry[7], entry[8])
+
+    def record_dict(self, record_type, index, skip_courses=()):
+        """
+        Decodes a record in its ``to_dict`` form.
+
+        :param skip_courses: Course indices to leave out of the course list.
+        :rtype: dict
+        """
+        entry = self._entry(record_type, index)
+        if record_type == "Course":
+            return {"course_id": self._text(entry[0], entry[1]), "course_name": self._text(entry[2], entry[3])}
+        courses = [self.record_id("Course", course) for course in self._u32_run(f"{record_type}.link", entry[7], entry[8])
+                   if course not in skip_courses]
+        return {
+            "name": self._text(entry[2], entry[3]),
+            "age": entry[6],
+            "email": self._text(entry[4], entry[5]),
+            ID_FIELDS[record_type]: self._text(entry[0], entry[1]),
+            COURSE_FIELDS[record_type]: courses,
+        }
+
+    def _lower_bound(self, section, size, key):
+        lo, hi = 0, size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if key(self._u32(section, mid)) < 0:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def find_id(self, record_type, record_id):
+        """Returns the index of the record with an ID, or ``None``."""
+        record_id = str(record_id)
+        target = (record_id.lower(), record_id)
+
+        def compare(index):
+            found = self.record_id(record_type, index)
+            found = (found.lower(), found)
+            return (found > target) - (found < target)
+        section = f"{record_type}.ids"
+        size = self.count(record_type)
+        position = self._lower_bound(section, size, compare)
+        if position < size:
+            index = self._u32(section, position)
+            if self.record_id(record_type, index) == record_id:
+                return index
+        return None
+
+    def iter_prefix(self, record_type, prefix):
+        """Yields the indices of records whose lowercase ID starts with ``prefix``, in ID order."""
+        section = f"{record_type}.ids"
+        size = self.count(record_type)
+
+        def compare(index):
+            found = self.record_id(record_type, index).lower()
+            return (found > prefix) - (found < prefix)
+        for position in range(self._lower_bound(section, size, compare), size):
+            index = self._u32(section, position)
+            if not self.record_id(record_type, index).lower().startswith(prefix):
+                return
+            yield index
+
+    def iter_ids(self, record_type):
+        """Yields ``(record_id, index)`` pairs in lowercase ID order."""
+        section = f"{record_type}.ids"
+        for position in range(self.count(record_type)):
+            index = self._u32(section, position)
+            yield self.record_id(record_type, index), index
+
+    def iter_name(self, record_type, name):
+        """Yields the indices of records with exactly this name, in insertion order."""
+        section = f"{record_type}.names"
+        size = self.count(record_type)
+
+        def compare(index):
+            found = self.name(record_type, index)
+            return (found > name) - (found < name)
+        for position in range(self._lower_bound(section, size, compare), size):
+            index = self._u32(section, position)
+            if self.name(record_type, index) != name:
+                return
+            yield index
+
+    def iter_email(self, record_type, key):
+        """
+        Yields the indices of the people whose email has this
+        :func:`validation.email_key`, in insertion order.
+        """
+        section = f"{record_type}.mails"
+        size = self.count(record_type)
+        if section not in self._sections:
+            yield from (index for index in range(size) if email_key(self.email(record_type, index)) == key)
+            return
+
+        def compare(index):
+            found = email_key(self.email(record_type, index))
+            return (found > key) - (found < key)
+        for position in range(self._lower_bound(section, size, compare), size):
+            index = self._u32(section, position)
+            if email_key(self.email(record_type, index)) != key:
+                return
+            yield index
+
+    def iter_names(self, record_type):
+        """Yields ``(name, index)`` pairs in name order."""
+        section = f"{record_type}.names"
+        for position in range(self.count(record_type)):
+            index = self._u32(section, position)
+            yield self.name(record_type, index), index
+
+    def search(self, record_type, query):
+        """
+        Yields ``(index, position, name_key)`` for each record whose lowercase
+        name contains ``query``, where ``position`` is the first match.
+
+        :param query: Lowercase text without newlines.
+        :type query: str
+        """
+        offset, size, items = self._sections[f"{record_type}.keys"]
+        needle = query.encode("utf-8")
+        koff = f"{record_type}.koff"
+        start, end = offset, offset + size
+        while True:
+            found = self._map.find(needle, start, end)
+            if found < 0:
+                return
+            relative = found - offset
+            lo, hi = 0, items
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self._u32(koff, mid) <= relative:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            index = lo - 1
+            key_start = offset + self._u32(koff, index) + 1
+            key_end = offset + self._u32(koff, index + 1) if index + 1 < items else end
+            if found < key_start:
+                # Empty queries match the separator; move to the key itself.
+                found = key_start
+            yield index, found - key_start, self._map[key_start:key_end].decode("utf-8")
+            if key_end >= end:
+                return
+            start = key_end
+
+    def members(self, record_type, course):
+        """Returns the indices of the students or instructors linked to a course index."""
+        offset = self._sections[f"{record_type}.revix"][0]
+        start, length = RANGE.unpack_from(self._map, offset + course * RANGE.size)
+        return self._u32_run(f"{record_type}.rev", start, length)
+
+
+class SnapshotStorage(Storage):
+    """
+    Storage backend over a memory-mapped binary snapshot.
+
+    The snapshot itself is read-only. Changes made through the registry are
+    kept in memory on top of it: added records, removed ones and updated
+    course lists. :meth:`view` captures that state so a worker thread can
+    write it to a new snapshot with :meth:`save`.
+
+    A mapped file is never overwritten, which Windows does not allow: saves
+    go to the next generation of the file, see :func:`generation_path`, and
+    :meth:`saved` maps it and moves it back to :attr:`path` when possible.
+    Files still mapped by a view are unmapped once the view is dropped.
+
+    Opening is constant time; the Treeview, searches and lookups only decode
+    the records they return.
+
+    :param path: The snapshot file. An empty snapshot is created if missing.
+    :type path: str
+    """
+
+    def __init__(self, path=SNAPSHOT_FILE):
+        self.path = path
+        if not os.path.exists(current_file(path)):
+            write([], path)
+        self.snapshot = SnapshotFile(_settle(path))
+        self.saved_path = None
+        self._reset()
+
+    def _reset(self):
+        self._cleared = False
+        self._deleted = {record_type: [] for record_type in RECORD_TYPES}
+        self._added = {record_type: {} for record_type in RECORD_TYPES}
+        self._courses = {record_type: {} for record_type in PEOPLE_TYPES}
+        self.changes = 0
+
+    def reload(self):
+        """
+        Maps the newest snapshot file again and discards every unsaved change.
+
+        Do not reload while a :meth:`view` is being saved: the save would
+        then bring back the discarded changes.
+        """
+        self.snapshot = SnapshotFile(_settle(self.path))
+        self._reset()
+
+    def view(self):
+        """
+        Returns a frozen copy of this storage for saving from another thread.
+
+        Only the in-memory changes are copied; the mapped snapshot is shared.
+
+        :rtype: SnapshotStorage
+        """
+        view = SnapshotStorage.__new__(SnapshotStorage)
+        view.path = self.path
+        view.snapshot = self.snapshot
+        view.saved_path = None
+        view._cleared = self._cleared
+        view._deleted = {record_type: list(deleted) for record_type, deleted in self._deleted.items()}
+        view._added = {record_type: {k: dict(v) for k, v in added.items()} for record_type, added in self._added.items()}
+        view._courses = {record_type: dict(courses) for record_type, courses in self._courses.items()}
+        view.changes = self.changes
+        return view
+
+    def save(self, progress=None):
+        """
+        Writes this storage, normally a :meth:`view`, to the next generation
+        of its file, recorded in :attr:`saved_path`.
+
+        :param progress: Optional callback, see :func:`write`.
+        :type progress: callable
+        :return: Number of records written.
+        :rtype: int
+        """
+        generations = _generations(self.path)
+        self.saved_path = generation_path(self.path, generations[-1] + 1 if generations else 1)
+        return write(self, self.saved_path, progress)
+
+    def saved(self, view):
+        """
+        Switches to the snapshot written by :meth:`save` from a :meth:`view`
+        of this storage.
+
+        Does nothing if the storage changed since the view was taken: the
+        changes stay on top of the previous snapshot until the next save.
+
+        :type view: SnapshotStorage
+        :return: Whether the new snapshot was opened.
+        :rtype: bool
+        """
+        if self.changes != view.changes or view.saved_path is None:
+            return False
+        self.snapshot = SnapshotFile(view.saved_path)
+        self._reset()
+        self.snapshot.path = _settle(self.path)
+        return True
+
+    def close(self):
+        """Unmaps the snapshot; unsaved changes are lost."""
+        self.snapshot.close()
+
+    def _base_count(self, record_type):
+        return 0 if self._cleared else self.snapshot.count(record_type)
+
+    def _is_deleted(self, record_type, index):
+        deleted = self._deleted[record_type]
+        position = bisect.bisect_left(deleted, index)
+        return position < len(deleted) and deleted[position] == index
+
+    def _base_index(self, record_type, record_id):
+        if self._cleared:
+            return None
+        index = self.snapshot.find_id(record_type, record_id)
+        if index is None or self._is_deleted(record_type, index):
+            return None
+        return index
+
+    def _base_dict(self, record_type, index):
+        data = self.snapshot.record_dict(record_type, index, self._deleted["Course"])
+        if record_type in PEOPLE_TYPES and index in self._courses[record_type]:
+            data[COURSE_FIELDS[record_type]] = list(self._courses[record_type][index])
+        return data
+
+    def on_change(self, event, record_type, record):
+        """Keeps a registry change in memory, on top of the snapshot."""
+        if event in ("begin", "end"):
+            return
+        self.changes += 1
+        if event == "add":
+            self._added[record_type][str(record.record_id)] = record.to_dict()
+        elif event in ("register", "assign"):
+            record_id = str(record.record_id)
+            added = self._added[record_type].get(record_id)
+            if added is not None:
+                added[COURSE_FIELDS[record_type]] = list(record.course_ids)
+            else:
+                index = self._base_index(record_type, record_id)
+                if index is not None:
+                    self._courses[record_type][index] = tuple(record.course_ids)
+        elif event == "remove":
+            record_id = str(record.record_id)
+            if self._added[record_type].pop(record_id, None) is None:
+                index = self._base_index(record_type, record_id)
+                if index is not None:
+                    bisect.insort(self._deleted[record_type], index)
+                    if record_type in PEOPLE_TYPES:
+                        self._courses[record_type].pop(index, None)
+            if record_type == "Course":
+                self._drop_course(record_id)
+        elif event == "clear":
+            self._reset()
+            self._cleared = True
+
+    def _drop_course(self, course_id):
+        for record_type in PEOPLE_TYPES:
+            field = COURSE_FIELDS[record_type]
+            for data in self._added[record_type].values():
+                if course_id in data[field]:
+                    data[field] = [c for c in data[field] if c != course_id]
+            courses = self._courses[record_type]
+            for index, course_ids in courses.items():
+                if course_id in course_ids:
+                    courses[index] = tuple(c for c in course_ids if c != course_id)
+
+    def fetch(self, record_type, record_id):
+        """Returns a record in its ``to_dict`` form, or ``None``."""
+        record_id = str(record_id)
+        added = self._added[record_type].get(record_id)
+        if added is not None:
+            return dict(added)
+        index = self._base_index(record_type, record_id)
+        return None if index is None else self._base_dict(record_type, index)
+
+    def find_by_name(self, record_type, name):
+        """Returns the ID of the first record with the given name, or ``None``."""
+        if not self._cleared:
+            for index in self.snapshot.iter_name(record_type, name):
+                if not self._is_deleted(record_type, index):
+                    return self.snapshot.record_id(record_type, index)
+        for record_id, data in self._added[record_type].items():
+            if _display_name(record_type, data) == name:
+                return record_id
+        return None
+
+    def link_count(self, record_type):
+        """
+        Returns the number of course links of the students or instructors.
+
+        Only the records changed since the snapshot was written are looked at.
+        """
+        total = 0
+        if not self._cleared:
+            snapshot = self.snapshot
+            overrides = self._courses[record_type]
+            total = snapshot.link_count(record_type)
+            for index in self._deleted[record_type]:
+                total -= len(snapshot.course_indices(record_type, index))
+            for index, course_ids in overrides.items():
+                total += len(course_ids) - len(snapshot.course_indices(record_type, index))
+            # Links of the remaining people to removed courses.
+            for course in self._deleted["Course"]:
+                total -= sum(1 for index in snapshot.members(record_type, course)
+                             if index not in overrides and not self._is_deleted(record_type, index))
+        field = COURSE_FIELDS[record_type]
+        return total + sum(len(data[field]) for data in self._added[record_type].values())
+
+    def find_by_email(self, record_type, email):
+        """Returns the ID of the first person with the given email, or ``None``."""
+        key = email_key(email)
+        if not self._cleared:
+            for index in self.snapshot.iter_email(record_type, key):
+                if not self._is_deleted(record_type, index):
+                    return self.snapshot.record_id(record_type, index)
+        for record_id, data in self._added[record_type].items():
+            if email_key(data["email"]) == key:
+                return record_id
+        return None
+
+    def count(self, record_type):
+        """Returns the number of records of a type."""
+        base = self._base_count(record_type) - len(self._deleted[record_type]) if not self._cleared else 0
+        return base + len(self._added[record_type])
+
+    def _base_indices(self, record_type, offset):
+        """Yields the indices of the remaining snapshot records, from the ``offset``-th one."""
+        deleted = self._deleted[record_type]
+        size = self._base_count(record_type)
+        # Smallest index with more than ``offset`` remaining records at or before it.
+        lo, hi = offset, offset + len(deleted)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if mid + 1 - bisect.bisect_right(deleted, mid) > offset:
+                hi = mid
+            else:
+                lo = mid + 1
+        for index in range(lo, size):
+            if not self._is_deleted(record_type, index):
+                yield index
+
+    def rows(self, record_type, offset, limit):
+        """Returns ``(record_type, name, record_id)`` rows in insertion order."""
+        base = self.count(record_type) - len(self._added[record_type])
+        rows = []
+        if offset < base:
+            indices = self._base_indices(record_type, offset)
+            rows = [self.snapshot.row(record_type, index) for index in islice(indices, limit)]
+        remaining = None if limit is None else limit - len(rows)
+        if remaining is None or remaining > 0:
+            added = islice(self._added[record_type].items(), max(0, offset - base), None)
+            rows.extend((record_type, _display_name(record_type, data), record_id)
+                        for record_id, data in islice(added, remaining))
+        return rows
+
+    def iter_dicts(self, record_type):
+        """Yields every record of a type in its ``to_dict`` form."""
+        for index in self._base_indices(record_type, 0):
+            yield self._base_dict(record_type, index)
+        for data in self._added[record_type].values():
+            yield dict(data)
+
+    def names(self, record_type, limit=None):
+        """Returns up to ``limit`` distinct display names of a record type."""
+        names = {}
+        if not self._cleared:
+            for name, index in self.snapshot.iter_names(record_type):
+                if limit is not None and len(names) >= limit:
+                    return list(names)
+                if not self._is_deleted(record_type, index):
+                    names[name] = None
+        for data in self._added[record_type].values():
+            if limit is not None and len(names) >= limit:
+                break
+            names[_display_name(record_type, data)] = None
+        return list(names)
+
+    def search_names(self, record_types, text, limit=None):
+        """
+        Finds records whose name contains the given text, ranked like
+        :meth:`search_index.SearchIndex.search_names`.
+        """
+        query = str(text).strip().lower()
+        ranked = []
+        for record_type in record_types:
+            if not self._cleared:
+                for index, position, name in self.snapshot.search(record_type, query):
+                    if not self._is_deleted(record_type, index):
+                        rank = 0 if name == query else 1 if position == 0 else 2
+                        ranked.append((rank, position, name, record_type, self.snapshot.record_id(record_type, index)))
+            for record_id, data in self._added[record_type].items():
+                name = _display_name(record_type, data).lower()
+                position = name.find(query)
+                if position >= 0:
+                    rank = 0 if name == query else 1 if position == 0 else 2
+                    ranked.append((rank, position, name, record_type, record_id))
+        if limit is not None:
+            ranked = heapq.nsmallest(limit, ranked)
+        else:
+            ranked.sort()
+        return [(record_type, record_id) for _, _, _, record_type, record_id in ranked]
+
+    def search_ids(self, record_types, text, limit=None):
+        """
+        Finds records whose ID contains the given text, those starting with
+        it first, then in ID order, up to ``limit`` per type.
+        """
+        text = str(text).strip().lower()
+        hits = []
+        for record_type in record_types:
+            prefixed = () if self._cleared else (
+                (self.snapshot.record_id(record_type, index).lower(), self.snapshot.record_id(record_type, index))
+                for index in self.snapshot.iter_prefix(record_type, text)
+                if not self._is_deleted(record_type, index))
+            inner = () if self._cleared or not text else self._inner_ids(record_type, text)
+            added = sorted((record_id.lower(), record_id) for record_id in self._added[record_type]
+                           if text in record_id.lower())
+            merged = chain(heapq.merge(prefixed, (entry for entry in added if entry[0].startswith(text))),
+                           heapq.merge(inner, (entry for entry in added if not entry[0].startswith(text))))
+            hits.extend((record_type, record_id) for _, record_id in islice(merged, limit))
+        return hits
+
+    def _inner_ids(self, record_type, text):
+        """Yields ``(id_key, record_id)`` for the snapshot IDs containing ``text`` past their start."""
+        for record_id, index in self.snapshot.iter_ids(record_type):
+            key = record_id.lower()
+            if text in key and not key.startswith(text) and not self._is_deleted(record_type, index):
+                yield key, record_id
+
+    def members(self, course_id, record_type):
+        """Returns the IDs of the people of a type linked to a course."""
+        course_id = str(course_id)
+        members = {}
+        course = None if course_id in self._added["Course"] else self._base_index("Course", course_id)
+        overrides = self._courses[record_type]
+        if course is not None:
+            for index in self.snapshot.members(record_type, course):
+                if index not in overrides and not self._is_deleted(record_type, index):
+                    members[self.snapshot.record_id(record_type, index)] = None
+        for index, course_ids in overrides.items():
+            if course_id in course_ids:
+                members[self.snapshot.record_id(record_type, index)] = None
+        field = COURSE_FIELDS[record_type]
+        for record_id, data in self._added[record_type].items():
+            if course_id in data[field]:
+                members[record_id] = None
+        return list(members)
+
+    def member_count(self, course_id, record_type):
+        """Returns the number of people of a type linked to a course."""
+        return len(self.members(course_id, record_type))
+
+    def shared_members(self, course_a, course_b, record_type):
+        """Returns the IDs of the people of a type linked to both courses."""
+        b = set(self.members(course_b, record_type))
+        return [person_id for person_id in self.members(course_a, record_type) if person_id in b]
+
+
+def _display_name(record_type, data):
+    return data["course_name"] if record_type == "Course" else data["name"]
+
+
+def entries(source):
+    """
+    Decodes every record of a storage, e.g. a :meth:`SnapshotStorage.view`,
+    into entries in the format of :func:`persistence.snapshot`.
+
+    :rtype: list[tuple]
+    """
+    result = []
+    for record_type in persistence.WRITE_ORDER:
+        record_class = RECORD_CLASSES[record_type]
+        for data in source.iter_dicts(record_type):
+            record = record_class.from_dict(data)
+            result.append((record_type, record, record.enrolled_courses))
+    return result
+
+
+def load(path=SNAPSHOT_FILE, progress=None):
+    """
+    Decodes a whole binary snapshot into a new registry.
+
+    :param path: The snapshot file.
+    :type path: str
+    :param progress: Optional ``progress(done, total)`` callback.
+    :type progress: callable
+    :rtype: registry.Registry
+    :raises FileNotFoundError: If the file does not exist.
+    """
+    snapshot = SnapshotFile(current_file(path))
+    try:
+        registry = Registry()
+        total = sum(snapshot.count(record_type) for record_type in RECORD_TYPES)
+        done = 0
+        with registry.batch():
+            for record_type in persistence.WRITE_ORDER:
+                record_class = RECORD_CLASSES[record_type]
+                for index in range(snapshot.count(record_type)):
+                    registry.add(record_type, record_class.from_dict(snapshot.record_dict(record_type, index)))
+                    done += 1
+                    if progress is not None and done % persistence.PROGRESS_INTERVAL == 0:
+                        progress(done, total)
+    finally:
+        snapshot.close()
+    if progress is not None:
+        progress(done, total)
+    return registry
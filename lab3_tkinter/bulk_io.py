@@ -0,0 +1,277 @@
+import argparse
+import csv
+import json
+import os
+import sys
+
+import persistence
+from models import RECORD_CLASSES, parse_age
+from registry import Registry, RECORD_TYPES
+
+#: Columns of roster CSV files. ``courses`` holds ``;``-separated course IDs.
+CSV_COLUMNS = ("type", "id", "name", "age", "email", "courses")
+
+#: Number of rows validated between two progress reports.
+BATCH_SIZE = 1000
+
+ID_FIELDS = {"Student": "student_id", "Instructor": "instructor_id", "Course": "course_id"}
+COURSE_FIELDS = {"Student": "registered_courses", "Instructor": "assigned_courses"}
+
+
+def detect_format(path):
+    """
+    Returns ``"csv"`` for ``.csv`` files and ``"ndjson"`` otherwise.
+
+    :param path: The file path.
+    :type path: str
+    :rtype: str
+    """
+    return "csv" if os.path.splitext(path)[1].lower() == ".csv" else "ndjson"
+
+
+class ImportResult:
+    """
+    Outcome of validating and committing a roster file.
+
+    :ivar records: Valid ``(line, record_type, record)`` entries waiting to
+        be committed.
+    :ivar errors: ``(line, message)`` pairs for rejected rows.
+    :ivar warnings: ``(line, message)`` pairs for accepted but suspicious
+        rows, see :mod:`validation`.
+    :ivar rows: Number of rows read.
+    :ivar added: Number of records added per record type by :func:`commit`.
+    """
+
+    def __init__(self):
+        self.records = []
+        self.errors = []
+        self.warnings = []
+        self.rows = 0
+        self.added = {record_type: 0 for record_type in RECORD_TYPES}
+
+    def summary(self):
+        """
+        Returns a one-line human-readable summary.
+
+        :rtype: str
+        """
+        added = ", ".join(f"{count} {record_type.lower()}(s)" for record_type, count in self.added.items())
+        summary = f"{self.rows} rows read, added {added}, {len(self.errors)} error(s)"
+        if self.warnings:
+            summary += f", {len(self.warnings)} warning(s)"
+        return summary
+
+
+def _csv_rows(file):
+    reader = csv.DictReader(file)
+    for row in reader:
+        record_type = (row.get("type") or "").strip().title()
+        record_id = (row.get("id") or "").strip()
+        if record_type == "Course":
+            data = {"course_id": record_id, "course_name": row.get("name") or ""}
+        else:
+            courses = [c.strip() for c in (row.get("courses") or "").split(";") if c.strip()]
+            data = {
+                "name": row.get("name") or "",
+                "age": row.get("age"),
+                "email": row.get("email") or "",
+                ID_FIELDS.get(record_type, "id"): record_id,
+                COURSE_FIELDS.get(record_type, "courses"): courses,
+            }
+        yield reader.line_num, record_type, data
+
+
+def _ndjson_rows(file):
+    for line_number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+            record_type = data.pop("type")
+        except (ValueError, KeyError, AttributeError, TypeError):
+            yield line_number, None, "invalid JSON record"
+            continue
+        yield line_number, record_type, data
+
+
+def _build(record_type, data):
+    record_class = RECORD_CLASSES.get(record_type)
+    if record_class is None:
+        raise ValueError(f"unknown record type {record_type!r}")
+    if not str(data.get(ID_FIELDS[record_type]) or "").strip():
+        raise ValueError("missing ID")
+    if record_type != "Course":
+        try:
+            data["age"] = parse_age(data.get("age"))
+        except (TypeError, ValueError):
+            raise ValueError("invalid age")
+    try:
+        return record_class.from_dict(data)
+    except KeyError as e:
+        raise ValueError(f"missing field {e}")
+
+
+def validate(path, fmt=None, progress=None):
+    """
+    Streams a roster file and validates its rows without touching any registry.
+
+    Rows are parsed one at a time and checked for a known record type, an
+    ID, a valid age (same rules as the Add Student form) and IDs repeated
+    within the file. The registry-dependent checks happen in :func:`commit`.
+
+    :param path: The CSV or NDJSON file to read.
+    :type path: str
+    :param fmt: ``"csv"`` or ``"ndjson"``; detected from the extension if omitted.
+    :type fmt: str
+    :param progress: Optional ``progress(bytes_read, total_bytes)`` callback,
+        called every :data:`BATCH_SIZE` rows. Raising from it aborts.
+    :type progress: callable
+    :rtype: ImportResult
+    """
+    fmt = fmt or detect_format(path)
+    total = os.path.getsize(path)
+    result = ImportResult()
+    seen = set()
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        rows = _csv_rows(file) if fmt == "csv" else _ndjson_rows(file)
+        for line_number, record_type, data in rows:
+            result.rows += 1
+            if progress is not None and result.rows % BATCH_SIZE == 0:
+                progress(file.buffer.tell() if hasattr(file, "buffer") else 0, total)
+            if record_type is None:
+                result.errors.append((line_number, data))
+                continue
+            try:
+                record = _build(record_type, data)
+            except ValueError as e:
+                result.errors.append((line_number, str(e)))
+                continue
+            key = (record_type, str(record.record_id))
+            if key in seen:
+                result.errors.append((line_number, f"duplicate {record_type} ID {record.record_id} in file"))
+                continue
+            seen.add(key)
+            result.records.append((line_number, record_type, record))
+    if progress is not None:
+        progress(total, total)
+    return result
+
+
+def commit(result, registry):
+    """
+    Adds the validated records of an :class:`ImportResult` to a registry.
+
+    Courses are added first so people can reference courses from the same
+    file. Rows whose ID already exists or that reference an unknown course
+    are rejected and reported in ``result.errors``. Everything is added in
+    a single :meth:`registry.Registry.batch`.
+
+    :param result: The validation result.
+    :type result: ImportResult
+    :param registry: The registry to add to.
+    :type registry: registry.Registry
+    :return: The same result, with ``added`` and ``errors`` updated.
+    :rtype: ImportResult
+    """
+    ordered = sorted(result.records, key=lambda entry: entry[1] != "Course")
+    with registry.batch():
+        for line_number, record_type, record in ordered:
+            if registry.get(record_type, record.record_id) is not None:
+                result.errors.append((line_number, f"{record_type} ID {record.record_id} already exists"))
+                continue
+            missing = [c for c in record.enrolled_courses or () if registry.get("Course", c) is None]
+            if missing:
+                result.errors.append((line_number, f"unknown course(s) {', '.join(missing)}"))
+                continue
+            registry.add(record_type, record)
+            result.added[record_type] += 1
+    result.records = []
+    result.errors.sort()
+    return result
+
+
+def import_file(path, registry, fmt=None, progress=None):
+    """
+    Validates a roster file and commits it to a registry.
+
+    :param path: The CSV or NDJSON file to read.
+    :type path: str
+    :param registry: The registry to add to.
+    :type registry: registry.Registry
+    :param fmt: ``"csv"`` or ``"ndjson"``; detected from the extension if omitted.
+    :type fmt: str
+    :param progress: Optional callback, see :func:`validate`.
+    :type progress: callable
+    :rtype: ImportResult
+    """
+    return commit(validate(path, fmt, progress), registry)
+
+
+def export_file(source, path, fmt=None):
+    """
+    Streams every record of a registry to a CSV or NDJSON file.
+
+    :param source: A registry, or entries produced by :func:`persistence.snapshot`.
+    :param path: The file to write.
+    :type path: str
+    :param fmt: ``"csv"`` or ``"ndjson"``; detected from the extension if omitted.
+    :type fmt: str
+    :return: Number of records written.
+    :rtype: int
+    """
+    fmt = fmt or detect_format(path)
+    if fmt != "csv":
+        return persistence.save(source, path)
+    if isinstance(source, Registry):
+        source = persistence.snapshot(source)
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(CSV_COLUMNS)
+        for record_type, record, course_ids in source:
+            if record_type == "Course":
+                writer.writerow((record_type, record.course_id, record.course_name, "", "", ""))
+            else:
+                writer.writerow((record_type, record.record_id, record.name, record.age, record.email,
+                                 ";".join(course_ids)))
+            count += 1
+    return count
+
+
+def main(argv=None):
+    """
+    Command-line entry point.
+
+    ``python bulk_io.py import roster.csv`` adds a roster to the saved data
+    and ``python bulk_io.py export roster.csv`` writes the saved data out,
+    without opening a Tk window. Imports are validated like those of the
+    app, see :meth:`service.SchoolService.import_file`.
+    """
+    from service import SchoolService
+
+    parser = argparse.ArgumentParser(description="Bulk import and export of school rosters.")
+    parser.add_argument("command", choices=("import", "export"))
+    parser.add_argument("file", help="CSV or NDJSON roster file")
+    parser.add_argument("--format", choices=("csv", "ndjson"), help="override the format detected from the extension")
+    parser.add_argument("--data", default=persistence.DATA_FILE, help="NDJSON data file to update or read")
+    args = parser.parse_args(argv)
+
+    service = SchoolService()
+    if os.path.exists(args.data):
+        service.load(args.data)
+    if args.command == "export":
+        count = service.export_file(args.file, args.format)
+        print(f"Exported {count} records to {args.file}")
+        return 0
+
+    result = service.import_file(args.file, args.format)
+    for line_number, message in result.errors:
+        print(f"{args.file}:{line_number}: {message}", file=sys.stderr)
+    if any(result.added.values()):
+        service.save(path=args.data)
+    print(result.summary())
+    return 1 if result.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,220 @@
+import argparse
+import json
+import os
+import sys
+
+import persistence
+from binary_snapshot import SNAPSHOT_SUFFIX, SnapshotStorage
+from service import SchoolService
+
+
+def build_parser():
+    """
+    Builds the argument parser of the command-line interface.
+
+    :rtype: argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(description="School Management System, without the GUI.")
+    parser.add_argument("--data", default=persistence.DATA_FILE,
+                        help="NDJSON data file, or binary snapshot ending in .snap, to read and update "
+                             "(default: %(default)s)")
+    parser.add_argument("--db", help="SQLite database to use instead of the NDJSON data file")
+    parser.add_argument("--journal", action="store_true",
+                        help="append changes to a journal next to the data file instead of rewriting it")
+    parser.add_argument("--connect", metavar="HOST:PORT",
+                        help="work on the data of a running server (see server.py) instead of a local file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for record_type in ("student", "instructor"):
+        command = commands.add_parser(f"add-{record_type}", help=f"add a {record_type}")
+        command.add_argument("id")
+        command.add_argument("name")
+        command.add_argument("age")
+        command.add_argument("email")
+
+    command = commands.add_parser("add-course", help="add a course")
+    command.add_argument("id")
+    command.add_argument("name")
+
+    command = commands.add_parser("register", help="register a student to a course")
+    command.add_argument("student_id")
+    command.add_argument("course_id")
+
+    command = commands.add_parser("assign", help="assign an instructor to a course")
+    command.add_argument("instructor_id")
+    command.add_argument("course_id")
+
+    command = commands.add_parser("search", help="search records like the GUI search bar")
+    command.add_argument("criterion", choices=("Name", "ID", "Course"))
+    command.add_argument("text")
+    command.add_argument("--limit", type=int)
+
+    command = commands.add_parser("roster", help="list the students and instructors of a course")
+    command.add_argument("course_id")
+
+    command = commands.add_parser("load", help="list the courses of an instructor")
+    command.add_argument("instructor_id")
+
+    command = commands.add_parser("shared", help="list the students registered to both courses")
+    command.add_argument("course_a")
+    command.add_argument("course_b")
+
+    command = commands.add_parser("import", help="import a CSV or NDJSON roster")
+    command.add_argument("file")
+    command.add_argument("--format", choices=("csv", "ndjson"))
+
+    command = commands.add_parser("export", help="export every record to a CSV or NDJSON roster")
+    command.add_argument("file")
+    command.add_argument("--format", choices=("csv", "ndjson"))
+
+    command = commands.add_parser("convert", help="convert between NDJSON data files and binary snapshots")
+    command.add_argument("source")
+    command.add_argument("target", help="written as a binary snapshot if it ends in .snap")
+
+    commands.add_parser("validate", help="check the data for invalid emails and repeated IDs, emails and names")
+
+    commands.add_parser("stats", help="print record counts as JSON")
+
+    command = commands.add_parser("report", help="print enrollment, teaching load, age and email domain reports as JSON")
+    command.add_argument("--limit", type=int, help="maximum number of rows per ranking")
+    return parser
+
+
+def run(service, args):
+    """
+    Executes a parsed command against a service.
+
+    :param service: The service to operate on.
+    :type service: service.SchoolService
+    :param args: Arguments returned by :func:`build_parser`.
+    :return: ``(exit_code, modified)``, where ``modified`` tells whether the
+        data must be saved.
+    :rtype: tuple
+    """
+    command = args.command
+    if command == "add-student":
+        service.add_student(args.name, args.age, args.email, args.id)
+    elif command == "add-instructor":
+        service.add_instructor(args.name, args.age, args.email, args.id)
+    elif command == "add-course":
+        service.add_course(args.id, args.name)
+    elif command == "register":
+        service.register_student(args.student_id, args.course_id)
+    elif command == "assign":
+        service.assign_instructor(args.instructor_id, args.course_id)
+    elif command == "search":
+        for key in service.search(args.criterion, args.text, args.limit):
+            print("\t".join(str(value) for value in service.row(key)))
+        return 0, False
+    elif command == "roster":
+        for record in service.instructors(args.course_id) + service.roster(args.course_id):
+            print(type(record).__name__, record.name, record.record_id, sep="\t")
+        return 0, False
+    elif command == "load":
+        for course in service.course_load(args.instructor_id):
+            print(course.course_id, course.course_name, sep="\t")
+        return 0, False
+    elif command == "shared":
+        for student in service.shared_students(args.course_a, args.course_b):
+            print(student.name, student.student_id, sep="\t")
+        return 0, False
+    elif command == "import":
+        result = service.import_file(args.file, args.format)
+        for line_number, message in result.errors:
+            print(f"{args.file}:{line_number}: {message}", file=sys.stderr)
+        for line_number, message in result.warnings:
+            print(f"{args.file}:{line_number}: warning: {message}", file=sys.stderr)
+        print(result.summary())
+        return (1 if result.errors else 0), any(result.added.values())
+    elif command == "export":
+        count = service.export_file(args.file, args.format)
+        print(f"Exported {count} records to {args.file}")
+        return 0, False
+    elif command == "convert":
+        count = service.save(persistence.snapshot(service.read(args.source)), args.target)
+        print(f"Converted {count} records to {args.target}")
+        return 0, False
+    elif command == "validate":
+        report = service.validate()
+        for key, message in report.errors:
+            print(f"{key}: {message}")
+        for key, message in report.warnings:
+            print(f"{key}: warning: {message}")
+        print(report.summary())
+        return (1 if report.errors else 0), False
+    elif command == "stats":
+        print(json.dumps(service.stats(), indent=2))
+        return 0, False
+    elif command == "report":
+        print(json.dumps(service.report(args.limit), indent=2))
+        return 0, False
+    for warning in service.warnings:
+        print(f"Warning: {warning}", file=sys.stderr)
+    return 0, True
+
+
+def main(argv=None):
+    """
+    Command-line entry point, e.g. ``python cli.py add-course C1 Math``.
+
+    With the default NDJSON data file, the file is read before the command
+    and rewritten after commands that change data. With ``--journal``, the
+    data file and its journal are read, changes are appended to the
+    journal and the journal is compacted once it has grown large. With
+    ``--db``, changes are written through to the SQLite database as they
+    happen. A ``--data`` file ending in ``.snap`` is a binary snapshot,
+    memory-mapped so a command only decodes the records it touches, and
+    rewritten after commands that change data. With ``--connect``, commands
+    run against a server, which keeps the changes.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    snapshot = args.data.endswith(SNAPSHOT_SUFFIX)
+    if snapshot and args.journal:
+        parser.error("--journal needs an NDJSON data file")
+    if args.connect:
+        from client import RemoteService, SchoolClient
+        from server import HOST
+        host, _, port = args.connect.rpartition(":")
+        try:
+            service = RemoteService(SchoolClient(host or HOST, int(port)))
+            service.load()
+        except (OSError, ValueError) as e:
+            print(f"Error: cannot connect to {args.connect}: {e}", file=sys.stderr)
+            return 1
+    elif args.db:
+        from storage import SQLiteStorage
+        service = SchoolService(SQLiteStorage(args.db))
+    elif snapshot:
+        service = SchoolService(SnapshotStorage(args.data))
+    elif args.journal:
+        from journal import Journal
+        service = SchoolService(journal=Journal(args.data))
+        try:
+            service.load(args.data)
+        except FileNotFoundError:
+            pass
+    else:
+        service = SchoolService()
+        if os.path.exists(args.data):
+            service.load(args.data)
+    try:
+        code, modified = run(service, args)
+        if modified and args.journal:
+            service.commit()
+            if service.compaction_due():
+                service.journal.compact(service.registry)
+        elif modified and not args.db and not args.connect:
+            entries = service.snapshot()
+            service.save(entries, args.data)
+            service.saved(entries, args.data)
+    except (ValueError, LookupError, ConnectionError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        service.close()
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+import itertools
+import json
+import queue
+import socket
+import threading
+
+import persistence
+from journal import ID_FIELDS, apply_entry
+from registry import Registry
+from server import ConflictError, HOST, PORT
+from service import SchoolService
+
+#: Seconds a request waits for its response before giving up.
+TIMEOUT = 30.0
+
+ERRORS = {"conflict": ConflictError, "lookup": LookupError, "value": ValueError}
+
+
+class SchoolClient:
+    """
+    Connection to a :class:`server.SchoolServer`.
+
+    A reader thread receives the server messages: responses are handed to
+    the thread waiting in :meth:`call`, and pushed change notifications are
+    queued in :attr:`events` for the owner of the connection to poll, e.g.
+    from the Tk main loop like :class:`io_worker.IOExecutor` does.
+
+    :param host: The server address.
+    :type host: str
+    :param port: The server port.
+    :type port: int
+    :raises OSError: If the server cannot be reached.
+    """
+
+    def __init__(self, host=HOST, port=PORT):
+        self._socket = socket.create_connection((host, port), timeout=TIMEOUT)
+        self._socket.settimeout(None)
+        self._reader = self._socket.makefile("rb")
+        self._send_lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._waiters = {}
+        self.events = queue.Queue()
+        self.connected = True
+        self._thread = threading.Thread(target=self._read, name="school-client", daemon=True)
+        self._thread.start()
+
+    def _read(self):
+        try:
+            for line in self._reader:
+                message = json.loads(line)
+                waiter = self._waiters.pop(message.get("id"), None) if "id" in message else None
+                if waiter is not None:
+                    waiter.put(message)
+                else:
+                    self.events.put(message)
+        except (OSError, ValueError):
+            pass
+        self.connected = False
+        self.events.put(None)
+        for waiter in list(self._waiters.values()):
+            waiter.put(None)
+
+    def call(self, op, **params):
+        """
+        Sends a request and waits for its response. Safe to call from any thread.
+
+        :param op: The operation, e.g. ``"add"``; see :class:`server.SchoolServer`.
+        :type op: str
+        :return: The ``result`` of the response.
+        :raises server.ConflictError: If the request was based on an outdated
+            version of a record.
+        :raises ValueError: If the server rejected the request.
+        :raises LookupError: If a record does not exist.
+        :raises ConnectionError: If the connection is lost.
+        """
+        request_id = next(self._ids)
+        waiter = queue.Queue(1)
+        self._waiters[request_id] = waiter
+        data = json.dumps({"id": request_id, "op": op, **params}, separators=(",", ":")).encode("utf-8") + b"\n"
+        try:
+            if not self.connected:
+                raise ConnectionError("Not connected to the server.")
+            with self._send_lock:
+                self._socket.sendall(data)
+            response = waiter.get(timeout=TIMEOUT)
+        except queue.Empty:
+            raise ConnectionError("The server did not respond.")
+        finally:
+            self._waiters.pop(request_id, None)
+        if response is None:
+            raise ConnectionError("Connection to the server lost.")
+        if not response["ok"]:
+            raise ERRORS.get(response.get("kind"), ValueError)(response["error"])
+        return response["result"]
+
+    def close(self):
+        """Closes the connection."""
+        try:
+            self._socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._socket.close()
+
+
+class RemoteService(SchoolService):
+    """
+    :class:`service.SchoolService` backed by a :class:`server.SchoolServer`.
+
+    The registry is a local mirror of the server data: searches, listings
+    and lookups are answered locally, while changes are sent to the server.
+    The server pushes every change, whoever made it, and :meth:`sync`
+    applies them to the mirror, so registry listeners such as the GUI see
+    remote changes as ordinary adds and removes.
+
+    Changes to existing records carry the version of the record in the
+    mirror; the server rejects them with :class:`server.ConflictError` if
+    another user changed the record in the meantime.
+
+    Methods that change data apply the resulting changes before returning,
+    and must be called on the thread that owns the registry.
+
+    :param client: The connection to the server.
+    :type client: SchoolClient
+    """
+
+    def __init__(self, client):
+        super().__init__()
+        self.client = client
+        self.revision = 0
+        self.versions = {}
+
+    def version(self, record_type, record_id):
+        """Returns the version of a record in the mirror."""
+        return self.versions.get((record_type, str(record_id)), 0)
+
+    def sync(self):
+        """
+        Applies the changes pushed by the server since the last call.
+
+        :return: Number of changes applied.
+        :rtype: int
+        :raises ConnectionError: If the connection was lost.
+        """
+        applied = 0
+        while True:
+            try:
+                message = self.client.events.get_nowait()
+            except queue.Empty:
+                return applied
+            if message is None:
+                raise ConnectionError("Connection to the server lost.")
+            if message.get("event") != "changes":
+                continue
+            for entry in message["changes"]:
+                revision = entry.pop("revision")
+                if revision <= self.revision:
+                    continue
+                self._apply(entry)
+                self.revision = revision
+                applied += 1
+
+    def _apply(self, entry):
+        version = entry.pop("version", None)
+        if entry["op"] == "clear":
+            self.versions.clear()
+        elif entry["op"] == "remove":
+            self.versions.pop((entry["type"], entry["id"]), None)
+        else:
+            record_id = entry["id"] if entry["op"] == "courses" else entry[ID_FIELDS[entry["type"]]]
+            self.versions[(entry["type"], str(record_id))] = version
+        apply_entry(self.registry, entry)
+
+    def read(self, path=None, progress=None):
+        """
+        Downloads every record into a new registry.
+
+        :rtype: registry.Registry
+        """
+        return self._download()[0]
+
+    def _download(self):
+        snapshot = self.client.call("snapshot")
+        registry = Registry()
+        versions = {}
+        with registry.batch():
+            for entry in snapshot["records"]:
+                versions[(entry["type"], str(entry[ID_FIELDS[entry["type"]]]))] = entry.pop("version")
+                apply_entry(registry, entry)
+        return registry, versions, snapshot["revision"]
+
+    def load(self, path=None, progress=None):
+        """Replaces the mirror with a fresh copy of the server data."""
+        loaded, versions, revision = self._download()
+        self.registry.replace_with(loaded)
+        self.versions = versions
+        self.revision = revision
+        self.sync()
+
+    def add_student(self, name, age, email, student_id):
+        """Adds a student on the server; see :meth:`service.SchoolService.add_student`."""
+        return self._add("Student", student_id, name=name, age=age, email=email)
+
+    def add_instructor(self, name, age, email, instructor_id):
+        """Adds an instructor on the server; see :meth:`service.SchoolService.add_instructor`."""
+        return self._add("Instructor", instructor_id, name=name, age=age, email=email)
+
+    def add_course(self, course_id, course_name):
+        """Adds a course on the server; see :meth:`service.SchoolService.add_course`."""
+        return self._add("Course", course_id, name=course_name)
+
+    def _add(self, record_type, record_id, **fields):
+        result = self.client.call("add", type=record_type, record_id=record_id, **fields)
+        self.sync()
+        self.warnings = result["warnings"]
+        record = self.registry.get(record_type, record_id)
+        self._restore_links(record_type, record)
+        return record
+
+    def register_student(self, student, course):
+        """Registers a student to a course on the server."""
+        self._link("register", "Student", "student_id", student, course)
+
+    def assign_instructor(self, instructor, course):
+        """Assigns an instructor to a course on the server."""
+        self._link("assign", "Instructor", "instructor_id", instructor, course)
+
+    def _link(self, op, record_type, field, person, course):
+        person_id = str(getattr(person, "record_id", person))
+        course_id = str(getattr(course, "record_id", course))
+        try:
+            self.client.call(op, course_id=course_id, version=self.version(record_type, person_id),
+                             **{field: person_id})
+        finally:
+            self.sync()
+
+    def remove(self, record_type, record_id):
+        """
+        Removes a record on the server.
+
+        :return: The removed record, or ``None`` if it did not exist.
+        :raises server.ConflictError: If the record changed since it was mirrored.
+        """
+        record = self.registry.get(record_type, record_id)
+        try:
+            self.client.call("remove", type=record_type, record_id=str(record_id),
+                             version=self.version(record_type, record_id))
+        finally:
+            self.sync()
+        return record
+
+    def commit_import(self, result):
+        """Sends the records of a validated roster to the server; see :meth:`service.SchoolService.commit_import`."""
+        records = [(line, record_type, record.to_dict()) for line, record_type, record in result.records]
+        response = self.client.call("import", records=records)
+        self.sync()
+        result.records = []
+        result.errors = sorted(result.errors + [tuple(error) for error in response["errors"]])
+        result.warnings += [tuple(warning) for warning in response["warnings"]]
+        result.added = response["added"]
+        return result
+
+    def snapshot(self):
+        """
+        Captures the mirror, e.g. for an export from a worker thread; see
+        :func:`persistence.snapshot`. :meth:`save` does not need one.
+        """
+        return persistence.snapshot(self.registry)
+
+    def save(self, entries=None, path=None, progress=None):
+        """
+        Asks the server to make its data durable. Safe to call from a worker thread.
+
+        :param entries: Ignored: the server saves its own data.
+
+        :return: Number of journal entries synced or records written by the server.
+        :rtype: int
+        """
+        return self.client.call("save")
+
+    def close(self):
+        """Closes the connection to the server."""
+        self.client.close()
@@ -0,0 +1,121 @@
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+
+#: Interval in milliseconds between two refreshes of an open diagnostics window.
+REFRESH_INTERVAL_MS = 1000
+
+COLUMNS = ("Count", "Mean (ms)", "p50 (ms)", "p95 (ms)", "Max (ms)", "Redraw (ms)")
+
+
+class DiagnosticsWindow:
+    """
+    Toplevel window showing the metrics of an :class:`instrumentation.Instrumentation`.
+
+    Lists the latency of every instrumented callback with its mean Tk
+    redraw time, the current record counts, and controls to enable the
+    metrics, toggle a cProfile capture, reset and export to a file.
+
+    :param master: The parent window.
+    :param instrumentation: The metrics to display.
+    :type instrumentation: instrumentation.Instrumentation
+    """
+
+    def __init__(self, master, instrumentation):
+        self.instrumentation = instrumentation
+        self.window = tk.Toplevel(master)
+        self.window.title("Diagnostics")
+        self._job = None
+
+        self.enabled = tk.BooleanVar(value=instrumentation.enabled)
+        self.profiling = tk.BooleanVar(value=instrumentation.profiling)
+        controls = tk.Frame(self.window)
+        controls.grid(row=0, column=0, sticky="w", padx=10, pady=5)
+        tk.Checkbutton(controls, text="Record metrics", variable=self.enabled,
+                       command=self.toggle_enabled).grid(row=0, column=0)
+        tk.Checkbutton(controls, text="Profile (cProfile)", variable=self.profiling,
+                       command=self.toggle_profile).grid(row=0, column=1)
+        tk.Button(controls, text="Reset", command=self.reset).grid(row=0, column=2)
+        tk.Button(controls, text="Export...", command=self.export).grid(row=0, column=3)
+
+        self.records_label = tk.Label(self.window, text="", anchor="w")
+        self.records_label.grid(row=1, column=0, sticky="w", padx=10)
+
+        self.tree = ttk.Treeview(self.window, columns=COLUMNS, height=15)
+        self.tree.heading("#0", text="Handler")
+        for column in COLUMNS:
+            self.tree.heading(column, text=column)
+            self.tree.column(column, width=80, anchor="e")
+        self.tree.grid(row=2, column=0, padx=10, pady=5)
+
+        self.profile_text = tk.Text(self.window, height=12, width=100, wrap="none")
+        self.profile_text.grid(row=3, column=0, padx=10, pady=5)
+
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self.refresh()
+
+    def refresh(self):
+        """Redisplays the metrics and schedules the next refresh."""
+        report = self.instrumentation.report()
+        records = report["records"]
+        if records:
+            self.records_label.config(text="Records: " + ", ".join(f"{k} {v}" for k, v in records.items()))
+
+        self.tree.delete(*self.tree.get_children())
+        redraw = report["redraw"]
+        for name, latency in report["latency"].items():
+            mean_redraw = redraw[name]["mean"] if name in redraw else 0.0
+            self.tree.insert("", "end", text=name, values=(
+                latency["count"],
+                f"{1000 * latency['mean']:.2f}",
+                f"{1000 * latency['p50']:.2f}",
+                f"{1000 * latency['p95']:.2f}",
+                f"{1000 * latency['max']:.2f}",
+                f"{1000 * mean_redraw:.2f}",
+            ))
+
+        self.profile_text.delete("1.0", tk.END)
+        self.profile_text.insert("1.0", report["profile"] or "No profile captured.")
+        self._job = self.window.after(REFRESH_INTERVAL_MS, self.refresh)
+
+    def toggle_enabled(self):
+        """Starts or stops recording metrics."""
+        self.instrumentation.enabled = self.enabled.get()
+
+    def toggle_profile(self):
+        """Starts or stops the cProfile capture."""
+        if self.profiling.get():
+            self.instrumentation.start_profile()
+        else:
+            self.instrumentation.stop_profile()
+            self.refresh_now()
+
+    def reset(self):
+        """Discards the recorded metrics."""
+        self.instrumentation.reset()
+        self.refresh_now()
+
+    def refresh_now(self):
+        """Refreshes immediately instead of waiting for the next interval."""
+        if self._job is not None:
+            self.window.after_cancel(self._job)
+        self.refresh()
+
+    def export(self):
+        """Exports the metrics to a JSON file chosen by the user."""
+        path = filedialog.asksaveasfilename(parent=self.window, defaultextension=".json",
+                                            filetypes=[("JSON", "*.json")])
+        if not path:
+            return
+        try:
+            self.instrumentation.export(path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Error exporting metrics: {e}", parent=self.window)
+            return
+        messagebox.showinfo("Success", "Metrics exported.", parent=self.window)
+
+    def close(self):
+        """Stops refreshing and closes the window."""
+        if self._job is not None:
+            self.window.after_cancel(self._job)
+            self._job = None
+        self.window.destroy()
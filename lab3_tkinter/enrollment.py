@@ -0,0 +1,164 @@
+#: Record types that can be linked to courses, with the registry event
+#: notified when their course list changes.
+PEOPLE_EVENTS = {"Student": "register", "Instructor": "assign"}
+
+
+class EnrollmentGraph:
+    """
+    Forward and reverse adjacency indexes of student registrations and
+    instructor assignments.
+
+    Each person is mapped to the IDs of its courses, and each course to
+    the IDs of its students and instructors, both as insertion-ordered
+    dictionaries used as sets. Listing a roster or a course load, adding
+    or removing a link is therefore independent of the roster size.
+
+    The graph holds IDs only; the records keep their own ``course_ids``,
+    which remain what is serialized. :class:`registry.Registry` keeps both
+    in sync.
+    """
+
+    def __init__(self):
+        self._courses = {}
+        self._members = {}
+        self._links = 0
+
+    def __len__(self):
+        """Number of links in the graph."""
+        return self._links
+
+    def link(self, record_type, person_id, course_id):
+        """
+        Links a person to a course; does nothing if already linked.
+
+        :param record_type: ``"Student"`` or ``"Instructor"``.
+        :type record_type: str
+        :type person_id: str
+        :type course_id: str
+        """
+        courses = self._courses.setdefault((record_type, person_id), {})
+        if course_id in courses:
+            return
+        courses[course_id] = None
+        self._members.setdefault(course_id, {}).setdefault(record_type, {})[person_id] = None
+        self._links += 1
+
+    def unlink(self, record_type, person_id, course_id):
+        """
+        Removes the link between a person and a course, if any.
+
+        :param record_type: ``"Student"`` or ``"Instructor"``.
+        :type record_type: str
+        :type person_id: str
+        :type course_id: str
+        """
+        courses = self._courses.get((record_type, person_id))
+        if courses is None or course_id not in courses:
+            return
+        del courses[course_id]
+        if not courses:
+            del self._courses[(record_type, person_id)]
+        members = self._members[course_id]
+        del members[record_type][person_id]
+        if not members[record_type]:
+            del members[record_type]
+            if not members:
+                del self._members[course_id]
+        self._links -= 1
+
+    def set_courses(self, record_type, person_id, course_ids):
+        """
+        Makes the links of a person match a course list.
+
+        Only the difference with the current links is applied.
+
+        :param record_type: ``"Student"`` or ``"Instructor"``.
+        :type record_type: str
+        :type person_id: str
+        :param course_ids: The person's course IDs.
+        """
+        current = self._courses.get((record_type, person_id), {})
+        wanted = dict.fromkeys(course_ids)
+        for course_id in [c for c in current if c not in wanted]:
+            self.unlink(record_type, person_id, course_id)
+        for course_id in wanted:
+            self.link(record_type, person_id, course_id)
+
+    def remove_person(self, record_type, person_id):
+        """
+        Removes every link of a person.
+
+        :return: The course IDs the person was linked to.
+        :rtype: list[str]
+        """
+        course_ids = list(self._courses.get((record_type, person_id), ()))
+        for course_id in course_ids:
+            self.unlink(record_type, person_id, course_id)
+        return course_ids
+
+    def remove_course(self, course_id):
+        """
+        Removes every link to a course.
+
+        :return: ``(record_type, person_id)`` pairs that were linked to it.
+        :rtype: list[tuple]
+        """
+        people = [(record_type, person_id)
+                  for record_type, members in self._members.get(course_id, {}).items()
+                  for person_id in members]
+        for record_type, person_id in people:
+            self.unlink(record_type, person_id, course_id)
+        return people
+
+    def clear(self):
+        """Removes every link."""
+        self._courses.clear()
+        self._members.clear()
+        self._links = 0
+
+    def courses(self, record_type, person_id):
+        """
+        Returns the course IDs of a person, in link order.
+
+        :param record_type: ``"Student"`` or ``"Instructor"``.
+        :type record_type: str
+        :rtype: list[str]
+        """
+        return list(self._courses.get((record_type, person_id), ()))
+
+    def members(self, course_id, record_type):
+        """
+        Returns the IDs of the students or instructors linked to a course.
+
+        :param record_type: ``"Student"`` or ``"Instructor"``.
+        :type record_type: str
+        :rtype: list[str]
+        """
+        return list(self._members.get(course_id, {}).get(record_type, ()))
+
+    def member_count(self, course_id, record_type):
+        """
+        Returns the number of students or instructors linked to a course.
+
+        :param record_type: ``"Student"`` or ``"Instructor"``.
+        :type record_type: str
+        :rtype: int
+        """
+        return len(self._members.get(course_id, {}).get(record_type, ()))
+
+    def shared(self, course_a, course_b, record_type="Student"):
+        """
+        Returns the IDs of the people linked to both courses.
+
+        The smaller member set is scanned and probed against the larger
+        one, so the cost is bounded by the smaller course, not the roster.
+
+        :param record_type: ``"Student"`` or ``"Instructor"``.
+        :type record_type: str
+        :rtype: list[str]
+        """
+        a = self._members.get(course_a, {}).get(record_type, {})
+        b = self._members.get(course_b, {}).get(record_type, {})
+        if len(b) < len(a):
+            a, b = b, a
+        return [person_id for person_id in a if person_id in b]
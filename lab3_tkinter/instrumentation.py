@@ -0,0 +1,240 @@
+import bisect
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+#: Upper bounds, in seconds, of the latency histogram buckets. Latencies
+#: above the last bound fall into an overflow bucket.
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+#: Number of profile entries kept in exports, sorted by cumulative time.
+PROFILE_LINES = 40
+
+
+class Histogram:
+    """
+    Latency histogram with fixed, roughly logarithmic buckets.
+
+    Recording a sample is a bisection and a few additions, so histograms
+    can stay on hot paths; percentiles are estimated from the buckets.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def record(self, seconds):
+        """
+        Adds a sample.
+
+        :param seconds: The measured latency.
+        :type seconds: float
+        """
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+
+    @property
+    def mean(self):
+        """Mean latency in seconds, or 0 without samples."""
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, fraction):
+        """
+        Estimates a percentile as the upper bound of the bucket reaching it.
+
+        :param fraction: The percentile, between 0 and 1.
+        :type fraction: float
+        :return: Seconds; the maximum for samples in the overflow bucket.
+        :rtype: float
+        """
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        """Returns the histogram as a JSON-serializable dictionary."""
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.mean,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "max": self.max,
+            "buckets": dict(zip([str(bound) for bound in BUCKETS] + ["inf"], self.buckets)),
+        }
+
+
+class Instrumentation:
+    """
+    Latency metrics for UI callbacks and background jobs.
+
+    :meth:`wrap` returns a callable that times the wrapped one while
+    instrumentation is enabled. When it is disabled the wrapper only tests
+    a flag before calling through, so handlers can stay wrapped at all
+    times. With a Tk root, the time spent redrawing after each callback
+    (``update_idletasks``) is recorded separately. Time spent waiting for
+    the user inside :meth:`paused`, e.g. in a message box, is left out.
+
+    A :mod:`cProfile` capture can be toggled with :meth:`start_profile`
+    and :meth:`stop_profile` independently of the latency metrics.
+
+    :param root: Optional Tk root window used to measure redraw time.
+    :param enabled: Whether to start recording immediately.
+    :type enabled: bool
+    :param stats: Optional callable returning a dictionary of record counts,
+        e.g. :meth:`service.SchoolService.counts`, included in :meth:`report`.
+    :type stats: callable
+    """
+
+    def __init__(self, root=None, enabled=False, stats=None):
+        self.root = root
+        self.enabled = enabled
+        self.stats = stats
+        self.latency = {}
+        self.redraw = {}
+        self._lock = threading.Lock()
+        self._paused = threading.local()
+        self._profile = None
+        self._profile_text = ""
+
+    def wrap(self, name, callback):
+        """
+        Wraps a callback so its calls are timed under ``name``.
+
+        :param name: The metric name, e.g. ``"add_student"``.
+        :type name: str
+        :param callback: The callable to wrap; its arguments and return
+            value are passed through.
+        :type callback: callable
+        :rtype: callable
+        """
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return callback(*args, **kwargs)
+            paused = self._paused_time()
+            start = time.perf_counter()
+            try:
+                return callback(*args, **kwargs)
+            finally:
+                end = time.perf_counter()
+                self.record(name, end - start - (self._paused_time() - paused))
+                if self.root is not None and threading.current_thread() is threading.main_thread():
+                    self.root.update_idletasks()
+                    self.record(name, time.perf_counter() - end, self.redraw)
+        wrapper.__wrapped__ = callback
+        return wrapper
+
+    def _paused_time(self):
+        return getattr(self._paused, "seconds", 0.0)
+
+    @contextmanager
+    def paused(self):
+        """
+        Leaves the time spent in the ``with`` block out of the callbacks
+        being timed on this thread, e.g. while a dialog waits for the user.
+        """
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._paused.seconds = self._paused_time() + time.perf_counter() - start
+
+    def record(self, name, seconds, metrics=None):
+        """
+        Adds a latency sample. Safe to call from worker threads.
+
+        :param name: The metric name.
+        :type name: str
+        :param seconds: The measured latency.
+        :type seconds: float
+        :param metrics: The histogram dictionary; :attr:`latency` by default.
+        :type metrics: dict
+        """
+        metrics = self.latency if metrics is None else metrics
+        with self._lock:
+            histogram = metrics.get(name)
+            if histogram is None:
+                histogram = metrics[name] = Histogram()
+            histogram.record(seconds)
+
+    def reset(self):
+        """Discards every recorded sample and the last profile."""
+        with self._lock:
+            self.latency = {}
+            self.redraw = {}
+        self._profile_text = ""
+
+    @property
+    def profiling(self):
+        """Whether a cProfile capture is running."""
+        return self._profile is not None
+
+    def start_profile(self):
+        """Starts a cProfile capture of the main thread."""
+        if self._profile is None:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def stop_profile(self):
+        """
+        Stops the cProfile capture.
+
+        :return: The :data:`PROFILE_LINES` most expensive functions, sorted
+            by cumulative time, as text.
+        :rtype: str
+        """
+        if self._profile is None:
+            return self._profile_text
+        self._profile.disable()
+        output = io.StringIO()
+        pstats.Stats(self._profile, stream=output).sort_stats("cumulative").print_stats(PROFILE_LINES)
+        self._profile = None
+        self._profile_text = output.getvalue()
+        return self._profile_text
+
+    def report(self):
+        """
+        Returns every metric as a JSON-serializable dictionary.
+
+        :rtype: dict
+        """
+        with self._lock:
+            latency = {name: histogram.to_dict() for name, histogram in sorted(self.latency.items())}
+            redraw = {name: histogram.to_dict() for name, histogram in sorted(self.redraw.items())}
+        return {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "enabled": self.enabled,
+            "records": self.stats() if self.stats is not None else None,
+            "latency": latency,
+            "redraw": redraw,
+            "profile": self._profile_text,
+        }
+
+    def export(self, path):
+        """
+        Writes :meth:`report` to a JSON file.
+
+        :param path: The file to write.
+        :type path: str
+        """
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.report(), file, indent=2)
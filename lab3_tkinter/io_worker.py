@@ -0,0 +1,148 @@
+import queue
+import threading
+
+
+class Cancelled(Exception):
+    """Raised inside a job when its task has been cancelled."""
+
+
+class Task:
+    """
+    Handle on a job submitted to an :class:`IOExecutor`.
+
+    Jobs receive their task and should call :meth:`report` regularly; it
+    publishes progress and raises :class:`Cancelled` once :meth:`cancel`
+    has been called.
+
+    :param name: Human-readable name of the job, e.g. ``"Saving"``.
+    :type name: str
+    """
+
+    def __init__(self, name, executor):
+        self.name = name
+        self._executor = executor
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        """Whether :meth:`cancel` has been called."""
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        """Requests cancellation; the job stops at its next :meth:`report`."""
+        self._cancel_event.set()
+
+    def report(self, done, total):
+        """
+        Publishes progress from the worker thread.
+
+        :param done: Units of work completed.
+        :type done: int
+        :param total: Total units of work, or 0 if unknown.
+        :type total: int
+        :raises Cancelled: If the task has been cancelled.
+        """
+        if self.cancelled:
+            raise Cancelled(self.name)
+        self._executor._events.put(("progress", self, (done, total)))
+
+
+class IOExecutor:
+    """
+    Runs blocking I/O jobs on a single background thread.
+
+    Jobs run one at a time in submission order, so a save and a load can
+    never overlap. Results, errors and progress are passed back through a
+    thread-safe queue that the Tk main loop polls with ``root.after``;
+    every callback therefore runs on the main thread and may touch widgets
+    and application state freely.
+
+    :param root: The Tk root window used for polling.
+    :param poll_interval: Polling period in milliseconds while jobs are pending.
+    :type poll_interval: int
+    """
+
+    def __init__(self, root, poll_interval=50):
+        self.root = root
+        self.poll_interval = poll_interval
+        self._jobs = queue.Queue()
+        self._events = queue.Queue()
+        self._callbacks = {}
+        self._thread = None
+        self._poll_job = None
+
+    @property
+    def busy(self):
+        """Whether any submitted job has not finished yet."""
+        return bool(self._callbacks)
+
+    def submit(self, name, job, on_done=None, on_error=None, on_progress=None, on_cancel=None):
+        """
+        Queues a job for the worker thread.
+
+        :param name: Human-readable name of the job.
+        :type name: str
+        :param job: Called as ``job(task)`` on the worker thread; its return
+            value is passed to ``on_done``.
+        :type job: callable
+        :param on_done: Called with the job result.
+        :param on_error: Called with the exception raised by the job.
+        :param on_progress: Called with ``(task, done, total)``.
+        :param on_cancel: Called with the task once it stopped after cancellation.
+        :return: The task handle.
+        :rtype: Task
+        """
+        task = Task(name, self)
+        self._callbacks[task] = (on_done, on_error, on_progress, on_cancel)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="io-worker", daemon=True)
+            self._thread.start()
+        self._jobs.put((task, job))
+        self._schedule_poll()
+        return task
+
+    def cancel_all(self):
+        """Requests cancellation of every pending job."""
+        for task in self._callbacks:
+            task.cancel()
+
+    def _run(self):
+        while True:
+            task, job = self._jobs.get()
+            try:
+                if task.cancelled:
+                    raise Cancelled(task.name)
+                result = job(task)
+            except Cancelled:
+                self._events.put(("cancel", task, None))
+            except Exception as e:
+                self._events.put(("error", task, e))
+            else:
+                self._events.put(("done", task, result))
+
+    def _schedule_poll(self):
+        if self._poll_job is None:
+            self._poll_job = self.root.after(self.poll_interval, self._poll)
+
+    def _poll(self):
+        self._poll_job = None
+        progress = {}
+        while True:
+            try:
+                kind, task, payload = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "progress":
+                progress[task] = payload
+                continue
+            progress.pop(task, None)
+            on_done, on_error, _, on_cancel = self._callbacks.pop(task)
+            callback = {"done": on_done, "error": on_error, "cancel": on_cancel}[kind]
+            if callback is not None:
+                callback(task if kind == "cancel" else payload)
+        for task, (done, total) in progress.items():
+            on_progress = self._callbacks[task][2]
+            if on_progress is not None:
+                on_progress(task, done, total)
+        if self._callbacks:
+            self._schedule_poll()
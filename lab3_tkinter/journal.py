@@ -0,0 +1,329 @@
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+
+import persistence
+from registry import Registry
+
+#: Suffix appended to the data file name to form the journal file name.
+JOURNAL_SUFFIX = ".journal"
+
+#: Suffix of the journal being folded into the data file by a compaction.
+COMPACTING_SUFFIX = ".old"
+
+#: Number of journal entries written between two fsyncs.
+SYNC_EVERY = 64
+
+#: Maximum number of seconds an entry waits for its fsync, provided
+#: :meth:`Journal.sync` is called periodically or further entries arrive.
+SYNC_INTERVAL = 1.0
+
+#: Journals shorter than this are never worth compacting.
+COMPACT_MIN_ENTRIES = 1000
+
+#: Registry events recorded by the journal.
+JOURNALED_EVENTS = ("add", "remove", "register", "assign", "clear")
+
+ID_FIELDS = {"Student": "student_id", "Instructor": "instructor_id", "Course": "course_id"}
+
+
+class Journal:
+    """
+    Append-only log of the changes made to a registry since the last save.
+
+    The journal is a registry listener: each add, remove, registration,
+    assignment and clear is appended as one JSON line as it happens
+    (edits are a remove followed by an add). Lines are flushed to the OS
+    immediately, so a crash of the app loses nothing, and fsynced in
+    batches of :data:`SYNC_EVERY` entries or every :data:`SYNC_INTERVAL`
+    seconds, so a power loss loses at most that window.
+
+    The newline-delimited data file written by :mod:`persistence` is the
+    snapshot the journal applies to. :meth:`compact` folds the journal
+    into a new snapshot; :func:`recover` rebuilds the data by loading the
+    snapshot and replaying the journal.
+
+    :param data_path: The snapshot file; the journal lives next to it.
+    :type data_path: str
+    :param sync_every: Number of entries between two fsyncs.
+    :type sync_every: int
+    :param sync_interval: Maximum age in seconds of an unsynced entry when
+        the next entry is appended.
+    :type sync_interval: float
+    """
+
+    def __init__(self, data_path=persistence.DATA_FILE, sync_every=SYNC_EVERY, sync_interval=SYNC_INTERVAL):
+        self.data_path = data_path
+        self.path = data_path + JOURNAL_SUFFIX
+        self.compacting_path = self.path + COMPACTING_SUFFIX
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.entries = _count_lines(self.path) + _count_lines(self.compacting_path)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._encode = json.JSONEncoder(separators=(",", ":")).encode
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        self._batch_depth = 0
+        self._paused = 0
+        self._registry = None
+
+    def attach(self, registry):
+        """
+        Starts journaling the changes of a registry.
+
+        The registry should already hold the recovered data, see :func:`recover`.
+
+        :type registry: registry.Registry
+        """
+        self._registry = registry
+        registry.add_listener(self.on_change)
+
+    def detach(self):
+        """Stops journaling the registry given to :meth:`attach`."""
+        if self._registry is not None:
+            self._registry.remove_listener(self.on_change)
+            self._registry = None
+
+    @contextmanager
+    def paused(self):
+        """
+        Suspends journaling, e.g. while the registry is replaced with data
+        just read from disk, which the journal already accounts for.
+        """
+        self._paused += 1
+        try:
+            yield self
+        finally:
+            self._paused -= 1
+
+    def on_change(self, event, record_type, record):
+        """Registry listener; see :meth:`registry.Registry.add_listener`."""
+        if event == "begin":
+            self._batch_depth += 1
+            return
+        if event == "end":
+            self._batch_depth -= 1
+        elif self._paused:
+            return
+        elif event == "reset":
+            # A reset has no entry of its own; the new content is journaled in full.
+            self.on_change("clear", None, None)
+            for record_type, record, _ in persistence.snapshot(self._registry):
+                self.on_change("add", record_type, record)
+            return
+        elif event not in JOURNALED_EVENTS:
+            return
+        else:
+            self._file.write(self._encode(change_entry(event, record_type, record)) + "\n")
+            self._file.flush()
+            self._pending += 1
+            self.entries += 1
+        if self._batch_depth == 0 and self._pending and (
+                self._pending >= self.sync_every or time.monotonic() - self._last_sync >= self.sync_interval):
+            self.sync()
+
+    @property
+    def pending(self):
+        """Number of entries written since the last fsync."""
+        return self._pending
+
+    def sync(self):
+        """
+        Forces the entries written so far to disk.
+
+        :return: Number of entries that were not yet synced.
+        :rtype: int
+        """
+        synced = self._pending
+        if synced:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._pending = 0
+        self._last_sync = time.monotonic()
+        return synced
+
+    @property
+    def compacting(self):
+        """Whether a compaction started with :meth:`rotate` has not finished."""
+        return os.path.exists(self.compacting_path)
+
+    def compaction_due(self, record_count):
+        """
+        Tells whether the journal has grown enough to be folded into the snapshot.
+
+        Compaction rewrites the whole dataset, so it is only due once the
+        journal holds at least half as many entries as there are records;
+        the rewrite cost is then spread over as many changes.
+
+        :param record_count: Number of records in the registry.
+        :type record_count: int
+        :rtype: bool
+        """
+        return self.entries >= max(COMPACT_MIN_ENTRIES, record_count // 2)
+
+    def rotate(self):
+        """
+        Starts a compaction by moving the journal aside.
+
+        Call it on the thread that changes the registry, right before taking
+        the :func:`persistence.snapshot` to save; later changes go to a new
+        journal. If a previous compaction never finished, the journal is
+        appended to its leftover instead, so replay order is kept.
+        """
+        self.sync()
+        self._file.close()
+        if os.path.exists(self.compacting_path):
+            with open(self.compacting_path, "ab") as target, open(self.path, "rb") as source:
+                shutil.copyfileobj(source, target)
+                target.flush()
+                os.fsync(target.fileno())
+            open(self.path, "w").close()
+        else:
+            os.replace(self.path, self.compacting_path)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self.entries = 0
+
+    def finish_compaction(self):
+        """Discards the rotated journal once the new snapshot has been saved."""
+        if os.path.exists(self.compacting_path):
+            os.remove(self.compacting_path)
+
+    def compact(self, registry, progress=None):
+        """
+        Folds the journal into a new snapshot of a registry, synchronously.
+
+        :type registry: registry.Registry
+        :param progress: Optional callback, see :func:`persistence.save`.
+        :return: Number of records written.
+        :rtype: int
+        """
+        self.rotate()
+        count = persistence.save(persistence.snapshot(registry), self.data_path, progress)
+        self.finish_compaction()
+        return count
+
+    def close(self):
+        """Syncs pending entries, stops journaling and closes the journal file."""
+        self.detach()
+        self.sync()
+        self._file.close()
+
+
+def change_entry(event, record_type, record):
+    """
+    Describes a registry change as a JSON-serializable journal entry.
+
+    :param event: A journaled registry event, see :data:`JOURNALED_EVENTS`.
+    :type event: str
+    :return: A dictionary with an ``op`` field: ``"add"``, ``"remove"``,
+        ``"courses"`` or ``"clear"``; see :func:`apply_entry`.
+    :rtype: dict
+    """
+    if event == "add":
+        return {"op": "add", "type": record_type, **record.to_dict()}
+    if event == "remove":
+        return {"op": "remove", "type": record_type, "id": str(record.record_id)}
+    if event == "clear":
+        return {"op": "clear"}
+    return {"op": "courses", "type": record_type, "id": str(record.record_id), "courses": list(record.course_ids)}
+
+
+def _count_lines(path):
+    if not os.path.exists(path):
+        return 0
+    count = 0
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 16), b""):
+            count += block.count(b"\n")
+    return count
+
+
+def replay(registry, path):
+    """
+    Applies the entries of a journal file to a registry.
+
+    Replay is idempotent: adding a record that exists or removing one that
+    does not is skipped, and course lists are stored whole. Replaying a
+    journal that was already folded into the snapshot, e.g. after a crash
+    in the middle of a compaction, therefore leaves the data unchanged. A
+    last line cut short by a crash is ignored.
+
+    :param registry: The registry to update, normally freshly loaded.
+    :type registry: registry.Registry
+    :param path: The journal file.
+    :type path: str
+    :return: Number of entries applied.
+    :rtype: int
+    :raises ValueError: If an entry before the last line is corrupt.
+    """
+    count = 0
+    with open(path, "rb") as file, registry.batch():
+        for line_number, line in enumerate(file, 1):
+            if not line.endswith(b"\n"):
+                break
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                op = entry["op"]
+            except (ValueError, KeyError, TypeError) as e:
+                raise ValueError(f"{path}:{line_number}: invalid journal entry ({e})")
+            apply_entry(registry, entry)
+            count += 1
+    return count
+
+
+def apply_entry(registry, entry):
+    """
+    Applies an entry made by :func:`change_entry` to a registry, idempotently.
+
+    :type registry: registry.Registry
+    :param entry: The entry; its ``op`` and ``type`` fields are removed.
+    :type entry: dict
+    :raises ValueError: If the operation is unknown.
+    """
+    op = entry.pop("op")
+    if op == "clear":
+        registry.clear()
+        return
+    record_type = entry.pop("type")
+    if op == "add":
+        if registry.get(record_type, entry[ID_FIELDS[record_type]]) is None:
+            registry.load_record(record_type, entry)
+    elif op == "remove":
+        registry.remove(record_type, entry["id"])
+    elif op == "courses":
+        person = registry.get(record_type, entry["id"])
+        if person is not None:
+            registry.set_courses(record_type, person, entry["courses"])
+    else:
+        raise ValueError(f"unknown journal operation {op!r}")
+
+
+def recover(data_path=persistence.DATA_FILE, progress=None):
+    """
+    Rebuilds the data from the snapshot and the journals next to it.
+
+    The snapshot is loaded, then the journal of an unfinished compaction,
+    if any, and the current journal are replayed in order.
+
+    :param data_path: The snapshot file.
+    :type data_path: str
+    :param progress: Optional callback, see :func:`persistence.iter_records`.
+    :type progress: callable
+    :rtype: registry.Registry
+    :raises FileNotFoundError: If neither a snapshot nor a journal exists.
+    """
+    journal_path = data_path + JOURNAL_SUFFIX
+    journals = [path for path in (journal_path + COMPACTING_SUFFIX, journal_path) if os.path.exists(path)]
+    if os.path.exists(data_path):
+        registry = persistence.load(data_path, progress)
+    elif journals:
+        registry = Registry()
+    else:
+        raise FileNotFoundError(f"No such file: {data_path!r}")
+    for path in journals:
+        replay(registry, path)
+    return registry
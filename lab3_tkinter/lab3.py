@@ -1,34 +1,104 @@
-import json
+import argparse
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
+
+from binary_snapshot import SnapshotStorage
+from client import RemoteService, SchoolClient
+from diagnostics import DiagnosticsWindow
+from instrumentation import Instrumentation
+from io_worker import IOExecutor
+from journal import Journal
+from record_view import RecordView, ListRows
+from refresh import RefreshScheduler
+from registry import RECORD_TYPES
+from reports_window import ReportsWindow
+from server import HOST
+from service import SchoolService
+from storage import SQLiteStorage, StorageRows
+
+#: Delay in milliseconds between the last keystroke and a search-as-you-type query.
+SEARCH_DEBOUNCE_MS = 250
+
+#: Interval in milliseconds between two checks for changes pushed by the server.
+REMOTE_POLL_MS = 100
+
+#: Maximum number of names pushed into a registration combobox dropdown.
+MAX_COMBOBOX_VALUES = 500
+
+#: Interval in milliseconds between two journal syncs and compaction checks.
+JOURNAL_SYNC_MS = 1000
 
 class SchoolManagementApp:
     """
     SchoolManagementApp is a Tkinter-based GUI for managing a school system.
 
     The app allows users to manage students, instructors, and courses,
-    and register students for courses.
+    and register students for courses. It is a thin view over
+    :class:`service.SchoolService`, which holds the data and business rules.
 
     :param root: The root Tkinter window.
     :type root: Tk()
+    :param storage: Optional storage backend, e.g. :class:`storage.SQLiteStorage`.
+    :type storage: storage.Storage
     """
 
-    def __init__(self, root):
+    def __init__(self, root, storage=None, instrument=False, journal=None, service=None):
         """
         Initializes the SchoolManagementApp with the Tkinter root window.
         
         :param root: The root window of the application.
         :type root: Tk()
+        :param storage: Optional storage backend. When given, every change is
+            written through to it and records are read from it on demand
+            instead of being loaded at startup.
+        :type storage: storage.Storage
+        :param instrument: Whether to record handler latencies from startup.
+            They can also be enabled later from the diagnostics window.
+        :type instrument: bool
+        :param journal: Optional journal. When given, the saved data is
+            recovered at startup, every change is appended to the journal as
+            it happens, and the journal is synced and compacted periodically.
+        :type journal: journal.Journal
+        :param service: Optional service to use instead of creating one, e.g.
+            a :class:`client.RemoteService` to work on the data of a server.
+            Changes pushed by the server are then applied to the Treeview
+            as they arrive.
+        :type service: service.SchoolService
         """
         self.root = root
         self.root.title("School Management System")
         self.root.geometry("700x500")
 
-        self.students = []
-        self.instructors = []
-        self.courses = []
+        self.storage = storage
+        self.service = service if service is not None else SchoolService(storage, journal)
+        self.remote = isinstance(self.service, RemoteService)
+        self._batch_depth = 0
+        self.registry = self.service.registry
+        self.search_index = self.service.search_index
+        self.instrumentation = Instrumentation(self.root, instrument, self.service.counts)
+        self._search_job = None
+        self._searching = False
+        self.io_executor = IOExecutor(self.root)
 
         self.setup_gui()
+        self.refresh = RefreshScheduler(self.root)
+        for record_type, combobox in (("Student", self.student_combobox), ("Instructor", self.instructor_combobox),
+                                      ("Course", self.course_combobox)):
+            self.refresh.register(record_type, self.instrument(
+                f"refresh_combobox[{record_type}]",
+                lambda combobox=combobox, record_type=record_type: self.refresh_combobox(combobox, record_type)))
+        self.registry.add_listener(self._on_registry_change)
+        if journal is not None:
+            try:
+                self.service.load(journal.data_path)
+            except FileNotFoundError:
+                pass
+            self.root.after(JOURNAL_SYNC_MS, self._sync_journal)
+        if self.remote:
+            self.service.load()
+            self.root.after(REMOTE_POLL_MS, self._poll_remote)
+        if storage is not None or journal is not None or self.remote:
+            self.display_all_records()
 
     def setup_gui(self):
         """Sets up the graphical user interface for the application."""
@@ -39,6 +109,44 @@ class SchoolManagementApp:
         self.setup_record_display()
         self.setup_search_bar()
         self.setup_save_load_buttons()
+        tk.Button(self.root, text="Reports", command=self.show_reports).grid(row=9, column=1)
+        tk.Button(self.root, text="Diagnostics", command=self.show_diagnostics).grid(row=9, column=2)
+
+    def instrument(self, name, callback):
+        """
+        Wraps a callback so its latency is recorded under ``name``.
+
+        See :meth:`instrumentation.Instrumentation.wrap`; the wrapper costs a
+        flag test while instrumentation is disabled. Dialogs opened through
+        :meth:`dialog` are not part of the recorded latency.
+
+        :param name: The metric name.
+        :type name: str
+        :param callback: The callback to wrap.
+        :type callback: callable
+        :rtype: callable
+        """
+        return self.instrumentation.wrap(name, callback)
+
+    def dialog(self, show, *args, **kwargs):
+        """
+        Opens a message box or file dialog, e.g. ``messagebox.showinfo``,
+        without counting the time it stays open in the handler latency.
+
+        :param show: The dialog function, called with the other arguments.
+        :type show: callable
+        :return: What the dialog returns.
+        """
+        with self.instrumentation.paused():
+            return show(*args, **kwargs)
+
+    def show_diagnostics(self):
+        """Opens the diagnostics window with the recorded handler latencies."""
+        DiagnosticsWindow(self.root, self.instrumentation)
+
+    def show_reports(self):
+        """Opens the reports window with the enrollment, teaching load, age and email domain statistics."""
+        ReportsWindow(self.root, self.service)
 
     def setup_student_form(self):
         """Sets up the form to add student information."""
@@ -61,7 +169,7 @@ class SchoolManagementApp:
         self.student_id_entry = tk.Entry(student_frame)
         self.student_id_entry.grid(row=3, column=1)
 
-        tk.Button(student_frame, text="Add Student", command=self.add_student).grid(row=4, column=1)
+        tk.Button(student_frame, text="Add Student", command=self.instrument("add_student", self.add_student)).grid(row=4, column=1)
 
     def setup_instructor_form(self):
         """Sets up the form to add instructor information."""
@@ -84,7 +192,7 @@ class SchoolManagementApp:
         self.instructor_id_entry = tk.Entry(instructor_frame)
         self.instructor_id_entry.grid(row=3, column=1)
 
-        tk.Button(instructor_frame, text="Add Instructor", command=self.add_instructor).grid(row=4, column=1)
+        tk.Button(instructor_frame, text="Add Instructor", command=self.instrument("add_instructor", self.add_instructor)).grid(row=4, column=1)
 
     def setup_course_form(self):
         """Sets up the form to add course information."""
@@ -99,7 +207,7 @@ class SchoolManagementApp:
         self.course_id_entry = tk.Entry(course_frame)
         self.course_id_entry.grid(row=1, column=1)
 
-        tk.Button(course_frame, text="Add Course", command=self.add_course).grid(row=2, column=1)
+        tk.Button(course_frame, text="Add Course", command=self.instrument("add_course", self.add_course)).grid(row=2, column=1)
 
     def setup_course_registration_form(self):
         """
@@ -111,33 +219,34 @@ class SchoolManagementApp:
         registration_frame.grid(row=0, column=1, rowspan=3, padx=10, pady=10)
 
         tk.Label(registration_frame, text="Select Student").grid(row=0, column=0)
-        self.student_combobox = ttk.Combobox(registration_frame, values=[s.name for s in self.students])
+        self.student_combobox = ttk.Combobox(registration_frame, values=self.registry.names("Student", MAX_COMBOBOX_VALUES))
         self.student_combobox.grid(row=0, column=1)
 
         tk.Label(registration_frame, text="Select Course").grid(row=1, column=0)
-        self.course_combobox = ttk.Combobox(registration_frame, values=[c.course_name for c in self.courses])
+        self.course_combobox = ttk.Combobox(registration_frame, values=self.registry.names("Course", MAX_COMBOBOX_VALUES))
         self.course_combobox.grid(row=1, column=1)
 
-        tk.Button(registration_frame, text="Register Student", command=self.register_student_to_course).grid(row=2, column=1)
+        tk.Button(registration_frame, text="Register Student", command=self.instrument("register_student_to_course", self.register_student_to_course)).grid(row=2, column=1)
 
         tk.Label(registration_frame, text="Select Instructor").grid(row=3, column=0)
-        self.instructor_combobox = ttk.Combobox(registration_frame, values=[i.name for i in self.instructors])
+        self.instructor_combobox = ttk.Combobox(registration_frame, values=self.registry.names("Instructor", MAX_COMBOBOX_VALUES))
         self.instructor_combobox.grid(row=3, column=1)
 
-        tk.Button(registration_frame, text="Assign Instructor", command=self.assign_instructor_to_course).grid(row=4, column=1)
+        self.student_combobox.bind("<KeyRelease>", lambda event: self.refresh.mark_dirty("Student"))
+        self.course_combobox.bind("<KeyRelease>", lambda event: self.refresh.mark_dirty("Course"))
+        self.instructor_combobox.bind("<KeyRelease>", lambda event: self.refresh.mark_dirty("Instructor"))
+
+        tk.Button(registration_frame, text="Assign Instructor", command=self.instrument("assign_instructor_to_course", self.assign_instructor_to_course)).grid(row=4, column=1)
 
     def setup_record_display(self):
         """Sets up the display for viewing records of students, instructors, and courses."""
-        self.tree = ttk.Treeview(self.root, columns=("Type", "Name", "ID"))
-        self.tree.heading("#0", text="Type")
-        self.tree.heading("Name", text="Name")
-        self.tree.heading("ID", text="ID")
-        self.tree.grid(row=3, column=0, columnspan=2, pady=20)
+        self.record_view = RecordView(self.root)
+        self.record_view.grid(row=3, column=0, columnspan=2, pady=20)
 
-        tk.Button(self.root, text="Display All Records", command=self.display_all_records).grid(row=4, column=0, columnspan=2)
+        tk.Button(self.root, text="Display All Records", command=self.instrument("display_all_records", self.display_all_records)).grid(row=4, column=0, columnspan=2)
 
-        tk.Button(self.root, text="Edit Record", command=self.edit_record).grid(row=5, column=0)
-        tk.Button(self.root, text="Delete Record", command=self.delete_record).grid(row=5, column=1)
+        tk.Button(self.root, text="Edit Record", command=self.instrument("edit_record", self.edit_record)).grid(row=5, column=0)
+        tk.Button(self.root, text="Delete Record", command=self.instrument("delete_record", self.delete_record)).grid(row=5, column=1)
 
     def setup_search_bar(self):
         """Sets up the search bar for finding records by name, ID, or course."""
@@ -151,13 +260,21 @@ class SchoolManagementApp:
 
         self.search_entry = tk.Entry(search_frame)
         self.search_entry.grid(row=0, column=2)
+        self.search_entry.bind("<KeyRelease>", self.instrument("schedule_search", self.schedule_search))
+        self.search_criteria.bind("<<ComboboxSelected>>", self.instrument("schedule_search", self.schedule_search))
 
-        tk.Button(search_frame, text="Search", command=self.search_records).grid(row=0, column=3)
+        tk.Button(search_frame, text="Search", command=self.instrument("search_records", self.search_records)).grid(row=0, column=3)
 
     def setup_save_load_buttons(self):
-        """Sets up the buttons to save and load data from a JSON file."""
-        tk.Button(self.root, text="Save Data", command=self.save_data).grid(row=7, column=0)
-        tk.Button(self.root, text="Load Data", command=self.load_data).grid(row=7, column=1)
+        """Sets up the buttons to save and load data from a newline-delimited JSON file."""
+        tk.Button(self.root, text="Save Data", command=self.instrument("save_data", self.save_data)).grid(row=7, column=0)
+        tk.Button(self.root, text="Load Data", command=self.instrument("load_data", self.load_data)).grid(row=7, column=1)
+        tk.Button(self.root, text="Import Roster", command=self.instrument("import_roster", self.import_roster)).grid(row=7, column=2)
+        tk.Button(self.root, text="Export Roster", command=self.instrument("export_roster", self.export_roster)).grid(row=8, column=2)
+
+        self.io_status = tk.Label(self.root, text="")
+        self.io_status.grid(row=8, column=0)
+        tk.Button(self.root, text="Cancel", command=self.instrument("cancel_io", self.io_executor.cancel_all)).grid(row=8, column=1)
 
     def add_student(self):
         """
@@ -165,17 +282,15 @@ class SchoolManagementApp:
         
         :raises ValueError: If the age is not a valid integer.
         """
+        name = self.student_name_entry.get()
+        student_id = self.student_id_entry.get()
         try:
-            name = self.student_name_entry.get()
-            age = int(self.student_age_entry.get())
-            email = self.student_email_entry.get()
-            student_id = self.student_id_entry.get()
-            student = Student(name, age, email, student_id)
-            self.students.append(student)
-            messagebox.showinfo("Success", f"Student {name} added.")
-            self.update_comboboxes()
-        except ValueError:
-            messagebox.showerror("Error", "Please enter a valid age.")
+            self.service.add_student(name, self.student_age_entry.get(), self.student_email_entry.get(), student_id)
+        except (ValueError, ConnectionError) as e:
+            self.dialog(messagebox.showerror, "Error", str(e))
+            return
+        self._show_record("Student", name, student_id)
+        self._show_added(f"Student {name} added.")
 
     def add_instructor(self):
         """
@@ -183,17 +298,16 @@ class SchoolManagementApp:
         
         :raises ValueError: If the age is not a valid integer.
         """
+        name = self.instructor_name_entry.get()
+        instructor_id = self.instructor_id_entry.get()
         try:
-            name = self.instructor_name_entry.get()
-            age = int(self.instructor_age_entry.get())
-            email = self.instructor_email_entry.get()
-            instructor_id = self.instructor_id_entry.get()
-            instructor = Instructor(name, age, email, instructor_id)
-            self.instructors.append(instructor)
-            messagebox.showinfo("Success", f"Instructor {name} added.")
-            self.update_comboboxes()
-        except ValueError:
-            messagebox.showerror("Error", "Please enter a valid age.")
+            self.service.add_instructor(name, self.instructor_age_entry.get(), self.instructor_email_entry.get(),
+                                        instructor_id)
+        except (ValueError, ConnectionError) as e:
+            self.dialog(messagebox.showerror, "Error", str(e))
+            return
+        self._show_record("Instructor", name, instructor_id)
+        self._show_added(f"Instructor {name} added.")
 
     def add_course(self):
         """
@@ -203,96 +317,175 @@ class SchoolManagementApp:
         """
         course_name = self.course_name_entry.get()
         course_id = self.course_id_entry.get()
-        course = Course(course_id, course_name)
-        self.courses.append(course)
-        messagebox.showinfo("Success", f"Course {course_name} added.")
-        self.update_comboboxes()
+        try:
+            self.service.add_course(course_id, course_name)
+        except (ValueError, ConnectionError) as e:
+            self.dialog(messagebox.showerror, "Error", str(e))
+            return
+        self._show_record("Course", course_name, course_id)
+        self._show_added(f"Course {course_name} added.")
+
+    def _show_record(self, record_type, name, record_id):
+        # While search results are shown, the record only belongs in them if
+        # it matches; the search is re-run to place it by rank.
+        if self._searching:
+            self.search_records(keep_offset=True)
+        else:
+            self.record_view.insert_row(record_type, name, record_id)
+
+    def _show_added(self, message):
+        if self.service.warnings:
+            self.dialog(messagebox.showwarning, "Success", "\n".join([message] + self.service.warnings))
+        else:
+            self.dialog(messagebox.showinfo, "Success", message)
 
     def register_student_to_course(self):
         """Registers a student to a selected course."""
         student_name = self.student_combobox.get()
         course_name = self.course_combobox.get()
 
-        student = next((s for s in self.students if s.name == student_name), None)
-        course = next((c for c in self.courses if c.course_name == course_name), None)
-
-        if student and course:
-            student.register_course(course)
-            messagebox.showinfo("Success", f"Student {student_name} registered to {course_name}")
-        else:
-            messagebox.showerror("Error", "Student or course not found")
+        try:
+            student = self.service.find("Student", name=student_name)
+            course = self.service.find("Course", name=course_name)
+        except LookupError:
+            self.dialog(messagebox.showerror, "Error", "Student or course not found")
+            return
+        try:
+            self.service.register_student(student, course)
+        except (ValueError, LookupError, ConnectionError) as e:
+            self.dialog(messagebox.showerror, "Error", str(e))
+            return
+        self.dialog(messagebox.showinfo, "Success", f"Student {student_name} registered to {course_name}")
 
     def assign_instructor_to_course(self):
         """Assigns an instructor to a selected course."""
         instructor_name = self.instructor_combobox.get()
         course_name = self.course_combobox.get()
 
-        instructor = next((i for i in self.instructors if i.name == instructor_name), None)
-        course = next((c for c in self.courses if c.course_name == course_name), None)
-
-        if instructor and course:
-            instructor.assign_course(course)
-            messagebox.showinfo("Success", f"Instructor {instructor_name} assigned to {course_name}")
-        else:
-            messagebox.showerror("Error", "Instructor or course not found")
+        try:
+            instructor = self.service.find("Instructor", name=instructor_name)
+            course = self.service.find("Course", name=course_name)
+        except LookupError:
+            self.dialog(messagebox.showerror, "Error", "Instructor or course not found")
+            return
+        try:
+            self.service.assign_instructor(instructor, course)
+        except (ValueError, LookupError, ConnectionError) as e:
+            self.dialog(messagebox.showerror, "Error", str(e))
+            return
+        self.dialog(messagebox.showinfo, "Success", f"Instructor {instructor_name} assigned to {course_name}")
 
     def display_all_records(self):
         """Displays all students, instructors, and courses in the Treeview."""
-        for row in self.tree.get_children():
-            self.tree.delete(row)
-
-        for student in self.students:
-            self.tree.insert("", "end", text="Student", values=(student.name, student.student_id))
+        self._searching = False
+        if self.storage is not None:
+            self.record_view.set_source(StorageRows(self.storage))
+            return
+        self.record_view.set_rows(
+            row for record_type in RECORD_TYPES for row in self.registry.rows(record_type)
+        )
+
+    def schedule_search(self, event=None):
+        """
+        Runs :meth:`search_records` once typing has paused.
 
-        for instructor in self.instructors:
-            self.tree.insert("", "end", text="Instructor", values=(instructor.name, instructor.instructor_id))
+        Each call cancels the previously scheduled search, so a burst of
+        keystrokes results in a single query.
+        """
+        if self._search_job is not None:
+            self.root.after_cancel(self._search_job)
+        self._search_job = self.root.after(SEARCH_DEBOUNCE_MS,
+                                          self.instrument("search_records", self.search_records))
 
-        for course in self.courses:
-            self.tree.insert("", "end", text="Course", values=(course.course_name, course.course_id))
+    def search_records(self, keep_offset=False):
+        """
+        Searches for records based on selected criteria and displays the result.
 
-    def search_records(self):
-        """Searches for records based on selected criteria and displays the result."""
+        :param keep_offset: Keep the scroll position, e.g. when re-running
+            the search after a change.
+        :type keep_offset: bool
+        """
+        self._search_job = None
         search_by = self.search_criteria.get()
-        search_value = self.search_entry.get().lower()
-
-        for row in self.tree.get_children():
-            self.tree.delete(row)
-
-        if search_by == "Name":
-            for student in self.students:
-                if search_value in student.name.lower():
-                    self.tree.insert("", "end", text="Student", values=(student.name, student.student_id))
-            for instructor in self.instructors:
-                if search_value in instructor.name.lower():
-                    self.tree.insert("", "end", text="Instructor", values=(instructor.name, instructor.instructor_id))
-        elif search_by == "ID":
-            for student in self.students:
-                if search_value in student.student_id.lower():
-                    self.tree.insert("", "end", text="Student", values=(student.name, student.student_id))
-            for instructor in self.instructors:
-                if search_value in instructor.instructor_id.lower():
-                    self.tree.insert("", "end", text="Instructor", values=(instructor.name, instructor.instructor_id))
-        elif search_by == "Course":
-            for course in self.courses:
-                if search_value in course.course_name.lower():
-                    self.tree.insert("", "end", text="Course", values=(course.course_name, course.course_id))
+        search_value = self.search_entry.get()
+
+        hits = self.service.search(search_by, search_value)
+        self._searching = True
+        self.record_view.set_source(ListRows.from_keys(hits, self.service.row), keep_offset)
 
     def update_comboboxes(self):
-        """Updates comboboxes with current values of students, instructors, and courses."""
-        self.student_combobox["values"] = [s.name for s in self.students]
-        self.course_combobox["values"] = [c.course_name for c in self.courses]
-        self.instructor_combobox["values"] = [i.name for i in self.instructors]
+        """Schedules a refresh of the student, instructor and course comboboxes."""
+        self.refresh.mark_dirty("Student", "Instructor", "Course")
+
+    def refresh_combobox(self, combobox, record_type):
+        """
+        Rebuilds the dropdown values of a registration combobox.
+
+        At most :data:`MAX_COMBOBOX_VALUES` names are pushed into Tk. When
+        the user has typed into the combobox, the names are filtered through
+        the search index to those containing the typed text.
+
+        :param combobox: The combobox to refresh.
+        :type combobox: ttk.Combobox
+        :param record_type: The record type listed by the combobox.
+        :type record_type: str
+        """
+        text = combobox.get()
+        if not text:
+            combobox["values"] = self.registry.names(record_type, MAX_COMBOBOX_VALUES)
+            return
+        names = {}
+        for hit_type, record_id in self.search_index.search_names((record_type,), text, MAX_COMBOBOX_VALUES):
+            record = self.registry.get(hit_type, record_id)
+            if record is not None:
+                names[record.display_name] = None
+        combobox["values"] = list(names)
+
+    def _on_registry_change(self, event, record_type, record):
+        if event in ("add", "remove"):
+            self.refresh.mark_dirty(record_type)
+        elif event in ("clear", "reset"):
+            self.update_comboboxes()
+        if not self.remote:
+            return
+        # Server changes reach the mirror registry one by one; keep the view in step.
+        if event == "begin":
+            self._batch_depth += 1
+        elif event == "end":
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self.display_all_records()
+        elif self._batch_depth:
+            return
+        elif event == "add":
+            self._show_record(record_type, record.display_name, record.record_id)
+        elif event == "remove":
+            self.record_view.delete_row(record_type, record.record_id)
+        elif event in ("clear", "reset"):
+            self.display_all_records()
+
+    def _poll_remote(self):
+        try:
+            self.service.sync()
+        except ConnectionError as e:
+            self.dialog(messagebox.showerror, "Error", f"{e} Changes can no longer be saved.")
+            return
+        self.root.after(REMOTE_POLL_MS, self._poll_remote)
 
     def edit_record(self):
         """Allows editing of selected student, instructor, or course record."""
-        selected_item = self.tree.selection()
-        if selected_item:
-            record = self.tree.item(selected_item)
-            record_type = record["text"]
-            record_values = record["values"]
+        selected_key = self.record_view.selected_key()
+        if selected_key:
+            record_type, record_id = selected_key
+            try:
+                record = self.service.edit(record_type, record_id)
+            except (ValueError, ConnectionError) as e:
+                self.dialog(messagebox.showerror, "Error", str(e))
+                return
+            self.record_view.delete_row(record_type, record_id)
 
             if record_type == "Student":
-                student = next((s for s in self.students if s.student_id == record_values[1]), None)
+                student = record
                 if student:
                     self.student_name_entry.delete(0, tk.END)
                     self.student_name_entry.insert(0, student.name)
@@ -302,9 +495,8 @@ class SchoolManagementApp:
                     self.student_email_entry.insert(0, student.get_email())
                     self.student_id_entry.delete(0, tk.END)
                     self.student_id_entry.insert(0, student.student_id)
-                    self.students.remove(student)
             elif record_type == "Instructor":
-                instructor = next((i for i in self.instructors if i.instructor_id == record_values[1]), None)
+                instructor = record
                 if instructor:
                     self.instructor_name_entry.delete(0, tk.END)
                     self.instructor_name_entry.insert(0, instructor.name)
@@ -314,71 +506,234 @@ class SchoolManagementApp:
                     self.instructor_email_entry.insert(0, instructor.get_email())
                     self.instructor_id_entry.delete(0, tk.END)
                     self.instructor_id_entry.insert(0, instructor.instructor_id)
-                    self.instructors.remove(instructor)
             elif record_type == "Course":
-                course = next((c for c in self.courses if c.course_id == record_values[1]), None)
+                course = record
                 if course:
                     self.course_name_entry.delete(0, tk.END)
                     self.course_name_entry.insert(0, course.course_name)
                     self.course_id_entry.delete(0, tk.END)
                     self.course_id_entry.insert(0, course.course_id)
-                    self.courses.remove(course)
 
     def delete_record(self):
         """Deletes the selected student, instructor, or course record."""
-        selected_item = self.tree.selection()
-        if selected_item:
-            record = self.tree.item(selected_item)
-            record_type = record["text"]
-            record_values = record["values"]
+        selected_key = self.record_view.selected_key()
+        if selected_key:
+            record_type, record_id = selected_key
+            try:
+                self.service.remove(record_type, record_id)
+            except (ValueError, ConnectionError) as e:
+                self.dialog(messagebox.showerror, "Error", str(e))
+                return
+            self.record_view.delete_row(record_type, record_id)
+            self.dialog(messagebox.showinfo, "Success", f"{record_type} record deleted.")
 
-            if record_type == "Student":
-                student = next((s for s in self.students if s.student_id == record_values[1]), None)
-                if student:
-                    self.students.remove(student)
-            elif record_type == "Instructor":
-                instructor = next((i for i in self.instructors if i.instructor_id == record_values[1]), None)
-                if instructor:
-                    self.instructors.remove(instructor)
-            elif record_type == "Course":
-                course = next((c for c in self.courses if c.course_id == record_values[1]), None)
-                if course:
-                    self.courses.remove(course)
+    def save_data(self):
+        """
+        Saves the current data to a newline-delimited JSON file, one record per line.
 
-            self.tree.delete(selected_item)
-            messagebox.showinfo("Success", f"{record_type} record deleted.")
+        The registry is snapshotted on the main thread and written by the
+        background I/O worker, so edits made while the save runs are not
+        mixed into the file. With a journal, saving only syncs the journaled
+        changes, and compacts the journal if it has grown large. With a binary
+        snapshot backend, a new snapshot is written and mapped in its place.
+        """
+        if self.service.journal is not None:
+            self.service.commit()
+            if self.service.compaction_due():
+                self.compact_data()
+            else:
+                self.dialog(messagebox.showinfo, "Success", "Data saved successfully!")
+            return
+        # A server saves its own data; there is nothing to capture here.
+        entries = None if self.remote else self.service.snapshot()
+        path = self.service.data_path
+        self.io_executor.submit(
+            "Saving",
+            self.instrument("io.save", lambda task: self.service.save(entries, path, task.report)),
+            on_done=self.instrument("io.save.done", lambda count: self._on_save_done(entries, path)),
+            on_error=lambda e: self._on_io_error(f"Error saving data: {e}"),
+            on_progress=self._on_io_progress,
+            on_cancel=self._on_io_cancel,
+        )
+        self.io_status.config(text="Saving...")
+
+    def compact_data(self):
+        """
+        Folds the journal into a new snapshot.
 
-    def save_data(self):
-        """Saves the current data to a JSON file."""
-        try:
-            data = {
-                "students": [s.__dict__ for s in self.students],
-                "instructors": [i.__dict__ for i in self.instructors],
-                "courses": [c.__dict__ for c in self.courses]
-            }
-            with open("school_data.json", "w") as file:
-                json.dump(data, file, indent=4)
-            messagebox.showinfo("Success", "Data saved successfully!")
-        except Exception as e:
-            messagebox.showerror("Error", f"Error saving data: {e}")
+        Later changes go to a fresh journal while the background I/O worker
+        writes the snapshot, so editing can continue meanwhile.
+        """
+        entries = self.service.begin_compaction()
+        path = self.service.journal.data_path
+        self.io_executor.submit(
+            "Compacting",
+            self.instrument("io.compact", lambda task: self.service.save(entries, path, task.report)),
+            on_done=lambda count: self._on_compacted(),
+            on_error=lambda e: self._on_io_error(f"Error compacting data: {e}"),
+            on_progress=self._on_io_progress,
+            on_cancel=self._on_io_cancel,
+        )
+        self.io_status.config(text="Compacting...")
+
+    def _on_compacted(self):
+        self.service.finish_compaction()
+        self.io_status.config(text="")
+
+    def _sync_journal(self):
+        self.service.commit()
+        if self.service.compaction_due() and not self.io_executor.busy:
+            self.compact_data()
+        self.root.after(JOURNAL_SYNC_MS, self._sync_journal)
 
     def load_data(self):
-        """Loads data from a JSON file into the system."""
-        try:
-            with open("school_data.json", "r") as file:
-                data = json.load(file)
-                self.students = [Student(**s) for s in data["students"]]
-                self.instructors = [Instructor(**i) for i in data["instructors"]]
-                self.courses = [Course(**c) for c in data["courses"]]
-            messagebox.showinfo("Success", "Data loaded successfully!")
-            self.display_all_records()  
-        except FileNotFoundError:
-            messagebox.showerror("Error", "No saved data found.")
-        except Exception as e:
-            messagebox.showerror("Error", f"Error loading data: {e}")
+        """
+        Loads data from the newline-delimited JSON file into the system.
+
+        Falls back to the whole-document ``school_data.json`` written by
+        earlier versions when no newline-delimited file exists yet. The file
+        is parsed and validated by the background I/O worker into a separate
+        registry, which replaces the current records in one step once
+        complete; conflicts such as repeated emails are then reported. With
+        a journal, the snapshot is loaded and the journal replayed. A binary
+        snapshot backend maps its file again, which takes no time, but not
+        while a save of it is running, and a server client downloads the
+        server data again.
+        """
+        path = self.service.data_path
+        if isinstance(self.storage, SnapshotStorage) and self.io_executor.busy:
+            self.dialog(messagebox.showerror, "Error", "Please wait for the running task to finish before loading.")
+            return
+        if isinstance(self.storage, SnapshotStorage) or self.remote:
+            self.service.load(path)
+            self.dialog(messagebox.showinfo, "Success", "Data loaded successfully!")
+            self.display_all_records()
+            return
+        self.service.commit()
+        self.io_executor.submit(
+            "Loading",
+            self.instrument("io.load", lambda task: self._read_data(path, task)),
+            on_done=self.instrument("io.load.done", self._on_load_done),
+            on_error=self._on_load_error,
+            on_progress=self._on_io_progress,
+            on_cancel=self._on_io_cancel,
+        )
+        self.io_status.config(text="Loading...")
+
+    def _read_data(self, path, task):
+        loaded = self.service.read(path, task.report)
+        return loaded, self.service.validate(loaded)
+
+    def import_roster(self):
+        """
+        Imports a CSV or NDJSON roster file chosen by the user.
+
+        The file is validated by the background I/O worker; valid rows are
+        then added in one batch, followed by a single refresh of the view
+        and comboboxes.
+        """
+        path = self.dialog(filedialog.askopenfilename, filetypes=[("Roster files", "*.csv *.ndjson *.jsonl"), ("All files", "*")])
+        if not path:
+            return
+        self.io_executor.submit(
+            "Importing",
+            self.instrument("io.import", lambda task: self.service.validate_file(path, progress=task.report)),
+            on_done=self.instrument("io.import.done", self._on_import_validated),
+            on_error=lambda e: self._on_io_error(f"Error importing roster: {e}"),
+            on_progress=self._on_io_progress,
+            on_cancel=self._on_io_cancel,
+        )
+        self.io_status.config(text="Importing...")
+
+    def _on_import_validated(self, result):
+        self.service.commit_import(result)
+        self.io_status.config(text="")
+        self.display_all_records()
+        message = result.summary()
+        if result.errors or result.warnings:
+            details = "\n".join(f"line {line}: {message}" for line, message in (result.errors + result.warnings)[:10])
+            self.dialog(messagebox.showwarning, "Import", f"{message}\n\n{details}")
+        else:
+            self.dialog(messagebox.showinfo, "Import", message)
+
+    def export_roster(self):
+        """Exports every record to a CSV or NDJSON file chosen by the user."""
+        path = self.dialog(filedialog.asksaveasfilename, defaultextension=".csv",
+                                            filetypes=[("CSV", "*.csv"), ("NDJSON", "*.ndjson")])
+        if not path:
+            return
+        entries = self.service.snapshot()
+        self.io_executor.submit(
+            "Exporting",
+            self.instrument("io.export", lambda task: self.service.export_file(path, entries=entries)),
+            on_done=lambda count: self._on_io_done(f"Exported {count} records."),
+            on_error=lambda e: self._on_io_error(f"Error exporting roster: {e}"),
+            on_cancel=self._on_io_cancel,
+        )
+        self.io_status.config(text="Exporting...")
+
+    def _on_io_done(self, message):
+        self.io_status.config(text="")
+        self.dialog(messagebox.showinfo, "Success", message)
+
+    def _on_save_done(self, entries, path):
+        self.service.saved(entries, path)
+        self.io_status.config(text="")
+        self.dialog(messagebox.showinfo, "Success", "Data saved successfully!")
+
+    def _on_load_done(self, result):
+        loaded, report = result
+        self.service.replace(loaded)
+        self.io_status.config(text="")
+        if report.errors:
+            details = "\n".join(f"{key}: {error}" for key, error in report.errors[:10])
+            self.dialog(messagebox.showwarning, "Success", f"Data loaded with conflicts: {report.summary()}\n\n{details}")
+        else:
+            self.dialog(messagebox.showinfo, "Success", "Data loaded successfully!")
+        self.display_all_records()
+
+    def _on_load_error(self, error):
+        if isinstance(error, FileNotFoundError):
+            self._on_io_error("No saved data found.")
+        else:
+            self._on_io_error(f"Error loading data: {error}")
+
+    def _on_io_error(self, message):
+        self.io_status.config(text="")
+        self.dialog(messagebox.showerror, "Error", message)
+
+    def _on_io_progress(self, task, done, total):
+        if total:
+            self.io_status.config(text=f"{task.name}... {100 * done // total}%")
+
+    def _on_io_cancel(self, task):
+        self.io_status.config(text=f"{task.name} cancelled.")
 
 # Run the application
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="School Management System")
+    parser.add_argument("--db", help="SQLite database file to use as storage")
+    parser.add_argument("--snapshot", help="binary snapshot file to open memory-mapped and save to")
+    parser.add_argument("--connect", metavar="HOST:PORT",
+                        help="work on the data of a running server (see server.py) instead of a local file")
+    parser.add_argument("--instrument", action="store_true", help="record handler latencies from startup")
+    parser.add_argument("--journal", action="store_true",
+                        help="journal every change next to the data file instead of saving it whole")
+    args = parser.parse_args()
+
+    if args.db:
+        storage = SQLiteStorage(args.db)
+    elif args.snapshot:
+        storage = SnapshotStorage(args.snapshot)
+    else:
+        storage = None
+
+    service = None
+    if args.connect:
+        host, _, port = args.connect.rpartition(":")
+        service = RemoteService(SchoolClient(host or HOST, int(port)))
+
     root = tk.Tk()
-    app = SchoolManagementApp(root)
-    root.mainloop()
\ No newline at end of file
+    app = SchoolManagementApp(root, storage, args.instrument,
+                              Journal() if args.journal else None, service)
+    root.mainloop()
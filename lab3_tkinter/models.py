@@ -0,0 +1,322 @@
+def parse_age(value):
+    """
+    Parses an age entered in a form or read from an imported file.
+
+    :param value: The raw value.
+    :type value: str or int
+    :return: The age in years.
+    :rtype: int
+    :raises ValueError: If the value is not a valid integer.
+    """
+    return int(value)
+
+
+class Person:
+    """
+    Base class for every person tracked by the school system.
+
+    Records use ``__slots__`` instead of a per-instance ``__dict__`` and
+    refer to courses by ID rather than embedding :class:`Course` objects,
+    so large rosters stay compact.
+
+    :param name: The person's full name.
+    :type name: str
+    :param age: The person's age in years.
+    :type age: int
+    :param email: The person's contact email.
+    :type email: str
+    """
+
+    __slots__ = ("name", "age", "email")
+
+    def __init__(self, name, age, email):
+        self.name = name
+        self.age = age
+        self.email = email
+
+    def get_email(self):
+        """
+        Returns the person's email address.
+
+        :return: The email address.
+        :rtype: str
+        """
+        return self.email
+
+    @property
+    def display_name(self):
+        """The name shown for this record in comboboxes and the Treeview."""
+        return self.name
+
+
+class Student(Person):
+    """
+    A student who can register to courses.
+
+    :param student_id: Unique identifier of the student.
+    :type student_id: str
+    :param course_ids: IDs of the courses the student is registered to.
+    :type course_ids: tuple[str]
+
+    The course ID tuple is replaced, never mutated, so a tuple captured by
+    a snapshot never changes afterwards.
+    """
+
+    __slots__ = ("student_id", "course_ids")
+
+    def __init__(self, name, age, email, student_id, course_ids=()):
+        super().__init__(name, age, email)
+        self.student_id = student_id
+        self.course_ids = tuple(course_ids)
+
+    @property
+    def record_id(self):
+        """The key the registry indexes this student by."""
+        return self.student_id
+
+    @property
+    def enrolled_courses(self):
+        """IDs of the courses the student is registered to."""
+        return self.course_ids
+
+    def register_course(self, course):
+        """
+        Registers the student to a course.
+
+        :param course: The course to register to.
+        :type course: Course
+        """
+        if course.course_id not in self.course_ids:
+            self.course_ids = self.course_ids + (course.course_id,)
+
+    def drop_course(self, course_id):
+        """
+        Unregisters the student from a course, if registered.
+
+        :param course_id: The ID of the course.
+        :type course_id: str
+        """
+        if course_id in self.course_ids:
+            self.course_ids = tuple(c for c in self.course_ids if c != course_id)
+
+    def to_dict(self, course_ids=None):
+        """
+        Serializes the student.
+
+        :param course_ids: Course IDs to serialize instead of the current
+            registrations, e.g. ones captured by a snapshot.
+        :type course_ids: tuple[str]
+        :return: A JSON-compatible dictionary.
+        :rtype: dict
+        """
+        return {
+            "name": self.name,
+            "age": self.age,
+            "email": self.email,
+            "student_id": self.student_id,
+            "registered_courses": list(self.course_ids if course_ids is None else course_ids),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Builds a student from :meth:`to_dict` output.
+
+        :type data: dict
+        :rtype: Student
+        """
+        return cls(data["name"], data["age"], data["email"], data["student_id"],
+                   data.get("registered_courses", ()))
+
+    def to_row(self):
+        """
+        Serializes the student as a flat tuple.
+
+        :return: ``(name, age, email, student_id, course_ids)``.
+        :rtype: tuple
+        """
+        return self.name, self.age, self.email, self.student_id, self.course_ids
+
+    @classmethod
+    def from_row(cls, row):
+        """
+        Builds a student from :meth:`to_row` output.
+
+        :type row: tuple
+        :rtype: Student
+        """
+        return cls(*row)
+
+
+class Instructor(Person):
+    """
+    An instructor who can be assigned to courses.
+
+    :param instructor_id: Unique identifier of the instructor.
+    :type instructor_id: str
+    :param course_ids: IDs of the courses the instructor teaches.
+    :type course_ids: tuple[str]
+
+    The course ID tuple is replaced, never mutated, like
+    :attr:`Student.course_ids`.
+    """
+
+    __slots__ = ("instructor_id", "course_ids")
+
+    def __init__(self, name, age, email, instructor_id, course_ids=()):
+        super().__init__(name, age, email)
+        self.instructor_id = instructor_id
+        self.course_ids = tuple(course_ids)
+
+    @property
+    def record_id(self):
+        """The key the registry indexes this instructor by."""
+        return self.instructor_id
+
+    @property
+    def enrolled_courses(self):
+        """IDs of the courses the instructor is assigned to."""
+        return self.course_ids
+
+    def assign_course(self, course):
+        """
+        Assigns the instructor to a course.
+
+        :param course: The course to teach.
+        :type course: Course
+        """
+        if course.course_id not in self.course_ids:
+            self.course_ids = self.course_ids + (course.course_id,)
+
+    def drop_course(self, course_id):
+        """
+        Unassigns the instructor from a course, if assigned.
+
+        :param course_id: The ID of the course.
+        :type course_id: str
+        """
+        if course_id in self.course_ids:
+            self.course_ids = tuple(c for c in self.course_ids if c != course_id)
+
+    def to_dict(self, course_ids=None):
+        """
+        Serializes the instructor.
+
+        :param course_ids: Course IDs to serialize instead of the current
+            assignments, e.g. ones captured by a snapshot.
+        :type course_ids: tuple[str]
+        :return: A JSON-compatible dictionary.
+        :rtype: dict
+        """
+        return {
+            "name": self.name,
+            "age": self.age,
+            "email": self.email,
+            "instructor_id": self.instructor_id,
+            "assigned_courses": list(self.course_ids if course_ids is None else course_ids),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Builds an instructor from :meth:`to_dict` output.
+
+        :type data: dict
+        :rtype: Instructor
+        """
+        return cls(data["name"], data["age"], data["email"], data["instructor_id"],
+                   data.get("assigned_courses", ()))
+
+    def to_row(self):
+        """
+        Serializes the instructor as a flat tuple.
+
+        :return: ``(name, age, email, instructor_id, course_ids)``.
+        :rtype: tuple
+        """
+        return self.name, self.age, self.email, self.instructor_id, self.course_ids
+
+    @classmethod
+    def from_row(cls, row):
+        """
+        Builds an instructor from :meth:`to_row` output.
+
+        :type row: tuple
+        :rtype: Instructor
+        """
+        return cls(*row)
+
+
+class Course:
+    """
+    A course offered by the school.
+
+    :param course_id: Unique identifier of the course.
+    :type course_id: str
+    :param course_name: Human-readable name of the course.
+    :type course_name: str
+    """
+
+    __slots__ = ("course_id", "course_name")
+
+    def __init__(self, course_id, course_name):
+        self.course_id = course_id
+        self.course_name = course_name
+
+    @property
+    def record_id(self):
+        """The key the registry indexes this course by."""
+        return self.course_id
+
+    @property
+    def display_name(self):
+        """The name shown for this record in comboboxes and the Treeview."""
+        return self.course_name
+
+    @property
+    def enrolled_courses(self):
+        """Courses have no enrollments of their own; always ``None``."""
+        return None
+
+    def to_dict(self, course_ids=None):
+        """
+        Serializes the course.
+
+        :param course_ids: Ignored; accepted for symmetry with people records.
+        :return: A JSON-compatible dictionary.
+        :rtype: dict
+        """
+        return {"course_id": self.course_id, "course_name": self.course_name}
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Builds a course from :meth:`to_dict` output.
+
+        :type data: dict
+        :rtype: Course
+        """
+        return cls(data["course_id"], data["course_name"])
+
+    def to_row(self):
+        """
+        Serializes the course as a flat tuple.
+
+        :return: ``(course_id, course_name)``.
+        :rtype: tuple
+        """
+        return self.course_id, self.course_name
+
+    @classmethod
+    def from_row(cls, row):
+        """
+        Builds a course from :meth:`to_row` output.
+
+        :type row: tuple
+        :rtype: Course
+        """
+        return cls(*row)
+
+
+#: Record class for each record type.
+RECORD_CLASSES = {"Student": Student, "Instructor": Instructor, "Course": Course}
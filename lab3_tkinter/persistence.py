@@ -0,0 +1,158 @@
+import json
+import os
+
+from registry import Registry
+
+#: Default data file, one JSON record per line.
+DATA_FILE = "school_data.ndjson"
+
+#: Whole-document JSON file written by earlier versions of the app.
+LEGACY_DATA_FILE = "school_data.json"
+
+#: Order in which record types are written, so course references resolve on load.
+WRITE_ORDER = ("Course", "Student", "Instructor")
+
+
+#: Number of records processed between two progress reports.
+PROGRESS_INTERVAL = 1000
+
+
+def snapshot(registry):
+    """
+    Captures the current content of a registry for serialization.
+
+    Only references are copied: records are never mutated in place except
+    for their course ID tuples, which are replaced on change and captured
+    alongside each record. Later edits to the registry therefore do not leak into a save
+    that serializes the snapshot, e.g. from a background thread.
+
+    :param registry: The registry to capture.
+    :type registry: registry.Registry
+    :return: List of ``(record_type, record, course_ids)`` entries in write order.
+    :rtype: list[tuple]
+    """
+    return [
+        (record_type, record, record.enrolled_courses)
+        for record_type in WRITE_ORDER
+        for record in registry.records(record_type)
+    ]
+
+
+def iter_lines(entries):
+    """
+    Yields snapshot entries as newline-terminated JSON records.
+
+    Each line is a record's ``to_dict`` preceded by a ``type`` field.
+
+    :param entries: Entries produced by :func:`snapshot`.
+    :type entries: list[tuple]
+    """
+    encode = json.JSONEncoder(separators=(",", ":")).encode
+    for record_type, record, course_ids in entries:
+        yield encode({"type": record_type, **record.to_dict(course_ids)}) + "\n"
+
+
+def save(source, path=DATA_FILE, progress=None):
+    """
+    Writes records to a newline-delimited JSON file.
+
+    Records are encoded and written one at a time, so memory use does not
+    grow with the dataset. The file is written next to ``path`` and moved
+    into place once complete, so an interrupted save never truncates the
+    previous data.
+
+    :param source: A registry, or entries produced by :func:`snapshot`.
+    :param path: Destination file.
+    :type path: str
+    :param progress: Optional ``progress(done, total)`` callback, called
+        every :data:`PROGRESS_INTERVAL` records. Raising from it aborts the
+        save and leaves the previous file untouched.
+    :type progress: callable
+    :return: Number of records written.
+    :rtype: int
+    """
+    if isinstance(source, Registry):
+        source = snapshot(source)
+    total = len(source)
+    temp_path = path + ".tmp"
+    count = 0
+    try:
+        with open(temp_path, "w", encoding="utf-8") as file:
+            for line in iter_lines(source):
+                file.write(line)
+                count += 1
+                if progress is not None and count % PROGRESS_INTERVAL == 0:
+                    progress(count, total)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    if progress is not None:
+        progress(count, total)
+    return count
+
+
+def iter_records(path=DATA_FILE, progress=None):
+    """
+    Reads a newline-delimited JSON file one record at a time.
+
+    :param path: The file to read.
+    :type path: str
+    :param progress: Optional ``progress(bytes_read, total_bytes)`` callback,
+        called every :data:`PROGRESS_INTERVAL` records.
+    :type progress: callable
+    :return: Iterator of ``(record_type, data)`` pairs.
+    :raises ValueError: If a line is not a valid record.
+    """
+    total = os.path.getsize(path)
+    done = 0
+    with open(path, "rb") as file:
+        for line_number, line in enumerate(file, 1):
+            done += len(line)
+            if progress is not None and line_number % PROGRESS_INTERVAL == 0:
+                progress(done, total)
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+                record_type = data.pop("type")
+            except (ValueError, KeyError, AttributeError) as e:
+                raise ValueError(f"{path}:{line_number}: invalid record ({e})")
+            yield record_type, data
+    if progress is not None:
+        progress(done, total)
+
+
+def load(path=DATA_FILE, progress=None):
+    """
+    Builds a new registry from a newline-delimited JSON file.
+
+    :param path: The file to read.
+    :type path: str
+    :param progress: Optional callback, see :func:`iter_records`.
+    :type progress: callable
+    :return: The loaded registry.
+    :rtype: registry.Registry
+    :raises FileNotFoundError: If the file does not exist.
+    """
+    registry = Registry()
+    for record_type, data in iter_records(path, progress):
+        registry.load_record(record_type, data)
+    return registry
+
+
+def load_legacy(path=LEGACY_DATA_FILE):
+    """
+    Builds a new registry from a whole-document JSON file.
+
+    :param path: The file to read.
+    :type path: str
+    :return: The loaded registry.
+    :rtype: registry.Registry
+    :raises FileNotFoundError: If the file does not exist.
+    """
+    registry = Registry()
+    with open(path, "r", encoding="utf-8") as file:
+        registry.load_dict(json.load(file))
+    return registry
@@ -0,0 +1,330 @@
+import tkinter as tk
+from collections.abc import Sequence
+from tkinter import ttk
+
+
+class ListRows:
+    """
+    In-memory row source for :class:`RecordView`, supporting row-level diffs.
+
+    :param rows: Iterable of ``(record_type, name, record_id)`` tuples.
+    """
+
+    def __init__(self, rows=()):
+        self.keys = []
+        self.rows = {}
+        self.resolve = None
+        self._positions = None
+        for row in rows:
+            key = (row[0], str(row[2]))
+            if key not in self.rows:
+                self.keys.append(key)
+            self.rows[key] = row
+
+    @classmethod
+    def from_keys(cls, keys, resolve):
+        """
+        Builds a source over row keys whose rows are only built when shown.
+
+        A sequence of keys, such as :class:`search_index.SearchHits`, is kept
+        as is and only read a page at a time; it is copied into a list, with
+        a dict of the key positions, the first time the view looks a key up
+        or edits the rows.
+
+        :param keys: Sequence or iterable of ``(record_type, record_id)`` keys
+            with string IDs.
+        :param resolve: Called with a key to build its row; may return
+            ``None`` for records that no longer exist.
+        :type resolve: callable
+        """
+        source = cls()
+        source.keys = keys if isinstance(keys, Sequence) else list(keys)
+        source.resolve = resolve
+        return source
+
+    def __len__(self):
+        return len(self.keys)
+
+    def page(self, offset, limit):
+        """Returns up to ``limit`` rows starting at ``offset``."""
+        rows = []
+        for key in self.keys[offset:offset + limit]:
+            row = self.rows.get(key)
+            if row is None and self.resolve is not None:
+                row = self.resolve(key)
+            if row is not None:
+                rows.append(row)
+        return rows
+
+    def _index(self):
+        if self._positions is None:
+            if not isinstance(self.keys, list):
+                self.keys = list(self.keys)
+            self._positions = {key: position for position, key in enumerate(self.keys)}
+        return self._positions
+
+    def contains(self, key):
+        """Returns whether a row key is part of the source."""
+        if self.resolve is None:
+            # Every row was given up front.
+            return key in self.rows
+        return key in self._index()
+
+    def position(self, key):
+        """Returns the position of a row key, or ``None``."""
+        return self._index().get(key)
+
+    def append(self, row):
+        """
+        Appends a row whose key is not part of the source yet.
+
+        :param row: A ``(record_type, name, record_id)`` tuple.
+        """
+        key = (row[0], str(row[2]))
+        positions = self._index()
+        positions[key] = len(self.keys)
+        self.keys.append(key)
+        self.rows[key] = row
+
+    def remove(self, key):
+        """
+        Removes a row key from the source.
+
+        :return: The position it had, or ``None`` if it was not present.
+        """
+        position = self.position(key)
+        if position is not None:
+            del self.keys[position]
+            self.rows.pop(key, None)
+            # The later keys moved up; the positions are rebuilt on the next lookup.
+            self._positions = None
+        return position
+
+
+class RecordView:
+    """
+    Virtualized Treeview of school records.
+
+    Rows come from a row source and only the rows that fit in the viewport
+    are materialized as Treeview items. Scrolling rewrites those few items
+    in place, and additions, edits and deletions are applied as row-level
+    diffs instead of rebuilding the widget.
+
+    Rows are ``(record_type, name, record_id)`` tuples and are identified
+    by their ``(record_type, record_id)`` key. A row source is any object
+    with ``__len__`` and ``page(offset, limit)``; :meth:`set_rows` wraps
+    plain rows in a :class:`ListRows`, while lazy sources such as
+    :class:`storage.StorageRows` are installed with :meth:`set_source` and
+    only read one page at a time.
+
+    :param master: The parent widget.
+    :param height: Number of visible rows.
+    :type height: int
+    """
+
+    def __init__(self, master, height=10):
+        self.frame = tk.Frame(master)
+        self.tree = ttk.Treeview(self.frame, columns=("Type", "Name", "ID"), height=height)
+        self.tree.heading("#0", text="Type")
+        self.tree.heading("Name", text="Name")
+        self.tree.heading("ID", text="ID")
+        self.tree.grid(row=0, column=0, sticky="nsew")
+
+        self.scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self._on_scroll)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+
+        self.height = height
+        self._source = ListRows()
+        self._total = 0
+        self._offset = 0
+        self._visible = []
+        self._slots = []
+        self._selected_key = None
+
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda event: self.scroll_by(-3))
+        self.tree.bind("<Button-5>", lambda event: self.scroll_by(3))
+
+    def grid(self, **kwargs):
+        """Places the view with the grid geometry manager."""
+        self.frame.grid(**kwargs)
+
+    def __len__(self):
+        return self._total
+
+    def set_rows(self, rows):
+        """
+        Replaces every row of the view.
+
+        :param rows: Iterable of ``(record_type, name, record_id)`` tuples.
+        """
+        self.set_source(ListRows(rows))
+
+    def set_source(self, source, keep_offset=False):
+        """
+        Replaces the row source of the view and scrolls back to the top.
+
+        :param source: An object with ``__len__`` and ``page(offset, limit)``.
+        :param keep_offset: Stay at the current scroll position instead.
+        :type keep_offset: bool
+        """
+        self._source = source
+        if not keep_offset:
+            self._offset = 0
+        self.refresh()
+
+    def refresh(self):
+        """Re-reads the visible page from the row source."""
+        self._total = len(self._source)
+        self._render()
+
+    def insert_row(self, record_type, name, record_id):
+        """
+        Appends a row, or updates it if the key is already shown.
+
+        With a lazy source, the change is expected to be in the source
+        already and the visible page is simply re-read.
+
+        :param record_type: One of ``"Student"``, ``"Instructor"`` or ``"Course"``.
+        :type record_type: str
+        :param name: The record display name.
+        :type name: str
+        :param record_id: The record ID.
+        """
+        source = self._source
+        if not isinstance(source, ListRows):
+            self.refresh()
+            return
+        key = (record_type, str(record_id))
+        if source.contains(key):
+            self.update_row(record_type, name, record_id)
+            return
+        source.append((record_type, name, record_id))
+        self._total += 1
+        if self._total - 1 < self._offset + self.height:
+            self._render()
+        else:
+            self._update_scrollbar()
+
+    def update_row(self, record_type, name, record_id):
+        """
+        Updates the name of a row already in the view.
+
+        :param record_type: One of ``"Student"``, ``"Instructor"`` or ``"Course"``.
+        :type record_type: str
+        :param name: The new display name.
+        :type name: str
+        :param record_id: The record ID.
+        """
+        source = self._source
+        if not isinstance(source, ListRows):
+            self.refresh()
+            return
+        key = (record_type, str(record_id))
+        if not source.contains(key):
+            return
+        source.rows[key] = (record_type, name, record_id)
+        if key in self._visible_keys():
+            self._render()
+
+    def delete_row(self, record_type, record_id):
+        """
+        Removes a row from the view if it is present.
+
+        :param record_type: One of ``"Student"``, ``"Instructor"`` or ``"Course"``.
+        :type record_type: str
+        :param record_id: The record ID.
+        """
+        key = (record_type, str(record_id))
+        if key == self._selected_key:
+            self._selected_key = None
+        source = self._source
+        if not isinstance(source, ListRows):
+            self.refresh()
+            return
+        position = source.remove(key)
+        if position is None:
+            return
+        self._total -= 1
+        if position < self._offset:
+            self._offset -= 1
+        if position < self._offset + self.height:
+            self._render()
+        else:
+            self._update_scrollbar()
+
+    def selected_key(self):
+        """
+        Returns the ``(record_type, record_id)`` key of the selected row.
+
+        :return: The key, or ``None`` if nothing is selected.
+        """
+        return self._selected_key
+
+    def scroll_by(self, rows):
+        """
+        Scrolls the viewport by a number of rows.
+
+        :param rows: Rows to scroll; negative values scroll up.
+        :type rows: int
+        """
+        self._scroll_to(self._offset + rows)
+
+    def _scroll_to(self, offset):
+        offset = max(0, min(offset, self._total - self.height))
+        if offset != self._offset:
+            self._offset = offset
+            self._render()
+
+    def _visible_keys(self):
+        return [(row[0], str(row[2])) for row in self._visible]
+
+    def _render(self):
+        self._offset = max(0, min(self._offset, self._total - self.height))
+        self._visible = self._source.page(self._offset, self.height)
+        for index, (record_type, name, record_id) in enumerate(self._visible):
+            if index < len(self._slots):
+                slot = self._slots[index]
+                self.tree.item(slot, text=record_type, values=(name, record_id))
+            else:
+                slot = self.tree.insert("", "end", text=record_type, values=(name, record_id))
+                self._slots.append(slot)
+        while len(self._slots) > len(self._visible):
+            self.tree.delete(self._slots.pop())
+
+        visible_keys = self._visible_keys()
+        selected_slot = ()
+        if self._selected_key in visible_keys:
+            selected_slot = (self._slots[visible_keys.index(self._selected_key)],)
+        if tuple(self.tree.selection()) != selected_slot:
+            self.tree.selection_set(selected_slot)
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        total = self._total
+        if total <= self.height:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self._offset / total, (self._offset + self.height) / total)
+
+    def _on_scroll(self, action, *args):
+        if action == "moveto":
+            self._scroll_to(int(float(args[0]) * self._total))
+        elif action == "scroll":
+            amount = int(args[0])
+            if args[1] == "pages":
+                amount *= self.height
+            self.scroll_by(amount)
+
+    def _on_mousewheel(self, event):
+        self.scroll_by(-1 if event.delta > 0 else 1)
+
+    def _on_select(self, event):
+        selection = self.tree.selection()
+        if not selection or selection[0] not in self._slots:
+            return
+        index = self._slots.index(selection[0])
+        if index < len(self._visible):
+            row = self._visible[index]
+            self._selected_key = (row[0], str(row[2]))
@@ -0,0 +1,50 @@
+class RefreshScheduler:
+    """
+    Coalesces view refreshes into one pass per Tk event-loop turn.
+
+    Views are registered under a name with a refresh callback. Marking a
+    view dirty schedules a single ``after_idle`` flush, however many
+    changes happen before it runs; the flush then calls the callback of
+    each dirty view once.
+
+    :param root: The Tk root window.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._views = {}
+        self._dirty = set()
+        self._job = None
+
+    def register(self, name, callback):
+        """
+        Registers a view.
+
+        :param name: The view name, used with :meth:`mark_dirty`.
+        :type name: str
+        :param callback: Called without arguments to refresh the view.
+        :type callback: callable
+        """
+        self._views[name] = callback
+
+    def mark_dirty(self, *names):
+        """
+        Schedules the given views for the next flush.
+
+        :param names: View names; all registered views if none are given.
+        :type names: str
+        """
+        self._dirty.update(names or self._views)
+        if self._job is None:
+            self._job = self.root.after_idle(self.flush)
+
+    def flush(self):
+        """Refreshes every dirty view now."""
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
+        dirty, self._dirty = self._dirty, set()
+        for name in dirty:
+            callback = self._views.get(name)
+            if callback is not None:
+                callback()
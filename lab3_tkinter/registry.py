@@ -0,0 +1,484 @@
+from contextlib import contextmanager
+from itertools import islice
+
+from enrollment import EnrollmentGraph, PEOPLE_EVENTS
+from models import RECORD_CLASSES
+
+#: Record types handled by the registry, in display order.
+RECORD_TYPES = ("Student", "Instructor", "Course")
+
+
+class Registry:
+    """
+    In-memory store of students, instructors and courses.
+
+    Records are kept in insertion-ordered dictionaries keyed by their ID,
+    with a secondary index by display name, so lookups, registrations and
+    deletions run in constant time regardless of the roster size.
+
+    Registrations and assignments are also indexed in an
+    :class:`enrollment.EnrollmentGraph`, so course rosters and instructor
+    loads are answered without scanning people, and removing a course
+    removes it from every student and instructor.
+
+    Other components can keep derived state in sync by registering a
+    listener with :meth:`add_listener`.
+
+    When a ``storage`` backend is given, it becomes the authoritative copy
+    of the data: it is registered as a listener so every change is written
+    through, and the in-memory dictionaries only cache the records that
+    have been added or looked up. Records missing from the cache are
+    fetched from the storage on demand, and enrollment queries are
+    answered by the storage instead of the graph.
+
+    :param storage: Optional backend, see :class:`storage.Storage`.
+    """
+
+    def __init__(self, storage=None):
+        self._new_indexes()
+        self._listeners = []
+        self.storage = storage
+        #: ``(record_type, record)`` pairs of the records :meth:`load_record`
+        #: left out because their ID was already used, for validation to report.
+        self.duplicates = []
+        if storage is not None:
+            self.add_listener(storage.on_change)
+
+    def _new_indexes(self):
+        self.students = {}
+        self.instructors = {}
+        self.courses = {}
+        self._by_id = {
+            "Student": self.students,
+            "Instructor": self.instructors,
+            "Course": self.courses,
+        }
+        self._by_name = {record_type: {} for record_type in RECORD_TYPES}
+        self.enrollments = EnrollmentGraph()
+
+    def add_listener(self, listener):
+        """
+        Registers a callback notified of every change to the registry.
+
+        The callback is called as ``listener(event, record_type, record)``
+        where ``event`` is one of:
+
+        * ``"add"`` and ``"remove"``: a record was added or removed;
+        * ``"register"`` and ``"assign"``: the course list of a student or
+          instructor changed;
+        * ``"clear"``: every record was removed;
+        * ``"reset"``: every record was replaced at once by
+          :meth:`replace_with`; derived state should be rebuilt from the
+          registry;
+        * ``"begin"`` and ``"end"``: delimit a batch of changes made
+          through :meth:`batch`.
+
+        For ``"clear"``, ``"reset"``, ``"begin"`` and ``"end"`` both
+        ``record_type`` and ``record`` are ``None``.
+
+        :param listener: The callback to register.
+        :type listener: callable
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """
+        Unregisters a callback added with :meth:`add_listener`.
+
+        :param listener: The callback to remove.
+        :type listener: callable
+        """
+        self._listeners.remove(listener)
+
+    def _notify(self, event, record_type, record):
+        for listener in self._listeners:
+            listener(event, record_type, record)
+
+    @contextmanager
+    def batch(self):
+        """
+        Groups several changes so listeners can process them together.
+
+        Storage backends commit a batch as a single transaction.
+        """
+        self._notify("begin", None, None)
+        try:
+            yield self
+        finally:
+            self._notify("end", None, None)
+
+    def add(self, record_type, record):
+        """
+        Adds a record to the registry and indexes it.
+
+        :param record_type: One of ``"Student"``, ``"Instructor"`` or ``"Course"``.
+        :type record_type: str
+        :param record: The record to add.
+        :raises ValueError: If a record of that type already uses the same ID.
+        """
+        record_id = str(record.record_id)
+        if self.get(record_type, record_id) is not None:
+            raise ValueError(f"{record_type} ID {record_id} already exists.")
+        self._cache(record_type, record)
+        self._notify("add", record_type, record)
+
+    def _cache(self, record_type, record):
+        record_id = str(record.record_id)
+        self._by_id[record_type][record_id] = record
+        self._by_name[record_type].setdefault(record.display_name, {})[record_id] = record
+        if self.storage is None and record.enrolled_courses is not None:
+            self.enrollments.set_courses(record_type, record_id, record.enrolled_courses)
+
+    def add_student(self, student):
+        """Adds a :class:`Student` to the registry."""
+        self.add("Student", student)
+
+    def add_instructor(self, instructor):
+        """Adds an :class:`Instructor` to the registry."""
+        self.add("Instructor", instructor)
+
+    def add_course(self, course):
+        """Adds a :class:`Course` to the registry."""
+        self.add("Course", course)
+
+    def get(self, record_type, record_id):
+        """
+        Returns the record with the given ID, or ``None``.
+
+        :param record_type: One of ``"Student"``, ``"Instructor"`` or ``"Course"``.
+        :type record_type: str
+        :param record_id: The record ID. Numeric IDs coming back from the
+            Treeview are accepted and converted to strings.
+        """
+        record_id = str(record_id)
+        record = self._by_id[record_type].get(record_id)
+        if record is None and self.storage is not None:
+            data = self.storage.fetch(record_type, record_id)
+            if data is not None:
+                record = self._from_dict(record_type, data)
+                self._cache(record_type, record)
+        return record
+
+    def find_by_name(self, record_type, name):
+        """
+        Returns the first record added with the given name, or ``None``.
+
+        :param record_type: One of ``"Student"``, ``"Instructor"`` or ``"Course"``.
+        :type record_type: str
+        :param name: The exact display name.
+        :type name: str
+        """
+        matches = self._by_name[record_type].get(name)
+        if matches:
+            return next(iter(matches.values()))
+        if self.storage is not None:
+            record_id = self.storage.find_by_name(record_type, name)
+            if record_id is not None:
+                return self.get(record_type, record_id)
+        return None
+
+    def remove(self, record_type, record_id):
+        """
+        Removes a record from the registry and its indexes.
+
+        Removing a course also removes it from the course list of every
+        student and instructor linked to it; each of them is notified as
+        ``"register"`` or ``"assign"``, and everything happens in one
+        :meth:`batch`.
+
+        :param record_type: One of ``"Student"``, ``"Instructor"`` or ``"Course"``.
+        :type record_type: str
+        :param record_id: The record ID.
+        :return: The removed record, or ``None`` if it was not found.
+        """
+        record = self.get(record_type, record_id)
+        if record is None:
+            return None
+        if record_type == "Course":
+            with self.batch():
+                self._unlink_course(record.course_id)
+                self._remove(record_type, record)
+        else:
+            self._remove(record_type, record)
+        return record
+
+    def _remove(self, record_type, record):
+        record_id = str(record.record_id)
+        del self._by_id[record_type][record_id]
+        names = self._by_name[record_type]
+        matches = names.get(record.display_name)
+        if matches is not None:
+            matches.pop(record_id, None)
+            if not matches:
+                del names[record.display_name]
+        if record_type in PEOPLE_EVENTS:
+            self.enrollments.remove_person(record_type, record_id)
+        self._notify("remove", record_type, record)
+
+    def _unlink_course(self, course_id):
+        if self.storage is None:
+            people = self.enrollments.remove_course(course_id)
+        else:
+            # Only cached people need fixing; the storage drops its own links with the course.
+            people = [(record_type, person_id) for record_type in PEOPLE_EVENTS
+                      for person_id in self.storage.members(course_id, record_type)
+                      if person_id in self._by_id[record_type]]
+        for record_type, person_id in people:
+            person = self._by_id[record_type][person_id]
+            person.drop_course(course_id)
+            self._notify(PEOPLE_EVENTS[record_type], record_type, person)
+
+    def register(self, student, course):
+        """
+        Registers a student to a course.
+
+        :type student: Student
+        :type course: Course
+        """
+        student.register_course(course)
+        if self.storage is None:
+            self.enrollments.link("Student", str(student.student_id), course.course_id)
+        self._notify("register", "Student", student)
+
+    def assign(self, instructor, course):
+        """
+        Assigns an instructor to a course.
+
+        :type instructor: Instructor
+        :type course: Course
+        """
+        instructor.assign_course(course)
+        if self.storage is None:
+            self.enrollments.link("Instructor", str(instructor.instructor_id), course.course_id)
+        self._notify("assign", "Instructor", instructor)
+
+    def set_courses(self, record_type, person, course_ids):
+        """
+        Replaces the whole course list of a student or instructor.
+
+        Unknown course IDs are dropped. Listeners are notified like for
+        :meth:`register` or :meth:`assign`.
+
+        :param record_type: ``"Student"`` or ``"Instructor"``.
+        :type record_type: str
+        :param person: The student or instructor.
+        :param course_ids: The new course IDs.
+        """
+        person.course_ids = tuple(
+            course_id for course_id in dict.fromkeys(course_ids) if self.get("Course", course_id) is not None
+        )
+        if self.storage is None:
+            self.enrollments.set_courses(record_type, str(person.record_id), person.course_ids)
+        self._notify(PEOPLE_EVENTS[record_type], record_type, person)
+
+    def members(self, course_id, record_type="Student"):
+        """
+        Returns the IDs of the students or instructors linked to a course.
+
+        :param course_id: The course ID.
+        :type course_id: str
+        :param record_type: ``"Student"`` for the roster, ``"Instructor"``
+            for the teaching staff.
+        :type record_type: str
+        :rtype: list[str]
+        """
+        if self.storage is not None:
+            return self.storage.members(str(course_id), record_type)
+        return self.enrollments.members(str(course_id), record_type)
+
+    def member_count(self, course_id, record_type="Student"):
+        """
+        Returns the number of students or instructors linked to a course.
+
+        :param course_id: The course ID.
+        :type course_id: str
+        :param record_type: ``"Student"`` or ``"Instructor"``.
+        :type record_type: str
+        :rtype: int
+        """
+        if self.storage is not None:
+            return self.storage.member_count(str(course_id), record_type)
+        return self.enrollments.member_count(str(course_id), record_type)
+
+    def shared_members(self, course_a, course_b, record_type="Student"):
+        """
+        Returns the IDs of the students or instructors linked to both courses.
+
+        :param record_type: ``"Student"`` or ``"Instructor"``.
+        :type record_type: str
+        :rtype: list[str]
+        """
+        if self.storage is not None:
+            return self.storage.shared_members(str(course_a), str(course_b), record_type)
+        return self.enrollments.shared(str(course_a), str(course_b), record_type)
+
+    def count(self, record_type):
+        """
+        Returns the number of records of a type.
+
+        :param record_type: One of ``"Student"``, ``"Instructor"`` or ``"Course"``.
+        :type record_type: str
+        :rtype: int
+        """
+        if self.storage is not None:
+            return self.storage.count(record_type)
+        return len(self._by_id[record_type])
+
+    def records(self, record_type):
+        """
+        Iterates over the records of a type, in insertion order.
+
+        With a storage backend, records are read from the storage without
+        being kept in the cache.
+
+        :param record_type: One of ``"Student"``, ``"Instructor"`` or ``"Course"``.
+        :type record_type: str
+        """
+        if self.storage is None:
+            return self._by_id[record_type].values()
+        return (
+            self._by_id[record_type].get(data[self._id_field(record_type)])
+            or self._from_dict(record_type, data)
+            for data in self.storage.iter_dicts(record_type)
+        )
+
+    def rows(self, record_type):
+        """
+        Yields ``(record_type, name, record_id)`` display rows for a record type.
+
+        :param record_type: One of ``"Student"``, ``"Instructor"`` or ``"Course"``.
+        :type record_type: str
+        """
+        if self.storage is not None:
+            yield from self.storage.rows(record_type, 0, None)
+            return
+        for record_id, record in self._by_id[record_type].items():
+            yield record_type, record.display_name, record_id
+
+    def names(self, record_type, limit=None):
+        """
+        Returns the distinct display names of a record type.
+
+        :param record_type: One of ``"Student"``, ``"Instructor"`` or ``"Course"``.
+        :type record_type: str
+        :param limit: Maximum number of names to return, or ``None`` for all.
+        :type limit: int
+        """
+        if self.storage is not None:
+            return self.storage.names(record_type, limit)
+        return list(islice(self._by_name[record_type], limit))
+
+    def clear(self):
+        """Removes every record from the registry."""
+        for record_type in RECORD_TYPES:
+            self._by_id[record_type].clear()
+            self._by_name[record_type].clear()
+        self.enrollments.clear()
+        self._notify("clear", None, None)
+
+    def discard_cache(self):
+        """
+        Forgets the records cached from the storage backend.
+
+        Used when the backend was reloaded from disk; listeners are not
+        notified since the data did not change through the registry.
+        """
+        for record_type in RECORD_TYPES:
+            self._by_id[record_type].clear()
+            self._by_name[record_type].clear()
+        self.enrollments.clear()
+
+    def to_dict(self):
+        """
+        Serializes the whole registry.
+
+        :return: A JSON-compatible dictionary with ``students``,
+            ``instructors`` and ``courses`` lists.
+        :rtype: dict
+        """
+        return {
+            "students": [s.to_dict() for s in self.records("Student")],
+            "instructors": [i.to_dict() for i in self.records("Instructor")],
+            "courses": [c.to_dict() for c in self.records("Course")],
+        }
+
+    @staticmethod
+    def _id_field(record_type):
+        return {"Student": "student_id", "Instructor": "instructor_id", "Course": "course_id"}[record_type]
+
+    def _from_dict(self, record_type, data):
+        record_class = RECORD_CLASSES.get(record_type)
+        if record_class is None:
+            raise ValueError(f"Unknown record type: {record_type}")
+        record = record_class.from_dict(data)
+        if record.enrolled_courses:
+            record.course_ids = tuple(
+                course_id for course_id in record.course_ids if self.get("Course", course_id) is not None
+            )
+        return record
+
+    def load_record(self, record_type, data):
+        """
+        Adds a record from its serialized form.
+
+        Course references are resolved by ID against the courses already in
+        the registry; unknown courses are dropped. A record whose ID is
+        already used is not added but kept in :attr:`duplicates`, so a file
+        with repeated IDs still loads and the repeats can be reported.
+
+        :param record_type: One of ``"Student"``, ``"Instructor"`` or ``"Course"``.
+        :type record_type: str
+        :param data: A dictionary produced by the record's ``to_dict``.
+        :type data: dict
+        :return: The added record, or ``None`` for a duplicate.
+        """
+        record = self._from_dict(record_type, data)
+        if self.get(record_type, str(record.record_id)) is not None:
+            self.duplicates.append((record_type, record))
+            return None
+        self.add(record_type, record)
+        return record
+
+    def load_dict(self, data):
+        """
+        Replaces the registry content with serialized data.
+
+        :param data: A dictionary produced by :meth:`to_dict`.
+        :type data: dict
+        """
+        with self.batch():
+            self.clear()
+            for c in data.get("courses", []):
+                self.load_record("Course", c)
+            for s in data.get("students", []):
+                self.load_record("Student", s)
+            for i in data.get("instructors", []):
+                self.load_record("Instructor", i)
+
+    def replace_with(self, other):
+        """
+        Replaces the registry content with the records of another registry.
+
+        Without storage backends, the records and indexes of ``other`` are
+        taken over in one step, ``other`` is left empty, and listeners get
+        a single ``"reset"`` event, so they rebuild their state in bulk
+        rather than processing every record one by one.
+
+        Otherwise the records have to be written through to the storage:
+        listeners are notified as if the records had been cleared and added
+        one by one, within a single :meth:`batch`.
+
+        :param other: The registry to take the records from.
+        :type other: Registry
+        """
+        if self.storage is None and other.storage is None:
+            self.students, self.instructors, self.courses = other.students, other.instructors, other.courses
+            self._by_id, self._by_name, self.enrollments = other._by_id, other._by_name, other.enrollments
+            other._new_indexes()
+            self._notify("reset", None, None)
+            return
+        with self.batch():
+            self.clear()
+            for record_type in ("Course", "Student", "Instructor"):
+                for record in other.records(record_type):
+                    self.add(record_type, record)
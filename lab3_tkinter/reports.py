@@ -0,0 +1,285 @@
+import heapq
+from collections import Counter
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+#: Record types whose courses, ages and email domains are reported.
+PEOPLE_TYPES = ("Student", "Instructor")
+
+
+def email_domain(email):
+    """
+    Returns the lowercase domain of an email address, or ``""`` without one.
+
+    :type email: str
+    :rtype: str
+    """
+    _, at, domain = str(email).strip().rpartition("@")
+    return domain.lower() if at else ""
+
+
+class Reports:
+    """
+    Aggregate statistics of a registry, kept up to date as it changes.
+
+    Maintains the number of students and instructors of each course, the
+    number of courses of each person, and the age and email domain
+    distributions of students and instructors. As a registry listener, each
+    add, remove, registration and assignment updates them in constant time
+    (in the size of the person's course list), so reading a report never
+    scans the records.
+
+    Replacing the data, e.g. after loading a file, is a reset or a cleared
+    batch: the aggregates are then recomputed once, on the next read or at
+    the end of the batch, with NumPy when it is installed and in pure
+    Python otherwise.
+
+    The aggregates are computed from the registry on first use. Sorted
+    reports are cached until the next change, so polling them, e.g. from
+    :class:`reports_window.ReportsWindow`, does not sort the same rows again.
+
+    :param registry: The registry to report on.
+    :type registry: registry.Registry
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        self._built = False
+        self._batch_depth = 0
+        self._stale = False
+        self._sorted = {}
+        registry.add_listener(self.on_change)
+
+    def _reset(self):
+        self._members = {record_type: {} for record_type in PEOPLE_TYPES}
+        self._courses = {record_type: {} for record_type in PEOPLE_TYPES}
+        self._links = {record_type: 0 for record_type in PEOPLE_TYPES}
+        self._ages = {record_type: Counter() for record_type in PEOPLE_TYPES}
+        self._domains = {record_type: Counter() for record_type in PEOPLE_TYPES}
+
+    def _ensure(self):
+        if not self._built:
+            self.rebuild()
+
+    def _cached(self, key, compute):
+        self._ensure()
+        rows = self._sorted.get(key)
+        if rows is None:
+            rows = self._sorted[key] = compute()
+        return list(rows)
+
+    def on_change(self, event, record_type, record):
+        """Registry listener; see :meth:`registry.Registry.add_listener`."""
+        if event not in ("begin", "end"):
+            self._sorted.clear()
+        if event == "begin":
+            self._batch_depth += 1
+        elif event == "end":
+            self._batch_depth -= 1
+            if self._batch_depth == 0 and self._stale:
+                self.rebuild()
+        elif event == "clear":
+            # Whatever follows in the batch is recomputed at once at its end.
+            self._built = False
+            self._stale = self._batch_depth > 0
+        elif event == "reset":
+            self._built = False
+        elif not self._built or self._stale:
+            return
+        elif record_type == "Course":
+            self._course_changed(event, str(record.record_id))
+        elif event == "add":
+            self._person_added(record_type, record, 1)
+        elif event == "remove":
+            self._person_added(record_type, record, -1)
+        elif event in ("register", "assign"):
+            self._set_courses(record_type, str(record.record_id), record.course_ids)
+
+    def _course_changed(self, event, course_id):
+        for record_type in PEOPLE_TYPES:
+            if event == "add":
+                self._members[record_type].setdefault(course_id, 0)
+            elif event == "remove" and self._members[record_type].pop(course_id, 0):
+                # A storage backend only notifies the cached members of a
+                # removed course; the others are recounted on the next read.
+                self._built = False
+
+    def _person_added(self, record_type, person, delta):
+        _adjust(self._ages[record_type], person.age, delta)
+        _adjust(self._domains[record_type], email_domain(person.email), delta)
+        self._set_courses(record_type, str(person.record_id), person.course_ids if delta > 0 else None)
+
+    def _set_courses(self, record_type, person_id, course_ids):
+        courses = self._courses[record_type]
+        members = self._members[record_type]
+        old = courses.pop(person_id, ())
+        for course_id in old:
+            if course_id in members:
+                members[course_id] -= 1
+        self._links[record_type] -= len(old)
+        if course_ids is None:
+            return
+        courses[person_id] = course_ids
+        for course_id in course_ids:
+            members[course_id] = members.get(course_id, 0) + 1
+        self._links[record_type] += len(course_ids)
+
+    def invalidate(self):
+        """
+        Recomputes the aggregates on the next read.
+
+        For changes listeners are not notified of, such as a storage backend
+        reloaded from disk.
+        """
+        self._built = False
+        self._sorted.clear()
+
+    def rebuild(self):
+        """Recomputes every aggregate from the registry."""
+        self._reset()
+        self._sorted.clear()
+        course_ids = [str(course.record_id) for course in self.registry.records("Course")]
+        for record_type in PEOPLE_TYPES:
+            people = list(self.registry.records(record_type))
+            courses = self._courses[record_type]
+            for person in people:
+                courses[str(person.record_id)] = person.course_ids
+            ages = [person.age for person in people]
+            domains = [email_domain(person.email) for person in people]
+            links = [course_id for person in people for course_id in person.course_ids]
+            if numpy is not None:
+                members = _count_links_numpy(course_ids, links)
+                self._ages[record_type] = _count_numpy(numpy.array(ages))
+                self._domains[record_type] = _count_numpy(numpy.array(domains, dtype=str))
+            else:
+                members = dict.fromkeys(course_ids, 0)
+                members.update(Counter(course_id for course_id in links if course_id in members))
+                self._ages[record_type] = Counter(ages)
+                self._domains[record_type] = Counter(domains)
+            self._members[record_type] = members
+            self._links[record_type] = len(links)
+        self._built = True
+        self._stale = False
+
+    def enrollment_counts(self, limit=None):
+        """
+        Returns the number of students and instructors of each course.
+
+        :param limit: Maximum number of courses, the most popular first.
+        :type limit: int
+        :return: ``(course_id, students, instructors)`` tuples by decreasing
+            number of students.
+        :rtype: list[tuple]
+        """
+        def compute():
+            students = self._members["Student"]
+            instructors = self._members["Instructor"]
+            return _top(((course_id, count, instructors.get(course_id, 0)) for course_id, count in students.items()),
+                        limit)
+        return self._cached(("courses", limit), compute)
+
+    def course_count(self, record_type, person_id):
+        """
+        Returns the number of courses of a student or instructor.
+
+        :rtype: int
+        """
+        self._ensure()
+        return len(self._courses[record_type].get(str(person_id), ()))
+
+    def instructor_load(self, limit=None):
+        """
+        Returns the teaching load of each instructor.
+
+        :param limit: Maximum number of instructors, the busiest first.
+        :type limit: int
+        :return: ``(instructor_id, courses)`` tuples by decreasing load.
+        :rtype: list[tuple]
+        """
+        return self._cached(("instructors", limit), lambda: _top(
+            ((instructor_id, len(courses)) for instructor_id, courses in self._courses["Instructor"].items()), limit))
+
+    def age_distribution(self, record_type="Student"):
+        """
+        Returns the number of people of each age.
+
+        :param record_type: ``"Student"`` or ``"Instructor"``.
+        :type record_type: str
+        :return: ``(age, count)`` tuples by increasing age.
+        :rtype: list[tuple]
+        """
+        return self._cached(("ages", record_type), lambda: sorted(self._ages[record_type].items()))
+
+    def email_domains(self, record_type="Student", limit=None):
+        """
+        Returns the number of people using each email domain.
+
+        :param record_type: ``"Student"`` or ``"Instructor"``.
+        :type record_type: str
+        :param limit: Maximum number of domains, the most used first.
+        :type limit: int
+        :return: ``(domain, count)`` tuples by decreasing count.
+        :rtype: list[tuple]
+        """
+        return self._cached(("domains", record_type, limit), lambda: _top(self._domains[record_type].items(), limit))
+
+    def totals(self):
+        """
+        Returns the number of student registrations and instructor assignments.
+
+        :rtype: dict
+        """
+        self._ensure()
+        return {"Registrations": self._links["Student"], "Assignments": self._links["Instructor"]}
+
+    def to_dict(self, limit=None):
+        """
+        Returns every report as a JSON-serializable dictionary.
+
+        :param limit: Maximum number of rows of the per-course, per-instructor
+            and per-domain reports.
+        :type limit: int
+        :rtype: dict
+        """
+        return {
+            **self.totals(),
+            "courses": [{"course_id": course_id, "students": students, "instructors": instructors}
+                        for course_id, students, instructors in self.enrollment_counts(limit)],
+            "instructor_load": dict(self.instructor_load(limit)),
+            "ages": {record_type: dict(self.age_distribution(record_type)) for record_type in PEOPLE_TYPES},
+            "email_domains": {record_type: dict(self.email_domains(record_type, limit)) for record_type in PEOPLE_TYPES},
+        }
+
+
+def _top(rows, limit):
+    """Sorts rows by decreasing second column, then by first, keeping the first ``limit``."""
+    if limit is None:
+        return sorted(rows, key=_rank)
+    return heapq.nsmallest(limit, rows, key=_rank)
+
+
+def _rank(row):
+    return -row[1], row[0]
+
+
+def _adjust(counter, key, delta):
+    counter[key] += delta
+    if not counter[key]:
+        del counter[key]
+
+
+def _count_numpy(values):
+    if not len(values):
+        return Counter()
+    keys, counts = numpy.unique(values, return_counts=True)
+    return Counter(dict(zip(keys.tolist(), counts.tolist())))
+
+
+def _count_links_numpy(course_ids, links):
+    index = {course_id: i for i, course_id in enumerate(course_ids)}
+    positions = numpy.fromiter((index[c] for c in links if c in index), dtype=numpy.int64)
+    counts = numpy.bincount(positions, minlength=len(course_ids))
+    return dict(zip(course_ids, counts.tolist()))
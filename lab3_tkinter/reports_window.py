@@ -0,0 +1,115 @@
+import json
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+
+from reports import PEOPLE_TYPES
+
+#: Interval in milliseconds between two refreshes of an open reports window.
+REFRESH_INTERVAL_MS = 1000
+
+#: Rows shown per ranking: most popular courses, busiest instructors, most used domains.
+ROW_LIMIT = 100
+
+
+class ReportsWindow:
+    """
+    Toplevel window showing the aggregate statistics of a :class:`service.SchoolService`.
+
+    Lists the enrollments per course, the teaching load per instructor and
+    the age and email domain distributions, refreshed periodically. The
+    statistics are maintained by :class:`reports.Reports`, so a refresh
+    does not scan the records.
+
+    :param master: The parent window.
+    :param service: The service to report on.
+    :type service: service.SchoolService
+    """
+
+    def __init__(self, master, service):
+        self.service = service
+        self.window = tk.Toplevel(master)
+        self.window.title("Reports")
+        self._job = None
+
+        controls = tk.Frame(self.window)
+        controls.grid(row=0, column=0, sticky="w", padx=10, pady=5)
+        tk.Button(controls, text="Refresh", command=self.refresh_now).grid(row=0, column=0)
+        tk.Button(controls, text="Export...", command=self.export).grid(row=0, column=1)
+
+        self.totals_label = tk.Label(self.window, text="", anchor="w")
+        self.totals_label.grid(row=1, column=0, sticky="w", padx=10)
+
+        notebook = ttk.Notebook(self.window)
+        notebook.grid(row=2, column=0, padx=10, pady=5)
+        self.courses_tree = self._add_tab(notebook, "Enrollments", "Course", ("Students", "Instructors"))
+        self.load_tree = self._add_tab(notebook, "Teaching Load", "Instructor", ("Courses",))
+        self.ages_tree = self._add_tab(notebook, "Ages", "Age", ("Students", "Instructors"))
+        self.domains_tree = self._add_tab(notebook, "Email Domains", "Domain", ("Count",))
+
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self.refresh()
+
+    @staticmethod
+    def _add_tab(notebook, title, heading, columns):
+        tree = ttk.Treeview(notebook, columns=columns, height=15)
+        tree.heading("#0", text=heading)
+        for column in columns:
+            tree.heading(column, text=column)
+            tree.column(column, width=90, anchor="e")
+        notebook.add(tree, text=title)
+        return tree
+
+    def refresh(self):
+        """Redisplays the reports and schedules the next refresh."""
+        reports = self.service.reports
+        stats = self.service.stats()
+        self.totals_label.config(text=", ".join(f"{k} {v}" for k, v in stats.items()))
+
+        self._fill(self.courses_tree, ((course_id, (students, instructors))
+                                       for course_id, students, instructors in reports.enrollment_counts(ROW_LIMIT)))
+        self._fill(self.load_tree, ((instructor_id, (courses,))
+                                    for instructor_id, courses in reports.instructor_load(ROW_LIMIT)))
+        student_ages = dict(reports.age_distribution("Student"))
+        instructor_ages = dict(reports.age_distribution("Instructor"))
+        self._fill(self.ages_tree, ((age, (student_ages.get(age, 0), instructor_ages.get(age, 0)))
+                                    for age in sorted(student_ages.keys() | instructor_ages.keys())))
+
+        self.domains_tree.delete(*self.domains_tree.get_children())
+        for record_type in PEOPLE_TYPES:
+            parent = self.domains_tree.insert("", "end", text=record_type + "s", open=True)
+            for domain, count in reports.email_domains(record_type, ROW_LIMIT):
+                self.domains_tree.insert(parent, "end", text=domain or "(none)", values=(count,))
+        self._job = self.window.after(REFRESH_INTERVAL_MS, self.refresh)
+
+    @staticmethod
+    def _fill(tree, rows):
+        tree.delete(*tree.get_children())
+        for key, values in rows:
+            tree.insert("", "end", text=key, values=values)
+
+    def refresh_now(self):
+        """Refreshes immediately instead of waiting for the next interval."""
+        if self._job is not None:
+            self.window.after_cancel(self._job)
+        self.refresh()
+
+    def export(self):
+        """Exports every report to a JSON file chosen by the user."""
+        path = filedialog.asksaveasfilename(parent=self.window, defaultextension=".json",
+                                            filetypes=[("JSON", "*.json")])
+        if not path:
+            return
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.service.report(), f, indent=2)
+        except OSError as e:
+            messagebox.showerror("Error", f"Error exporting reports: {e}", parent=self.window)
+            return
+        messagebox.showinfo("Success", "Reports exported.", parent=self.window)
+
+    def close(self):
+        """Stops refreshing and closes the window."""
+        if self._job is not None:
+            self.window.after_cancel(self._job)
+            self._job = None
+        self.window.destroy()
@@ -0,0 +1,312 @@
+import heapq
+from bisect import bisect_left, insort
+from collections.abc import Sequence
+from itertools import chain, islice
+
+from registry import RECORD_TYPES
+
+#: Queries at least this long find their substring matches through the
+#: trigram index; shorter ones have no trigram and scan the distinct names.
+MIN_SUBSTRING_LENGTH = 3
+
+
+def normalize(text):
+    """
+    Normalizes text for case-insensitive matching.
+
+    :param text: The text to normalize.
+    :type text: str
+    :return: The normalized key.
+    :rtype: str
+    """
+    return str(text).strip().lower()
+
+
+def trigrams(text):
+    """
+    Returns the set of three-character substrings of a normalized key.
+
+    :param text: A key produced by :func:`normalize`.
+    :type text: str
+    :rtype: set[str]
+    """
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchHits(Sequence):
+    """
+    Ranked search hits, built a page at a time.
+
+    Behaves like a read-only list of ``(record_type, record_id)`` keys whose
+    length is known up front. Keys are only built, in rank order, as far as
+    they are read, so showing the first page of a search that matches most
+    of the roster does not sort or expand the other hits.
+
+    :param groups: Iterable of ``(record_type, record_ids)`` pairs in rank
+        order, each group holding the IDs of the records sharing a name.
+    :param total: Number of IDs in all the groups.
+    :type total: int
+    """
+
+    def __init__(self, groups, total):
+        self._groups = iter(groups)
+        self._total = total
+        self._keys = []
+
+    def __len__(self):
+        return self._total
+
+    def _fill(self, size):
+        keys = self._keys
+        while len(keys) < size:
+            group = next(self._groups, None)
+            if group is None:
+                # Records removed since the search; the length shrinks accordingly.
+                self._total = len(keys)
+                return
+            record_type, record_ids = group
+            keys.extend((record_type, record_id) for record_id in sorted(record_ids))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            indices = range(*index.indices(self._total))
+            if indices:
+                self._fill(max(indices) + 1)
+            return [self._keys[i] for i in indices if i < self._total]
+        if index < 0:
+            index += self._total
+        if 0 <= index < self._total:
+            self._fill(index + 1)
+        if not 0 <= index < self._total:
+            raise IndexError("search hit index out of range")
+        return self._keys[index]
+
+    def __iter__(self):
+        index = 0
+        while index < self._total:
+            self._fill(index + 1)
+            if index < self._total:
+                yield self._keys[index]
+            index += 1
+
+
+class SearchIndex:
+    """
+    Incrementally maintained search index over a :class:`registry.Registry`.
+
+    Records are grouped by pre-normalized name. The distinct names are kept
+    in a sorted list for prefix lookups and in a trigram index for substring
+    matching, and IDs in a sorted list for prefix lookups. The index
+    subscribes to the registry and updates itself on every add, remove and
+    clear, so queries never rescan the roster. After a reset, it is rebuilt
+    at once on the next query.
+
+    Both sorted lists are sorted once when the index is built. Entries added
+    within a registry batch, e.g. by a load or an import, are appended and
+    sorted in at the end of the batch, so bulk changes cost one sort rather
+    than one list insertion each.
+
+    :param registry: The registry to index.
+    :type registry: registry.Registry
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        self._batch_depth = 0
+        self._stale = False
+        self._build()
+        registry.add_listener(self._on_change)
+
+    def _build(self):
+        self._names = {record_type: {} for record_type in RECORD_TYPES}
+        self._groups = {record_type: {} for record_type in RECORD_TYPES}
+        self._sorted_names = {record_type: [] for record_type in RECORD_TYPES}
+        self._trigrams = {record_type: {} for record_type in RECORD_TYPES}
+        self._ids = {record_type: [] for record_type in RECORD_TYPES}
+        self._unsorted = False
+        for record_type in RECORD_TYPES:
+            for record in self.registry.records(record_type):
+                self._add(record_type, record, bulk=True)
+        self._sort()
+        self._stale = False
+
+    def _ensure(self):
+        if self._stale:
+            self._build()
+        else:
+            self._sort()
+
+    def _on_change(self, event, record_type, record):
+        if event == "begin":
+            self._batch_depth += 1
+        elif event == "end":
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self._sort()
+        elif event == "reset":
+            # Rebuilt in bulk from the registry on the next query.
+            self._stale = True
+        elif self._stale:
+            return
+        elif event == "add":
+            self._add(record_type, record, bulk=self._batch_depth > 0)
+        elif event == "remove":
+            self._remove(record_type, record)
+        elif event == "clear":
+            for index in (self._names, self._groups, self._sorted_names, self._trigrams, self._ids):
+                for entries in index.values():
+                    entries.clear()
+
+    def _add(self, record_type, record, bulk=False):
+        record_id = str(record.record_id)
+        name = normalize(record.display_name)
+        self._names[record_type][record_id] = name
+        group = self._groups[record_type].get(name)
+        if group is None:
+            group = self._groups[record_type][name] = {}
+            postings = self._trigrams[record_type]
+            for gram in trigrams(name):
+                postings.setdefault(gram, set()).add(name)
+            self._insert(self._sorted_names[record_type], name, bulk)
+        group[record_id] = None
+        self._insert(self._ids[record_type], (normalize(record_id), record_id), bulk)
+
+    def _insert(self, entries, entry, bulk):
+        if bulk:
+            entries.append(entry)
+            self._unsorted = True
+        else:
+            insort(entries, entry)
+
+    def _sort(self):
+        # The appended tail is sorted and merged with the sorted head in one pass.
+        if self._unsorted:
+            for entries in (*self._sorted_names.values(), *self._ids.values()):
+                entries.sort()
+            self._unsorted = False
+
+    def _remove(self, record_type, record):
+        record_id = str(record.record_id)
+        name = self._names[record_type].pop(record_id, None)
+        if name is None:
+            return
+        self._sort()
+        groups = self._groups[record_type]
+        group = groups[name]
+        del group[record_id]
+        if not group:
+            del groups[name]
+            postings = self._trigrams[record_type]
+            for gram in trigrams(name):
+                names = postings.get(gram)
+                if names is not None:
+                    names.discard(name)
+                    if not names:
+                        del postings[gram]
+            _discard(self._sorted_names[record_type], name)
+        _discard(self._ids[record_type], (normalize(record_id), record_id))
+
+    def search_names(self, record_types, text, limit=None):
+        """
+        Finds records whose name contains the given text.
+
+        Hits are ranked exact match first, then prefix matches, then by the
+        position of the match, alphabetically and finally by ID.
+
+        Prefix matches are a range of the sorted names and are never sorted
+        again. Other matches come from the trigram index, or for queries
+        shorter than :data:`MIN_SUBSTRING_LENGTH` from a scan of the
+        distinct names. They are grouped by position, and a group is only
+        sorted once the hits are read that far.
+
+        :param record_types: Record types to search.
+        :type record_types: iterable[str]
+        :param text: The text to look for, matched case-insensitively.
+        :type text: str
+        :param limit: Maximum number of hits to return, or ``None`` for all.
+        :type limit: int
+        :return: Ranked ``(record_type, record_id)`` keys.
+        :rtype: SearchHits
+        """
+        query = normalize(text)
+        self._ensure()
+        streams = []
+        total = 0
+        for record_type in record_types:
+            groups = self._groups[record_type]
+            names = self._sorted_names[record_type]
+            # A copy of the range, so later changes do not shift the hits.
+            prefixed = names[bisect_left(names, query):bisect_left(names, query + "\U0010ffff")]
+            total += sum(map(len, map(groups.__getitem__, prefixed)))
+            streams.append(_by_prefix(prefixed, query, record_type))
+            positions = {}
+            for name in self._candidates(record_type, query):
+                position = name.find(query)
+                if position > 0:
+                    positions.setdefault(position, []).append(name)
+                    total += len(groups[name])
+            streams.append(_by_position(positions, record_type))
+        if limit is not None:
+            total = min(total, limit)
+        ranked = heapq.merge(*streams)
+        return SearchHits(((record_type, self._groups[record_type].get(name, ()))
+                           for _, _, name, record_type in ranked), total)
+
+    def _candidates(self, record_type, query):
+        if len(query) < MIN_SUBSTRING_LENGTH:
+            # No trigram to look up; every name may contain the query.
+            return self._sorted_names[record_type] if query else ()
+        postings = self._trigrams[record_type]
+        sets = []
+        for gram in trigrams(query):
+            names = postings.get(gram)
+            if not names:
+                return ()
+            sets.append(names)
+        sets.sort(key=len)
+        return sets[0].intersection(*sets[1:])
+
+    def search_ids(self, record_types, text, limit=None):
+        """
+        Finds records whose ID contains the given text.
+
+        IDs starting with the text come first, found by binary search, then
+        the other matches; both in ID order.
+
+        :param record_types: Record types to search.
+        :type record_types: iterable[str]
+        :param text: The text to look for, matched case-insensitively.
+        :type text: str
+        :param limit: Maximum number of hits per record type, or ``None`` for all.
+        :type limit: int
+        :return: ``(record_type, record_id)`` keys, per record type.
+        :rtype: list[tuple]
+        """
+        text = normalize(text)
+        self._ensure()
+        hits = []
+        for record_type in record_types:
+            ids = self._ids[record_type]
+            start = bisect_left(ids, (text,))
+            end = bisect_left(ids, (text + "\U0010ffff",))
+            prefixed = (ids[position] for position in range(start, end))
+            inner = (entry for entry in ids if text in entry[0] and not entry[0].startswith(text)) if text else ()
+            hits.extend((record_type, record_id) for _, record_id in islice(chain(prefixed, inner), limit))
+        return hits
+
+
+def _by_prefix(names, query, record_type):
+    for name in names:
+        yield 0 if name == query else 1, 0, name, record_type
+
+
+def _by_position(positions, record_type):
+    for position in sorted(positions):
+        for name in sorted(positions[position]):
+            yield 2, position, name, record_type
+
+
+def _discard(entries, entry):
+    position = bisect_left(entries, entry)
+    if position < len(entries) and entries[position] == entry:
+        del entries[position]
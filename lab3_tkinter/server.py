@@ -0,0 +1,366 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+
+import bulk_io
+import persistence
+from binary_snapshot import SNAPSHOT_SUFFIX, SnapshotStorage
+from journal import Journal, JOURNALED_EVENTS, change_entry
+from models import RECORD_CLASSES
+from service import SchoolService
+
+#: Address the server listens on by default; only local clients can connect.
+HOST = "127.0.0.1"
+
+#: Default TCP port.
+PORT = 8765
+
+#: Longest protocol line accepted, in bytes. Imports send whole rosters.
+MAX_LINE = 64 * 1024 * 1024
+
+#: Interval in seconds between two journal syncs of a journaling server.
+SYNC_INTERVAL = 1.0
+
+
+class ConflictError(ValueError):
+    """Raised when a change is based on an outdated version of a record."""
+
+
+class SchoolServer:
+    """
+    Asyncio server sharing one :class:`service.SchoolService` between clients.
+
+    The protocol is newline-delimited JSON over TCP. A client sends requests
+    ``{"id": n, "op": ..., ...}`` and receives one response per request,
+    ``{"id": n, "ok": true, "result": ...}`` or ``{"id": n, "ok": false,
+    "kind": ..., "error": message}`` where ``kind`` is ``"value"``,
+    ``"lookup"`` or ``"conflict"``.
+
+    Every change is pushed to every client as ``{"event": "changes",
+    "revision": r, "changes": [...]}``, before the response to the request
+    that caused it. Changes are :func:`journal.change_entry` entries with a
+    ``revision`` field, the server revision after the change, and a
+    ``version`` field for added records and course lists.
+
+    Each record has a version: the revision of its last change. Requests
+    that modify an existing record may pass the version they are based on;
+    if the record changed since, the request fails with a conflict instead
+    of overwriting the other user's change.
+
+    Requests are handled one at a time on the event loop, so the service
+    needs no locking.
+
+    :param service: The service holding the data.
+    :type service: service.SchoolService
+    :param save_path: File written by the ``save`` request when the service
+        has no journal; ``service.data_path`` by default.
+    :type save_path: str
+    """
+
+    def __init__(self, service, save_path=None):
+        self.service = service
+        self.save_path = save_path or service.data_path
+        self.revision = 0
+        self.versions = {}
+        self._changes = []
+        self._writers = set()
+        self._server = None
+        self._loop = None
+        self._saving = None
+        self._sync_job = None
+        service.registry.add_listener(self._on_change)
+
+    def _on_change(self, event, record_type, record):
+        if event == "reset":
+            # Clients apply changes one by one; send the new content in full.
+            self._on_change("clear", None, None)
+            for record_type, record, _ in persistence.snapshot(self.service.registry):
+                self._on_change("add", record_type, record)
+            return
+        if event not in JOURNALED_EVENTS:
+            return
+        self.revision += 1
+        entry = change_entry(event, record_type, record)
+        entry["revision"] = self.revision
+        if event == "clear":
+            self.versions.clear()
+        elif event == "remove":
+            self.versions.pop((record_type, str(record.record_id)), None)
+        else:
+            self.versions[(record_type, str(record.record_id))] = entry["version"] = self.revision
+        self._changes.append(entry)
+
+    def version(self, record_type, record_id):
+        """
+        Returns the version of a record, 0 if it has not changed since startup.
+
+        :rtype: int
+        """
+        return self.versions.get((record_type, str(record_id)), 0)
+
+    def _check_version(self, record_type, record_id, version):
+        if version is not None and version != self.version(record_type, record_id):
+            raise ConflictError(f"{record_type} {record_id} was changed by another user. Please try again.")
+
+    async def start(self, host=HOST, port=PORT):
+        """
+        Starts listening.
+
+        :param port: The TCP port; 0 picks a free one.
+        :type port: int
+        :return: The ``(host, port)`` address actually bound.
+        :rtype: tuple
+        """
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._serve, host, port, limit=MAX_LINE)
+        if self.service.journal is not None:
+            self._sync_job = self._loop.call_later(SYNC_INTERVAL, self._sync_journal)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        """Serves clients until :meth:`stop` is called."""
+        try:
+            await self._server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+
+    def stop(self):
+        """Stops listening and disconnects every client. Safe to call from any thread."""
+        self._loop.call_soon_threadsafe(self._stop)
+
+    def _stop(self):
+        if self._sync_job is not None:
+            self._sync_job.cancel()
+        for writer in list(self._writers):
+            writer.close()
+        self._server.close()
+
+    async def _serve(self, reader, writer):
+        self._writers.add(writer)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                response = await self._handle(line)
+                await self._broadcast()
+                await self._send(writer, response)
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _send(self, writer, message):
+        try:
+            writer.write(json.dumps(message, separators=(",", ":")).encode("utf-8") + b"\n")
+            await writer.drain()
+        except ConnectionError:
+            self._writers.discard(writer)
+
+    async def _broadcast(self):
+        if not self._changes:
+            return
+        message = {"event": "changes", "revision": self.revision, "changes": self._changes}
+        self._changes = []
+        for writer in list(self._writers):
+            await self._send(writer, message)
+
+    async def _handle(self, line):
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            handler = getattr(self, "op_" + str(request.get("op")).replace("-", "_"), None)
+            if handler is None:
+                raise ValueError(f"Unknown operation {request.get('op')!r}.")
+            result = handler(request)
+            if asyncio.iscoroutine(result):
+                result = await result
+        except ConflictError as e:
+            return {"id": request_id, "ok": False, "kind": "conflict", "error": str(e)}
+        except KeyError as e:
+            return {"id": request_id, "ok": False, "kind": "value", "error": f"Missing field {e}."}
+        except LookupError as e:
+            return {"id": request_id, "ok": False, "kind": "lookup", "error": str(e)}
+        except (ValueError, TypeError, AttributeError) as e:
+            return {"id": request_id, "ok": False, "kind": "value", "error": str(e)}
+        except OSError as e:
+            return {"id": request_id, "ok": False, "kind": "value", "error": f"Error saving data: {e}"}
+        return {"id": request_id, "ok": True, "result": result}
+
+    def op_snapshot(self, request):
+        """
+        Returns every record for a client to mirror.
+
+        :return: ``{"revision": r, "records": [...]}``, records being
+            ``"add"`` entries with their ``version``.
+        """
+        records = []
+        for record_type, record, course_ids in persistence.snapshot(self.service.registry):
+            entry = {"op": "add", "type": record_type, **record.to_dict(course_ids)}
+            entry["version"] = self.version(record_type, record.record_id)
+            records.append(entry)
+        return {"revision": self.revision, "records": records}
+
+    def op_add(self, request):
+        """Adds a record; returns the validation warnings."""
+        record_type = request["type"]
+        if record_type == "Course":
+            self.service.add_course(request["record_id"], request["name"])
+        elif record_type == "Student":
+            self.service.add_student(request["name"], request["age"], request["email"], request["record_id"])
+        elif record_type == "Instructor":
+            self.service.add_instructor(request["name"], request["age"], request["email"], request["record_id"])
+        else:
+            raise ValueError(f"Unknown record type: {record_type}")
+        return {"warnings": self.service.warnings}
+
+    def op_remove(self, request):
+        """Removes a record if it is still at the given version."""
+        record_type, record_id = request["type"], str(request["record_id"])
+        self._check_version(record_type, record_id, request.get("version"))
+        return self.service.remove(record_type, record_id) is not None
+
+    def op_register(self, request):
+        """Registers a student, if still at the given version, to a course."""
+        self._check_version("Student", request["student_id"], request.get("version"))
+        self.service.register_student(str(request["student_id"]), str(request["course_id"]))
+        return True
+
+    def op_assign(self, request):
+        """Assigns an instructor, if still at the given version, to a course."""
+        self._check_version("Instructor", request["instructor_id"], request.get("version"))
+        self.service.assign_instructor(str(request["instructor_id"]), str(request["course_id"]))
+        return True
+
+    def op_import(self, request):
+        """
+        Commits the records of a roster validated by the client.
+
+        :return: The ``errors``, ``warnings`` and ``added`` of the
+            :class:`bulk_io.ImportResult`.
+        """
+        result = bulk_io.ImportResult()
+        for line, record_type, data in request["records"]:
+            result.records.append((line, record_type, RECORD_CLASSES[record_type].from_dict(data)))
+        self.service.commit_import(result)
+        return {"errors": result.errors, "warnings": result.warnings, "added": result.added}
+
+    async def op_save(self, request):
+        """
+        Makes the data durable: syncs the journal, or writes the data file
+        on a worker thread from a snapshot taken on the event loop.
+
+        :return: Number of journal entries synced or records written.
+        """
+        if self.service.journal is not None:
+            return self.service.commit()
+        entries = self.service.snapshot()
+        if self._saving is not None:
+            await self._saving
+        self._saving = self._loop.run_in_executor(None, self.service.save, entries, self.save_path)
+        try:
+            count = await self._saving
+        finally:
+            self._saving = None
+        self.service.saved(entries, self.save_path)
+        return count
+
+    def _sync_journal(self):
+        self.service.commit()
+        if self.service.compaction_due() and self._saving is None:
+            self._loop.create_task(self._compact())
+        self._sync_job = self._loop.call_later(SYNC_INTERVAL, self._sync_journal)
+
+    async def _compact(self):
+        entries = self.service.begin_compaction()
+        self._saving = self._loop.run_in_executor(None, self.service.save, entries, self.service.journal.data_path)
+        try:
+            await self._saving
+            self.service.finish_compaction()
+        finally:
+            self._saving = None
+
+
+def serve_in_thread(service, host=HOST, port=0):
+    """
+    Runs a :class:`SchoolServer` on its own event loop in a daemon thread.
+
+    Meant for tests and benchmarks on localhost: it returns once the server
+    listens. Stop it with :meth:`SchoolServer.stop`.
+
+    :type service: service.SchoolService
+    :param port: The TCP port; 0 picks a free one.
+    :type port: int
+    :return: ``(server, (host, port), thread)``.
+    :rtype: tuple
+    """
+    server = SchoolServer(service)
+    ready = threading.Event()
+    address = []
+
+    async def run():
+        address.extend(await server.start(host, port))
+        ready.set()
+        await server.serve_forever()
+
+    thread = threading.Thread(target=asyncio.run, args=(run(),), name="school-server", daemon=True)
+    thread.start()
+    ready.wait()
+    return server, tuple(address), thread
+
+
+def main(argv=None):
+    """
+    Command-line entry point, e.g. ``python server.py --journal``.
+
+    The data file is loaded at startup. With ``--journal``, every change is
+    journaled as it happens; otherwise the file is rewritten when a client
+    saves. A ``.snap`` data file is opened as a memory-mapped binary snapshot.
+    """
+    parser = argparse.ArgumentParser(description="Share the school data between several local clients.")
+    parser.add_argument("--data", default=persistence.DATA_FILE, help="data file (default: %(default)s)")
+    parser.add_argument("--journal", action="store_true", help="journal every change next to the data file")
+    parser.add_argument("--host", default=HOST, help="address to listen on (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=PORT, help="TCP port (default: %(default)s)")
+    args = parser.parse_args(argv)
+    snapshot = args.data.endswith(SNAPSHOT_SUFFIX)
+    if snapshot and args.journal:
+        parser.error("--journal needs an NDJSON data file")
+
+    if snapshot:
+        service = SchoolService(SnapshotStorage(args.data))
+    elif args.journal:
+        service = SchoolService(journal=Journal(args.data))
+    else:
+        service = SchoolService()
+    if service.storage is None and (args.journal or os.path.exists(args.data)):
+        try:
+            service.load(args.data)
+        except FileNotFoundError:
+            pass
+    server = SchoolServer(service, args.data)
+
+    async def run():
+        host, port = await server.start(args.host, args.port)
+        print(f"Serving {args.data} on {host}:{port}", file=sys.stderr)
+        await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,547 @@
+import os
+
+import binary_snapshot
+import bulk_io
+import persistence
+import validation
+from binary_snapshot import SNAPSHOT_SUFFIX, SnapshotStorage
+from journal import recover
+from models import Student, Instructor, Course, parse_age
+from registry import Registry, RECORD_TYPES
+from reports import Reports
+from search_index import SearchIndex
+from validation import Validator
+
+#: Record types searched by each search criterion of the GUI.
+SEARCH_CRITERIA = {
+    "Name": ("names", ("Student", "Instructor")),
+    "ID": ("ids", ("Student", "Instructor")),
+    "Course": ("names", ("Course",)),
+}
+
+
+class SchoolService:
+    """
+    GUI-free operations on the school data.
+
+    This is the business layer shared by the Tkinter app and the command
+    line: it owns the registry, its search index and the persistence and
+    bulk import/export helpers, and never imports ``tkinter``. Errors are
+    reported with :class:`ValueError` and :class:`LookupError` carrying a
+    user-readable message.
+
+    :param storage: Optional storage backend, see :class:`storage.Storage`.
+    :param journal: Optional :class:`journal.Journal` recording every change
+        as it happens; :meth:`load` then recovers from its snapshot and
+        journal, and :meth:`commit` makes the changes durable.
+    :raises ValueError: If both a storage backend and a journal are given.
+    """
+
+    def __init__(self, storage=None, journal=None):
+        if storage is not None and journal is not None:
+            raise ValueError("A journal cannot be combined with a storage backend.")
+        self.storage = storage
+        self.journal = journal
+        self.registry = Registry(storage)
+        self._search_index = None
+        self.validator = Validator(self.registry)
+        #: Aggregate statistics kept up to date as the data changes.
+        self.reports = Reports(self.registry)
+        #: Warnings about the last record added, such as a repeated name.
+        self.warnings = []
+        self._edited = None
+        self.registry.add_listener(self._on_change)
+        if journal is not None:
+            journal.attach(self.registry)
+
+    def _on_change(self, event, record_type, record):
+        if event in ("clear", "reset"):
+            # The edited record's links point into data that is gone.
+            self._edited = None
+
+    @property
+    def search_index(self):
+        """
+        The object answering searches.
+
+        With a storage backend this is the backend itself; otherwise a
+        :class:`search_index.SearchIndex` built on first use, so one-shot
+        commands that never search do not pay for indexing.
+        """
+        if self.storage is not None:
+            return self.storage
+        if self._search_index is None:
+            self._search_index = SearchIndex(self.registry)
+        return self._search_index
+
+    @property
+    def data_path(self):
+        """
+        The data file the front ends save to and load from: the file of a
+        :class:`binary_snapshot.SnapshotStorage` backend, the snapshot of the
+        journal, or :data:`persistence.DATA_FILE`.
+        """
+        if isinstance(self.storage, SnapshotStorage):
+            return self.storage.path
+        if self.journal is not None:
+            return self.journal.data_path
+        return persistence.DATA_FILE
+
+    def add_student(self, name, age, email, student_id):
+        """
+        Adds a student.
+
+        :param age: The age, as entered or as an integer.
+        :return: The new student.
+        :rtype: Student
+        :raises ValueError: If the age or email is invalid, or the ID or email
+            is already used; see :meth:`validation.Validator.check`.
+        """
+        student = Student(name, self._parse_age(age), email, student_id)
+        self.warnings = self.validator.require("Student", student)
+        self.registry.add_student(student)
+        self._restore_links("Student", student)
+        return student
+
+    def add_instructor(self, name, age, email, instructor_id):
+        """
+        Adds an instructor.
+
+        :param age: The age, as entered or as an integer.
+        :return: The new instructor.
+        :rtype: Instructor
+        :raises ValueError: If the age or email is invalid, or the ID or email
+            is already used; see :meth:`validation.Validator.check`.
+        """
+        instructor = Instructor(name, self._parse_age(age), email, instructor_id)
+        self.warnings = self.validator.require("Instructor", instructor)
+        self.registry.add_instructor(instructor)
+        self._restore_links("Instructor", instructor)
+        return instructor
+
+    def add_course(self, course_id, course_name):
+        """
+        Adds a course.
+
+        :return: The new course.
+        :rtype: Course
+        :raises ValueError: If the ID is missing or already exists.
+        """
+        course = Course(course_id, course_name)
+        self.warnings = self.validator.require("Course", course)
+        self.registry.add_course(course)
+        self._restore_links("Course", course)
+        return course
+
+    @staticmethod
+    def _parse_age(age):
+        try:
+            return parse_age(age)
+        except (TypeError, ValueError):
+            raise ValueError("Please enter a valid age.")
+
+    def find(self, record_type, record_id=None, name=None):
+        """
+        Looks a record up by ID, or by name when no ID is given.
+
+        :param record_type: One of ``"Student"``, ``"Instructor"`` or ``"Course"``.
+        :type record_type: str
+        :raises LookupError: If no such record exists.
+        """
+        if record_id is not None:
+            record = self.registry.get(record_type, record_id)
+        else:
+            record = self.registry.find_by_name(record_type, name)
+        if record is None:
+            raise LookupError(f"{record_type} {record_id if record_id is not None else name} not found")
+        return record
+
+    def register_student(self, student, course):
+        """
+        Registers a student to a course.
+
+        :param student: The student, or its ID.
+        :param course: The course, or its ID.
+        :raises LookupError: If either record does not exist.
+        """
+        if not isinstance(student, Student):
+            student = self.find("Student", student)
+        if not isinstance(course, Course):
+            course = self.find("Course", course)
+        self.registry.register(student, course)
+
+    def assign_instructor(self, instructor, course):
+        """
+        Assigns an instructor to a course.
+
+        :param instructor: The instructor, or its ID.
+        :param course: The course, or its ID.
+        :raises LookupError: If either record does not exist.
+        """
+        if not isinstance(instructor, Instructor):
+            instructor = self.find("Instructor", instructor)
+        if not isinstance(course, Course):
+            course = self.find("Course", course)
+        self.registry.assign(instructor, course)
+
+    def roster(self, course_id):
+        """
+        Returns the students registered to a course.
+
+        :param course_id: The course ID.
+        :rtype: list[Student]
+        :raises LookupError: If the course does not exist.
+        """
+        course = self.find("Course", course_id)
+        return [self.registry.get("Student", student_id) for student_id in self.registry.members(course.course_id)]
+
+    def instructors(self, course_id):
+        """
+        Returns the instructors assigned to a course.
+
+        :param course_id: The course ID.
+        :rtype: list[Instructor]
+        :raises LookupError: If the course does not exist.
+        """
+        course = self.find("Course", course_id)
+        return [self.registry.get("Instructor", instructor_id)
+                for instructor_id in self.registry.members(course.course_id, "Instructor")]
+
+    def course_load(self, instructor_id):
+        """
+        Returns the courses an instructor is assigned to.
+
+        :param instructor_id: The instructor ID.
+        :rtype: list[Course]
+        :raises LookupError: If the instructor does not exist.
+        """
+        instructor = self.find("Instructor", instructor_id)
+        return [self.registry.get("Course", course_id) for course_id in instructor.course_ids]
+
+    def shared_students(self, course_a, course_b):
+        """
+        Returns the students registered to both courses.
+
+        :rtype: list[Student]
+        :raises LookupError: If either course does not exist.
+        """
+        a = self.find("Course", course_a)
+        b = self.find("Course", course_b)
+        return [self.registry.get("Student", student_id)
+                for student_id in self.registry.shared_members(a.course_id, b.course_id)]
+
+    def remove(self, record_type, record_id):
+        """
+        Removes a record; removing a course unregisters everyone from it.
+
+        :return: The removed record, or ``None`` if it did not exist.
+        """
+        return self.registry.remove(record_type, record_id)
+
+    def edit(self, record_type, record_id):
+        """
+        Takes a record out so it can be added again with new values.
+
+        The record is removed like with :meth:`remove`, but its links are
+        kept: if the next record added through this service has the same
+        type and ID, it gets them back, i.e. the courses of a student or
+        instructor, or the students and instructors of a course. Renaming a
+        course through an edit therefore keeps its roster. Any other add,
+        :meth:`cancel_edit` or replacing the data drops the links; only the
+        last edit is kept.
+
+        :return: The removed record, or ``None`` if it did not exist.
+        """
+        if record_type == "Course":
+            links = [(person_type, person_id) for person_type in validation.PEOPLE_TYPES
+                     for person_id in self.registry.members(record_id, person_type)]
+        else:
+            record = self.registry.get(record_type, record_id)
+            links = list(record.course_ids) if record is not None else []
+        record = self.remove(record_type, record_id)
+        if record is not None:
+            self._edited = (record_type, str(record.record_id), links)
+        return record
+
+    def cancel_edit(self):
+        """Forgets the links kept by the last :meth:`edit`."""
+        self._edited = None
+
+    def _restore_links(self, record_type, record):
+        edited, self._edited = self._edited, None
+        if edited is None or edited[:2] != (record_type, str(record.record_id)):
+            return
+        links = edited[2]
+        with self.registry.batch():
+            for link in links:
+                if record_type == "Course":
+                    (person_type, person), course = link, record
+                else:
+                    person_type, person, course = record_type, record, link
+                try:
+                    if person_type == "Student":
+                        self.register_student(person, course)
+                    else:
+                        self.assign_instructor(person, course)
+                except LookupError:
+                    # Removed since the edit.
+                    continue
+
+    def search(self, criterion, text, limit=None):
+        """
+        Searches records like the GUI search bar.
+
+        :param criterion: ``"Name"``, ``"ID"`` or ``"Course"``.
+        :type criterion: str
+        :param text: The text to look for.
+        :type text: str
+        :param limit: Maximum number of hits, or ``None`` for all.
+        :type limit: int
+        :return: Ranked ``(record_type, record_id)`` keys, as a sequence
+            read a page at a time for name searches on the in-memory index;
+            empty for an unknown criterion.
+        :rtype: collections.abc.Sequence[tuple]
+        """
+        if criterion not in SEARCH_CRITERIA:
+            return []
+        kind, record_types = SEARCH_CRITERIA[criterion]
+        if kind == "ids":
+            return self.search_index.search_ids(record_types, text, limit)
+        return self.search_index.search_names(record_types, text, limit)
+
+    def row(self, key):
+        """
+        Returns the ``(record_type, name, record_id)`` display row for a key.
+
+        :param key: A ``(record_type, record_id)`` key.
+        :return: The row, or ``None`` if the record no longer exists.
+        """
+        record_type, record_id = key
+        record = self.registry.get(record_type, record_id)
+        if record is None:
+            return None
+        return record_type, record.display_name, record_id
+
+    def snapshot(self):
+        """
+        Captures the data for a later :meth:`save`; see :func:`persistence.snapshot`.
+
+        With a :class:`binary_snapshot.SnapshotStorage` backend, this is a
+        :meth:`~binary_snapshot.SnapshotStorage.view` of it instead, which
+        does not decode the records.
+        """
+        if isinstance(self.storage, SnapshotStorage):
+            return self.storage.view()
+        return persistence.snapshot(self.registry)
+
+    @staticmethod
+    def _entries(source):
+        if isinstance(source, SnapshotStorage):
+            return binary_snapshot.entries(source)
+        return source
+
+    def save(self, entries=None, path=persistence.DATA_FILE, progress=None):
+        """
+        Saves the data to a newline-delimited JSON file, or to a binary
+        snapshot if ``path`` ends with :data:`binary_snapshot.SNAPSHOT_SUFFIX`.
+        A view of a :class:`binary_snapshot.SnapshotStorage` saved to its own
+        file goes to the next generation of the file, see :meth:`saved`.
+
+        :param entries: A :meth:`snapshot`; the current data if omitted.
+        :return: Number of records written.
+        :rtype: int
+        """
+        source = self.registry if entries is None else entries
+        if isinstance(source, SnapshotStorage) and path == source.path:
+            return source.save(progress)
+        if path.endswith(SNAPSHOT_SUFFIX):
+            return binary_snapshot.write(source, path, progress)
+        return persistence.save(self._entries(source), path, progress)
+
+    def saved(self, entries, path):
+        """
+        Tells the storage backend that a :meth:`snapshot` was saved.
+
+        If ``path`` is the file of a :class:`binary_snapshot.SnapshotStorage`
+        backend, it maps the new file, unless the data changed in the meantime.
+        """
+        if isinstance(entries, SnapshotStorage) and path == self.storage.path:
+            self.storage.saved(entries)
+
+    def read(self, path=persistence.DATA_FILE, progress=None):
+        """
+        Reads a data file into a new registry without touching this service.
+
+        With a journal on ``path``, the snapshot is loaded and the journal
+        replayed, see :func:`journal.recover`. Otherwise falls back to the
+        whole-document ``school_data.json`` written by earlier versions when
+        ``path`` is the default file and it does not exist yet. Safe to call
+        from a worker thread.
+
+        Binary snapshots are decoded whole, see :func:`binary_snapshot.load`.
+
+        :rtype: registry.Registry
+        :raises FileNotFoundError: If no data file exists.
+        """
+        if self.journal is not None and path == self.journal.data_path:
+            return recover(path, progress)
+        if path.endswith(SNAPSHOT_SUFFIX):
+            return binary_snapshot.load(path, progress)
+        if path == persistence.DATA_FILE and not os.path.exists(path) \
+                and os.path.exists(persistence.LEGACY_DATA_FILE):
+            return persistence.load_legacy()
+        return persistence.load(path, progress)
+
+    def replace(self, loaded):
+        """
+        Replaces every record with those of a registry returned by :meth:`read`.
+
+        The replacement is not journaled: it reflects data already on disk.
+
+        :type loaded: registry.Registry
+        """
+        if self.journal is None:
+            self.registry.replace_with(loaded)
+            return
+        with self.journal.paused():
+            self.registry.replace_with(loaded)
+
+    def load(self, path=persistence.DATA_FILE, progress=None):
+        """
+        Reads a data file and replaces every record with its content.
+
+        A :class:`binary_snapshot.SnapshotStorage` backend asked to load its
+        own file maps it again instead, discarding unsaved changes in
+        constant time.
+        """
+        if isinstance(self.storage, SnapshotStorage) and path == self.storage.path:
+            self.storage.reload()
+            self.registry.discard_cache()
+            self.reports.invalidate()
+            return
+        self.replace(self.read(path, progress))
+
+    def commit(self):
+        """
+        Makes the journaled changes durable.
+
+        :return: Number of journal entries synced, 0 without a journal.
+        :rtype: int
+        """
+        return self.journal.sync() if self.journal is not None else 0
+
+    def compaction_due(self):
+        """Whether the journal should be folded into a new snapshot, see :meth:`journal.Journal.compaction_due`."""
+        if self.journal is None or self.journal.compacting:
+            return False
+        return self.journal.compaction_due(sum(self.counts().values()))
+
+    def begin_compaction(self):
+        """
+        Starts folding the journal into a new snapshot.
+
+        :return: A :meth:`snapshot` to :meth:`save` to the journal's data
+            file, e.g. from a worker thread, before :meth:`finish_compaction`.
+        """
+        self.journal.rotate()
+        return self.snapshot()
+
+    def finish_compaction(self):
+        """Discards the journal folded into the snapshot saved since :meth:`begin_compaction`."""
+        self.journal.finish_compaction()
+
+    @staticmethod
+    def validate_file(path, fmt=None, progress=None):
+        """
+        Validates a CSV or NDJSON roster; see :func:`bulk_io.validate` and
+        :func:`validation.validate_import`.
+
+        Safe to call from a worker thread.
+
+        :rtype: bulk_io.ImportResult
+        """
+        return validation.validate_import(bulk_io.validate(path, fmt, progress))
+
+    def commit_import(self, result):
+        """
+        Adds the records of a validated roster; see :func:`bulk_io.commit`.
+
+        Records whose email is already used are rejected first, see
+        :meth:`validation.Validator.filter_import`.
+
+        :rtype: bulk_io.ImportResult
+        """
+        return bulk_io.commit(self.validator.filter_import(result), self.registry)
+
+    def import_file(self, path, fmt=None, progress=None):
+        """
+        Validates and imports a CSV or NDJSON roster.
+
+        :rtype: bulk_io.ImportResult
+        """
+        return self.commit_import(self.validate_file(path, fmt, progress))
+
+    def export_file(self, path, fmt=None, entries=None):
+        """
+        Exports every record to a CSV or NDJSON roster.
+
+        :param entries: A :meth:`snapshot`; the current data if omitted.
+        :return: Number of records written.
+        :rtype: int
+        """
+        return bulk_io.export_file(self.registry if entries is None else self._entries(entries), path, fmt)
+
+    def validate(self, registry=None, workers=None):
+        """
+        Checks every record for invalid emails and repeated IDs, emails and names.
+
+        Safe to call from a worker thread on a registry returned by :meth:`read`.
+
+        :param registry: The records to check; this service's if omitted.
+        :type registry: registry.Registry
+        :param workers: See :func:`validation.validate_rows`.
+        :type workers: int
+        :rtype: validation.ValidationReport
+        """
+        return validation.validate_registry(self.registry if registry is None else registry, workers)
+
+    def counts(self):
+        """
+        Returns the number of records per type, without scanning them.
+
+        :rtype: dict
+        """
+        return {record_type: self.registry.count(record_type) for record_type in RECORD_TYPES}
+
+    def stats(self):
+        """
+        Returns record counts, read from the aggregates of :attr:`reports`,
+        or counted by the storage backend, which does not load the records.
+
+        :return: A dictionary with the number of records per type and the
+            number of student registrations and instructor assignments.
+        :rtype: dict
+        """
+        if self.storage is not None:
+            totals = {"Registrations": self.storage.link_count("Student"),
+                      "Assignments": self.storage.link_count("Instructor")}
+        else:
+            totals = self.reports.totals()
+        return {**self.counts(), **totals}
+
+    def report(self, limit=None):
+        """
+        Returns the aggregate statistics; see :meth:`reports.Reports.to_dict`.
+
+        :param limit: Maximum number of rows per ranking.
+        :type limit: int
+        :rtype: dict
+        """
+        return {**self.counts(), **self.reports.to_dict(limit)}
+
+    def close(self):
+        """Releases the storage backend or closes the journal, if any."""
+        if self.storage is not None:
+            self.storage.close()
+        if self.journal is not None:
+            self.journal.close()
@@ -0,0 +1,559 @@
+import bisect
+import heapq
+import sqlite3
+from itertools import islice
+
+from registry import RECORD_TYPES
+from search_index import MIN_SUBSTRING_LENGTH
+from validation import email_key
+
+#: Default SQLite database file.
+DB_FILE = "school_data.db"
+
+#: Rows between two rowids remembered by :meth:`SQLiteStorage.rows` to
+#: seek to a page instead of skipping every row before it.
+PAGE_CHECKPOINT = 256
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS people (
+    kind TEXT NOT NULL,
+    id TEXT NOT NULL,
+    id_key TEXT NOT NULL,
+    name TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    age INTEGER,
+    email TEXT,
+    email_key TEXT,
+    PRIMARY KEY (kind, id)
+);
+CREATE INDEX IF NOT EXISTS people_kind ON people (kind);
+CREATE INDEX IF NOT EXISTS people_name ON people (kind, name);
+CREATE INDEX IF NOT EXISTS people_id_key ON people (kind, id_key);
+CREATE INDEX IF NOT EXISTS people_name_key ON people (kind, name_key);
+CREATE TABLE IF NOT EXISTS courses (
+    id TEXT PRIMARY KEY,
+    id_key TEXT NOT NULL,
+    name TEXT NOT NULL,
+    name_key TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS courses_name ON courses (name);
+CREATE INDEX IF NOT EXISTS courses_id_key ON courses (id_key);
+CREATE INDEX IF NOT EXISTS courses_name_key ON courses (name_key);
+CREATE TABLE IF NOT EXISTS enrollments (
+    kind TEXT NOT NULL,
+    person_id TEXT NOT NULL,
+    course_id TEXT NOT NULL,
+    PRIMARY KEY (kind, person_id, course_id)
+);
+CREATE INDEX IF NOT EXISTS enrollments_course ON enrollments (course_id);
+"""
+
+#: Trigram full-text indexes of the lowercase names, kept in sync with the
+#: tables by triggers, for substring searches. Needs SQLite 3.34 or later
+#: built with FTS5; substring searches scan the tables otherwise.
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5(
+    name_key, content='{table}', content_rowid='rowid', tokenize='trigram case_sensitive 1'
+);
+CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN
+    INSERT INTO {table}_fts (rowid, name_key) VALUES (new.rowid, new.name_key);
+END;
+CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN
+    INSERT INTO {table}_fts ({table}_fts, rowid, name_key) VALUES ('delete', old.rowid, old.name_key);
+END;
+CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF name_key ON {table} BEGIN
+    INSERT INTO {table}_fts ({table}_fts, rowid, name_key) VALUES ('delete', old.rowid, old.name_key);
+    INSERT INTO {table}_fts (rowid, name_key) VALUES (new.rowid, new.name_key);
+END;
+"""
+
+#: Indexes on columns added after the first version of :data:`SCHEMA`,
+#: created once :meth:`SQLiteStorage._migrate` has added the columns.
+LATE_INDEXES = """
+CREATE INDEX IF NOT EXISTS people_email_key ON people (kind, email_key);
+"""
+
+#: Name of the serialized course list field for each people record type.
+COURSE_FIELDS = {"Student": "registered_courses", "Instructor": "assigned_courses"}
+ID_FIELDS = {"Student": "student_id", "Instructor": "instructor_id"}
+
+
+class Storage:
+    """
+    Interface of the storage backends a :class:`registry.Registry` can use.
+
+    A backend is the authoritative copy of the data. The registry forwards
+    every change to :meth:`on_change` and falls back to :meth:`fetch` and
+    :meth:`find_by_name` for records it has not cached. Backends also page
+    display rows and answer searches directly, so the GUI never needs the
+    whole dataset in memory.
+    """
+
+    def on_change(self, event, record_type, record):
+        """Registry listener; see :meth:`registry.Registry.add_listener`."""
+        raise NotImplementedError
+
+    def fetch(self, record_type, record_id):
+        """Returns a record in its ``to_dict`` form, or ``None``."""
+        raise NotImplementedError
+
+    def find_by_name(self, record_type, name):
+        """Returns the ID of the first record with the given name, or ``None``."""
+        raise NotImplementedError
+
+    def count(self, record_type):
+        """Returns the number of records of a type."""
+        raise NotImplementedError
+
+    def rows(self, record_type, offset, limit):
+        """Returns ``(record_type, name, record_id)`` rows in insertion order."""
+        raise NotImplementedError
+
+    def iter_dicts(self, record_type):
+        """Yields every record of a type in its ``to_dict`` form."""
+        raise NotImplementedError
+
+    def names(self, record_type, limit=None):
+        """Returns up to ``limit`` distinct display names of a record type."""
+        raise NotImplementedError
+
+    def search_names(self, record_types, text, limit=None):
+        """Same contract as :meth:`search_index.SearchIndex.search_names`."""
+        raise NotImplementedError
+
+    def members(self, course_id, record_type):
+        """Same contract as :meth:`enrollment.EnrollmentGraph.members`."""
+        raise NotImplementedError
+
+    def member_count(self, course_id, record_type):
+        """Same contract as :meth:`enrollment.EnrollmentGraph.member_count`."""
+        raise NotImplementedError
+
+    def shared_members(self, course_a, course_b, record_type):
+        """Same contract as :meth:`enrollment.EnrollmentGraph.shared`."""
+        raise NotImplementedError
+
+    def search_ids(self, record_types, text, limit=None):
+        """Same contract as :meth:`search_index.SearchIndex.search_ids`."""
+        raise NotImplementedError
+
+    def link_count(self, record_type):
+        """Returns the number of course links of the students or instructors."""
+        raise NotImplementedError
+
+    def find_by_email(self, record_type, email):
+        """
+        Returns the ID of the first student or instructor with the given
+        email, compared by :func:`validation.email_key`, or ``None``.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Releases the backend resources."""
+
+
+class SQLiteStorage(Storage):
+    """
+    Storage backend keeping records in a local SQLite database file.
+
+    People, courses and enrollments live in indexed tables. Changes are
+    committed as they happen, except inside a registry batch, which is
+    committed as one transaction.
+
+    :param path: The database file, created if missing.
+    :type path: str
+    """
+
+    def __init__(self, path=DB_FILE):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+        self._migrate()
+        self.connection.executescript(LATE_INDEXES)
+        self._fts = self._create_fts()
+        self.connection.commit()
+        self._batch_depth = 0
+        self._counts = {}
+        self._checkpoints = {}
+
+    def _migrate(self):
+        # Databases created before the email_key column get it filled in once.
+        db = self.connection
+        columns = [row[1] for row in db.execute("PRAGMA table_info(people)")]
+        if "email_key" not in columns:
+            db.execute("ALTER TABLE people ADD COLUMN email_key TEXT")
+            rows = db.execute("SELECT rowid, email FROM people").fetchall()
+            db.executemany("UPDATE people SET email_key = ? WHERE rowid = ?",
+                           [(email_key(email), rowid) for rowid, email in rows])
+
+    def _create_fts(self):
+        db = self.connection
+        existing = {name for (name,) in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        try:
+            for table in ("people", "courses"):
+                db.executescript(FTS_SCHEMA.format(table=table))
+                if f"{table}_fts" not in existing:
+                    # Databases created before the index get it filled in once.
+                    db.execute(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild')")
+        except sqlite3.OperationalError:
+            # No FTS5 or no trigram tokenizer in this SQLite build.
+            return False
+        return True
+
+    def close(self):
+        """Commits pending changes and closes the database."""
+        self.connection.commit()
+        self.connection.close()
+
+    def on_change(self, event, record_type, record):
+        """Writes a registry change through to the database."""
+        db = self.connection
+        if event == "begin":
+            self._batch_depth += 1
+            return
+        if event == "end":
+            self._batch_depth -= 1
+        elif event == "add" and record_type == "Course":
+            course_id = str(record.course_id)
+            cursor = db.execute(
+                "INSERT INTO courses (id, id_key, name, name_key) VALUES (?, ?, ?, ?)",
+                (course_id, course_id.lower(), record.course_name, record.course_name.lower()),
+            )
+            self._row_added(record_type, cursor.lastrowid)
+        elif event == "add":
+            record_id = str(record.record_id)
+            cursor = db.execute(
+                "INSERT INTO people (kind, id, id_key, name, name_key, age, email, email_key) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (record_type, record_id, record_id.lower(), record.name, record.name.lower(),
+                 record.age, record.email, email_key(record.email)),
+            )
+            self._row_added(record_type, cursor.lastrowid)
+            self._write_enrollments(record_type, record)
+        elif event in ("register", "assign"):
+            self._write_enrollments(record_type, record)
+        elif event == "remove" and record_type == "Course":
+            course_id = str(record.course_id)
+            row = db.execute("SELECT rowid FROM courses WHERE id = ?", (course_id,)).fetchone()
+            db.execute("DELETE FROM courses WHERE id = ?", (course_id,))
+            db.execute("DELETE FROM enrollments WHERE course_id = ?", (course_id,))
+            self._row_removed(record_type, row and row[0])
+        elif event == "remove":
+            record_id = str(record.record_id)
+            row = db.execute("SELECT rowid FROM people WHERE kind = ? AND id = ?",
+                             (record_type, record_id)).fetchone()
+            db.execute("DELETE FROM people WHERE kind = ? AND id = ?", (record_type, record_id))
+            db.execute("DELETE FROM enrollments WHERE kind = ? AND person_id = ?", (record_type, record_id))
+            self._row_removed(record_type, row and row[0])
+        elif event == "clear":
+            db.execute("DELETE FROM people")
+            db.execute("DELETE FROM courses")
+            db.execute("DELETE FROM enrollments")
+            self._counts = dict.fromkeys(RECORD_TYPES, 0)
+            self._checkpoints.clear()
+        if self._batch_depth == 0:
+            db.commit()
+
+    def _row_added(self, record_type, rowid):
+        if record_type not in self._counts:
+            return
+        self._counts[record_type] += 1
+        checkpoints = self._checkpoints.get(record_type)
+        if checkpoints is None:
+            return
+        rowids, positions = checkpoints
+        position = self._counts[record_type] - 1
+        if rowids and rowid <= rowids[-1]:
+            # A reused rowid lands before the last checkpoint; list them again.
+            del self._checkpoints[record_type]
+        elif not positions or position - positions[-1] >= PAGE_CHECKPOINT:
+            rowids.append(rowid)
+            positions.append(position)
+
+    def _row_removed(self, record_type, rowid):
+        if rowid is None:
+            return
+        if record_type in self._counts:
+            self._counts[record_type] -= 1
+        checkpoints = self._checkpoints.get(record_type)
+        if checkpoints is not None:
+            # Later rows move up by one; a removed checkpoint now seeks to the row after it.
+            rowids, positions = checkpoints
+            for index in range(bisect.bisect_right(rowids, rowid), len(rowids)):
+                positions[index] -= 1
+
+    def _write_enrollments(self, record_type, record):
+        self.connection.execute(
+            "DELETE FROM enrollments WHERE kind = ? AND person_id = ?", (record_type, str(record.record_id)))
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO enrollments (kind, person_id, course_id) VALUES (?, ?, ?)",
+            [(record_type, str(record.record_id), course_id) for course_id in record.enrolled_courses],
+        )
+
+    def fetch(self, record_type, record_id):
+        """Returns a record in its ``to_dict`` form, or ``None``."""
+        db = self.connection
+        if record_type == "Course":
+            row = db.execute("SELECT id, name FROM courses WHERE id = ?", (record_id,)).fetchone()
+            return None if row is None else {"course_id": row[0], "course_name": row[1]}
+        row = db.execute(
+            "SELECT name, age, email, id FROM people WHERE kind = ? AND id = ?", (record_type, record_id)
+        ).fetchone()
+        if row is None:
+            return None
+        return self._person_dict(record_type, row)
+
+    def _person_dict(self, record_type, row):
+        courses = [course_id for (course_id,) in self.connection.execute(
+            "SELECT course_id FROM enrollments WHERE kind = ? AND person_id = ?", (record_type, row[3]))]
+        return {
+            "name": row[0],
+            "age": row[1],
+            "email": row[2],
+            ID_FIELDS[record_type]: row[3],
+            COURSE_FIELDS[record_type]: courses,
+        }
+
+    def find_by_name(self, record_type, name):
+        """Returns the ID of the first record with the given name, or ``None``."""
+        if record_type == "Course":
+            row = self.connection.execute(
+                "SELECT id FROM courses WHERE name = ? ORDER BY rowid LIMIT 1", (name,)).fetchone()
+        else:
+            row = self.connection.execute(
+                "SELECT id FROM people WHERE kind = ? AND name = ? ORDER BY rowid LIMIT 1",
+                (record_type, name)).fetchone()
+        return None if row is None else row[0]
+
+    def link_count(self, record_type):
+        """Returns the number of course links of the students or instructors."""
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM enrollments WHERE kind = ?", (record_type,)).fetchone()[0]
+
+    def find_by_email(self, record_type, email):
+        """Returns the ID of the first person with the given email, or ``None``."""
+        row = self.connection.execute(
+            "SELECT id FROM people WHERE kind = ? AND email_key = ? ORDER BY rowid LIMIT 1",
+            (record_type, email_key(email))).fetchone()
+        return None if row is None else row[0]
+
+    def count(self, record_type):
+        """
+        Returns the number of records of a type.
+
+        Counted once, then kept up to date as records are added and removed.
+        """
+        count = self._counts.get(record_type)
+        if count is None:
+            if record_type == "Course":
+                cursor = self.connection.execute("SELECT COUNT(*) FROM courses")
+            else:
+                cursor = self.connection.execute("SELECT COUNT(*) FROM people WHERE kind = ?", (record_type,))
+            count = self._counts[record_type] = cursor.fetchone()[0]
+        return count
+
+    def _row_checkpoints(self, record_type):
+        checkpoints = self._checkpoints.get(record_type)
+        if checkpoints is None:
+            count = self.count(record_type)
+            if record_type == "Course":
+                cursor = self.connection.execute("SELECT rowid FROM courses ORDER BY rowid")
+            else:
+                cursor = self.connection.execute("SELECT rowid FROM people WHERE kind = ? ORDER BY rowid",
+                                                 (record_type,))
+            rowids = [rowid for (rowid,) in islice(cursor, 0, None, PAGE_CHECKPOINT)]
+            checkpoints = self._checkpoints[record_type] = (rowids, list(range(0, count, PAGE_CHECKPOINT)))
+        return checkpoints
+
+    def rows(self, record_type, offset, limit):
+        """
+        Returns ``(record_type, name, record_id)`` rows in insertion order.
+
+        The rowid of every :data:`PAGE_CHECKPOINT`-th row is remembered with
+        its position, so a page far down the table is read by seeking to
+        the closest rowid before it rather than by skipping every row up to
+        ``offset``. Positions are adjusted as rows are added and removed.
+        """
+        limit = -1 if limit is None else limit
+        start = 0
+        if offset >= PAGE_CHECKPOINT:
+            rowids, positions = self._row_checkpoints(record_type)
+            index = bisect.bisect_right(positions, offset) - 1
+            if index < 0:
+                return []
+            start = rowids[index]
+            offset -= positions[index]
+        if record_type == "Course":
+            cursor = self.connection.execute(
+                "SELECT name, id FROM courses WHERE rowid >= ? ORDER BY rowid LIMIT ? OFFSET ?",
+                (start, limit, offset))
+        else:
+            cursor = self.connection.execute(
+                "SELECT name, id FROM people WHERE kind = ? AND rowid >= ? ORDER BY rowid LIMIT ? OFFSET ?",
+                (record_type, start, limit, offset))
+        return [(record_type, name, record_id) for name, record_id in cursor]
+
+    def iter_dicts(self, record_type):
+        """Yields every record of a type in its ``to_dict`` form."""
+        if record_type == "Course":
+            for course_id, name in self.connection.execute("SELECT id, name FROM courses ORDER BY rowid"):
+                yield {"course_id": course_id, "course_name": name}
+            return
+        cursor = self.connection.execute(
+            "SELECT name, age, email, id FROM people WHERE kind = ? ORDER BY rowid", (record_type,))
+        for row in cursor:
+            yield self._person_dict(record_type, row)
+
+    def names(self, record_type, limit=None):
+        """Returns up to ``limit`` distinct display names of a record type."""
+        limit = -1 if limit is None else limit
+        if record_type == "Course":
+            cursor = self.connection.execute("SELECT DISTINCT name FROM courses LIMIT ?", (limit,))
+        else:
+            cursor = self.connection.execute(
+                "SELECT DISTINCT name FROM people WHERE kind = ? LIMIT ?", (record_type, limit))
+        return [name for (name,) in cursor]
+
+    def search_names(self, record_types, text, limit=None):
+        """
+        Finds records whose name contains the given text, ranked like
+        :meth:`search_index.SearchIndex.search_names`.
+
+        Queries of :data:`search_index.MIN_SUBSTRING_LENGTH` characters or
+        more are looked up in the trigram indexes of :data:`FTS_SCHEMA` when
+        SQLite supports them. Shorter ones take their prefix matches, ranked
+        first, from a range scan of the ``name_key`` indexes, and scan the
+        names for the rest only if the limit is not reached.
+        """
+        query = str(text).strip().lower()
+        if len(query) >= MIN_SUBSTRING_LENGTH:
+            return self._search_substring(record_types, query, limit)
+        hits = self._search_prefix(record_types, query, limit)
+        if query and (limit is None or len(hits) < limit):
+            remaining = None if limit is None else limit - len(hits)
+            hits.extend(self._search_substring(record_types, query, remaining, inner=True))
+        return hits
+
+    def _search_substring(self, record_types, query, limit, inner=False):
+        ranked = []
+        for record_type in record_types:
+            for name, record_id in self._substring_matches(record_type, query, inner):
+                position = name.find(query)
+                rank = 0 if name == query else 1 if position == 0 else 2
+                ranked.append((rank, position, name, record_type, record_id))
+        if limit is not None:
+            ranked = heapq.nsmallest(limit, ranked)
+        else:
+            ranked.sort()
+        return [(record_type, record_id) for _, _, _, record_type, record_id in ranked]
+
+    def _substring_matches(self, record_type, query, inner):
+        table = "courses" if record_type == "Course" else "people"
+        kind = "" if record_type == "Course" else " AND t.kind = :kind"
+        if inner:
+            # Only the matches after the start of the name.
+            sql = f"SELECT t.name_key, t.id FROM {table} t WHERE instr(t.name_key, :query) > 1{kind}"
+        elif self._fts:
+            # A trigram phrase matches the names containing the query.
+            # The subquery keeps SQLite from probing the index once per row.
+            sql = (f"SELECT t.name_key, t.id FROM {table} t WHERE t.rowid IN "
+                   f"(SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH :phrase){kind}")
+        else:
+            sql = f"SELECT t.name_key, t.id FROM {table} t WHERE instr(t.name_key, :query) > 0{kind}"
+        phrase = '"' + query.replace('"', '""') + '"'
+        return self.connection.execute(sql, {"phrase": phrase, "query": query, "kind": record_type})
+
+    def _search_prefix(self, record_types, query, limit):
+        upper = query + "\U0010ffff"
+        sql_limit = -1 if limit is None else limit
+        streams = []
+        for record_type in record_types:
+            if record_type == "Course":
+                cursor = self.connection.execute(
+                    "SELECT name_key, id FROM courses WHERE name_key >= ? AND name_key < ? "
+                    "ORDER BY name_key, id LIMIT ?", (query, upper, sql_limit))
+            else:
+                cursor = self.connection.execute(
+                    "SELECT name_key, id FROM people WHERE kind = ? AND name_key >= ? AND name_key < ? "
+                    "ORDER BY name_key, id LIMIT ?", (record_type, query, upper, sql_limit))
+            streams.append([(0 if name == query else 1, name, record_type, record_id)
+                            for name, record_id in cursor])
+        ranked = heapq.merge(*streams)
+        return [(record_type, record_id) for _, _, record_type, record_id in islice(ranked, limit)]
+
+    def search_ids(self, record_types, text, limit=None):
+        """
+        Finds records whose ID contains the given text, those starting with
+        it first, then in ID order, up to ``limit`` per type.
+        """
+        text = str(text).strip().lower()
+        hits = []
+        for record_type in record_types:
+            table, kind = ("courses", "") if record_type == "Course" else ("people", "kind = :kind AND ")
+            found = self.connection.execute(
+                f"SELECT id FROM {table} WHERE {kind}id_key >= :text AND id_key < :upper "
+                f"ORDER BY id_key, id LIMIT :limit",
+                {"text": text, "upper": text + "\U0010ffff", "kind": record_type,
+                 "limit": -1 if limit is None else limit}).fetchall()
+            if text and (limit is None or len(found) < limit):
+                # The IDs containing the text further in; a scan of the table.
+                found += self.connection.execute(
+                    f"SELECT id FROM {table} WHERE {kind}instr(id_key, :text) > 1 ORDER BY id_key, id LIMIT :limit",
+                    {"text": text, "kind": record_type,
+                     "limit": -1 if limit is None else limit - len(found)}).fetchall()
+            hits.extend((record_type, record_id) for (record_id,) in found)
+        return hits
+
+    def members(self, course_id, record_type):
+        """Returns the IDs of the people of a type linked to a course, in link order."""
+        cursor = self.connection.execute(
+            "SELECT person_id FROM enrollments WHERE course_id = ? AND kind = ? ORDER BY rowid",
+            (course_id, record_type))
+        return [person_id for (person_id,) in cursor]
+
+    def member_count(self, course_id, record_type):
+        """Returns the number of people of a type linked to a course."""
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM enrollments WHERE course_id = ? AND kind = ?", (course_id, record_type)
+        ).fetchone()[0]
+
+    def shared_members(self, course_a, course_b, record_type):
+        """Returns the IDs of the people of a type linked to both courses."""
+        cursor = self.connection.execute(
+            "SELECT a.person_id FROM enrollments a JOIN enrollments b "
+            "ON b.course_id = ? AND b.kind = a.kind AND b.person_id = a.person_id "
+            "WHERE a.course_id = ? AND a.kind = ? ORDER BY a.rowid",
+            (course_b, course_a, record_type))
+        return [person_id for (person_id,) in cursor]
+
+
+class StorageRows:
+    """
+    Lazy row source over a storage backend for :class:`record_view.RecordView`.
+
+    Rows are listed type by type in :data:`registry.RECORD_TYPES` order and
+    fetched one page at a time, so only the visible rows are read.
+
+    :param storage: The backend to read from.
+    :type storage: Storage
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    def __len__(self):
+        return sum(self.storage.count(record_type) for record_type in RECORD_TYPES)
+
+    def page(self, offset, limit):
+        """Returns up to ``limit`` rows starting at ``offset``."""
+        rows = []
+        for record_type in RECORD_TYPES:
+            count = self.storage.count(record_type)
+            if offset >= count:
+                offset -= count
+                continue
+            rows.extend(self.storage.rows(record_type, offset, limit - len(rows)))
+            offset = 0
+            if len(rows) >= limit:
+                break
+        return rows
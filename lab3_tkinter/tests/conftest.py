@@ -0,0 +1,12 @@
+import os
+import sys
+
+# The modules live next to this directory and are imported by name.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def add_roster(service, first=0, count=3):
+    service.add_course(f"C{first}", f"Course {first}")
+    for i in range(first, first + count):
+        service.add_student(f"Student {i}", 20, f"s{i}@school.edu", f"S{i}")
+        service.register_student(f"S{i}", f"C{first}")
@@ -0,0 +1,90 @@
+import binary_snapshot
+from binary_snapshot import SnapshotStorage, generation_path
+from conftest import add_roster
+from service import SchoolService
+
+
+def snapshot_service(tmp_path):
+    path = str(tmp_path / "school.snap")
+    return SchoolService(SnapshotStorage(path)), path
+
+
+def save(service, path):
+    entries = service.snapshot()
+    service.save(entries, path)
+    service.saved(entries, path)
+
+
+def test_write_and_load_round_trip(tmp_path):
+    service = SchoolService()
+    add_roster(service)
+    service.add_instructor("Teacher", 40, "t@school.edu", "I1")
+    service.assign_instructor("I1", "C0")
+    path = str(tmp_path / "school.snap")
+
+    assert binary_snapshot.write(service.registry, path) == 5
+    assert binary_snapshot.load(path).to_dict() == service.registry.to_dict()
+
+
+def test_changes_overlay_the_snapshot(tmp_path):
+    service, path = snapshot_service(tmp_path)
+    add_roster(service)
+    save(service, path)
+    service.remove("Student", "S1")
+    add_roster(service, first=10, count=2)
+    service.register_student("S0", "C10")
+
+    expected = service.registry.to_dict()
+    assert SchoolService(service.storage.view()).registry.to_dict() == expected
+    save(service, path)
+    assert service.registry.to_dict() == expected
+    service.close()
+    assert SchoolService(SnapshotStorage(path)).registry.to_dict() == expected
+
+
+def test_clear_hides_the_snapshot(tmp_path):
+    service, path = snapshot_service(tmp_path)
+    add_roster(service)
+    save(service, path)
+    service.registry.clear()
+    service.add_course("C5", "Course 5")
+
+    assert [course.course_id for course in service.registry.records("Course")] == ["C5"]
+    assert service.registry.count("Student") == 0
+    assert service.storage.search_ids(["Student"], "S") == []
+
+
+def test_save_does_not_replace_the_mapped_file(tmp_path):
+    service, path = snapshot_service(tmp_path)
+    add_roster(service)
+    entries = service.snapshot()
+    service.save(entries, path)
+
+    assert entries.saved_path == generation_path(path, 1)
+    assert binary_snapshot.load(path).to_dict() == service.registry.to_dict()
+    service.saved(entries, path)
+    assert service.storage.snapshot.path == path
+    assert not (tmp_path / "school.1.snap").exists()
+
+
+def test_changes_after_the_view_keep_the_old_snapshot(tmp_path):
+    service, path = snapshot_service(tmp_path)
+    add_roster(service)
+    entries = service.snapshot()
+    service.save(entries, path)
+    service.add_course("C9", "Course 9")
+    service.saved(entries, path)
+
+    assert service.registry.get("Course", "C9").course_name == "Course 9"
+    assert service.storage.snapshot.count("Course") == 0
+
+
+def test_search_ids_limit_applies_per_type(tmp_path):
+    service, path = snapshot_service(tmp_path)
+    for i in range(3):
+        service.add_course(f"X{i}", f"Course {i}")
+        service.add_student(f"Student {i}", 20, f"s{i}@school.edu", f"X{i}S")
+    save(service, path)
+
+    hits = service.storage.search_ids(["Course", "Student"], "x", limit=2)
+    assert hits == [("Course", "X0"), ("Course", "X1"), ("Student", "X0S"), ("Student", "X1S")]
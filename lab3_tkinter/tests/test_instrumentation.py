@@ -0,0 +1,15 @@
+import time
+
+from instrumentation import Instrumentation
+
+
+def test_paused_time_is_left_out_of_the_latency():
+    instrumentation = Instrumentation(enabled=True)
+
+    def handler():
+        with instrumentation.paused():
+            time.sleep(0.05)
+
+    instrumentation.wrap("outer", instrumentation.wrap("inner", handler))()
+    assert instrumentation.latency["inner"].max < 0.01
+    assert instrumentation.latency["outer"].max < 0.01
@@ -0,0 +1,103 @@
+import pytest
+
+import persistence
+from conftest import add_roster
+from journal import Journal, recover, replay
+from registry import Registry
+from service import SchoolService
+
+
+def journaled_service(tmp_path):
+    data_path = str(tmp_path / "school.ndjson")
+    return SchoolService(journal=Journal(data_path)), data_path
+
+
+def test_recover_replays_journal_without_snapshot(tmp_path):
+    service, data_path = journaled_service(tmp_path)
+    add_roster(service)
+    service.remove("Student", "S1")
+    service.journal.close()
+
+    assert recover(data_path).to_dict() == service.registry.to_dict()
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    service, data_path = journaled_service(tmp_path)
+    add_roster(service)
+    service.journal.close()
+    with open(data_path + ".journal", "a", encoding="utf-8") as file:
+        file.write('{"op":"add","type":"Course","course_id":"C9","course_na')
+
+    assert recover(data_path).to_dict() == service.registry.to_dict()
+
+
+def test_corrupt_line_before_the_last_is_an_error(tmp_path):
+    path = tmp_path / "school.ndjson.journal"
+    path.write_text('{"op":"clear"}\nnot json\n{"op":"clear"}\n', encoding="utf-8")
+
+    with pytest.raises(ValueError, match=":2:"):
+        replay(Registry(), str(path))
+
+
+def test_crash_after_rotate_replays_both_journals(tmp_path):
+    service, data_path = journaled_service(tmp_path)
+    add_roster(service)
+    persistence.save(service.registry, data_path)
+    add_roster(service, first=10)
+    service.journal.rotate()
+    # Changes made while the snapshot would have been written.
+    add_roster(service, first=20)
+    service.remove("Course", "C10")
+    service.journal.close()
+
+    assert recover(data_path).to_dict() == service.registry.to_dict()
+
+
+def test_crash_after_save_before_finishing_compaction(tmp_path):
+    service, data_path = journaled_service(tmp_path)
+    add_roster(service)
+    service.journal.rotate()
+    persistence.save(service.registry, data_path)
+    service.remove("Student", "S0")
+    service.journal.close()
+
+    # The rotated journal is replayed again over the snapshot that includes it.
+    assert recover(data_path).to_dict() == service.registry.to_dict()
+
+
+def test_rotate_appends_to_an_unfinished_compaction(tmp_path):
+    service, data_path = journaled_service(tmp_path)
+    add_roster(service)
+    service.journal.rotate()
+    service.remove("Student", "S2")
+    service.add_student("Student 2", 21, "s2@school.edu", "S2")
+    service.journal.rotate()
+    service.journal.close()
+
+    assert recover(data_path).to_dict() == service.registry.to_dict()
+    assert recover(data_path).get("Student", "S2").age == 21
+
+
+def test_compact_folds_the_journal_into_the_snapshot(tmp_path):
+    service, data_path = journaled_service(tmp_path)
+    add_roster(service)
+    service.journal.compact(service.registry)
+
+    assert service.journal.entries == 0
+    assert not service.journal.compacting
+    assert persistence.load(data_path).to_dict() == service.registry.to_dict()
+    add_roster(service, first=10)
+    service.journal.close()
+    assert recover(data_path).to_dict() == service.registry.to_dict()
+
+
+def test_replace_is_journaled_in_full_unless_paused(tmp_path):
+    service, data_path = journaled_service(tmp_path)
+    add_roster(service)
+    loaded = Registry()
+    loaded.load_dict(service.registry.to_dict())
+    loaded.remove("Student", "S0")
+    service.registry.replace_with(loaded)
+    service.journal.close()
+
+    assert recover(data_path).to_dict() == service.registry.to_dict()
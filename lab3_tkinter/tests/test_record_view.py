@@ -0,0 +1,18 @@
+from record_view import ListRows
+from service import SchoolService
+
+
+def test_search_rows_track_positions_through_edits():
+    service = SchoolService()
+    for i in range(5):
+        service.add_student(f"Ann {i}", 20, f"s{i}@school.edu", f"S{i}")
+    source = ListRows.from_keys(service.search("Name", "ann"), service.row)
+
+    assert source.contains(("Student", "S3")) and source.position(("Student", "S3")) == 3
+    assert not source.contains(("Course", "S3"))
+    assert source.remove(("Student", "S1")) == 1
+    assert source.position(("Student", "S3")) == 2
+    source.append(("Student", "Ann 9", "S9"))
+    assert source.position(("Student", "S9")) == 4
+    assert [row[2] for row in source.page(0, 10)] == ["S0", "S2", "S3", "S4", "S9"]
+    assert source.remove(("Student", "S1")) is None
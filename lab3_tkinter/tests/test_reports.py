@@ -0,0 +1,70 @@
+import pytest
+
+import reports
+
+from binary_snapshot import SnapshotStorage
+from service import SchoolService
+from storage import SQLiteStorage
+
+
+def build(service):
+    for i in range(4):
+        service.add_course(f"C{i}", f"Course {i}")
+    for i in range(6):
+        service.add_student(f"Student {i}", 20 + i % 3, f"s{i}@school{i % 2}.edu", f"S{i}")
+        for course in range(i % 4):
+            service.register_student(f"S{i}", f"C{course}")
+    service.add_instructor("Teacher", 40, "t@school.edu", "I1")
+    service.assign_instructor("I1", "C0")
+
+
+def change(service):
+    service.remove("Course", "C1")
+    service.remove("Student", "S3")
+    service.register_student("S4", "C2")
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "snapshot"])
+def test_stats_from_storage_match_the_reports(backend, tmp_path):
+    memory = SchoolService()
+    if backend == "sqlite":
+        service = SchoolService(SQLiteStorage(str(tmp_path / "school.db")))
+    else:
+        path = str(tmp_path / "school.snap")
+        service = SchoolService(SnapshotStorage(path))
+    build(memory)
+    build(service)
+    if backend == "snapshot":
+        entries = service.snapshot()
+        service.save(entries, path)
+        service.saved(entries, path)
+
+    assert service.stats() == memory.stats()
+    change(memory)
+    change(service)
+    assert service.stats() == memory.stats()
+    service.close()
+
+
+def test_sorted_reports_follow_changes():
+    service = SchoolService()
+    build(service)
+    report = service.reports
+
+    first = report.enrollment_counts(2)
+    assert report.enrollment_counts(2) == first
+    assert report.enrollment_counts() == sorted(report.enrollment_counts(), key=lambda row: (-row[1], row[0]))
+    service.remove("Course", "C0")
+    assert "C0" not in [course_id for course_id, _, _ in report.enrollment_counts()]
+    assert report.instructor_load() == [("I1", 0)]
+
+
+def test_rebuild_without_numpy_gives_the_same_reports(monkeypatch):
+    service = SchoolService()
+    build(service)
+    service.reports.rebuild()
+    expected = service.report()
+
+    monkeypatch.setattr(reports, "numpy", None)
+    service.reports.rebuild()
+    assert service.report() == expected
@@ -0,0 +1,83 @@
+import time
+
+import pytest
+
+import bulk_io
+from client import RemoteService, SchoolClient
+from server import ConflictError, serve_in_thread
+from service import SchoolService
+
+
+@pytest.fixture
+def address():
+    server, address, thread = serve_in_thread(SchoolService(), port=0)
+    yield address
+    server.stop()
+    thread.join(5)
+
+
+def connect(address):
+    service = RemoteService(SchoolClient(*address))
+    service.load()
+    return service
+
+
+def wait_for(condition, service):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for the server"
+        service.sync()
+        time.sleep(0.01)
+
+
+def test_changes_are_pushed_to_other_clients(address):
+    alice, bob = connect(address), connect(address)
+    alice.add_course("C1", "Algebra")
+    alice.add_student("Ann", 20, "ann@school.edu", "S1")
+    alice.register_student("S1", "C1")
+
+    wait_for(lambda: bob.registry.members("C1") == ["S1"], bob)
+    assert bob.registry.to_dict() == alice.registry.to_dict()
+    alice.close()
+    bob.close()
+
+
+def test_change_to_an_outdated_record_is_a_conflict(address):
+    alice, bob = connect(address), connect(address)
+    alice.add_course("C1", "Algebra")
+    alice.add_student("Ann", 20, "ann@school.edu", "S1")
+    wait_for(lambda: bob.registry.get("Student", "S1") is not None, bob)
+    # Bob removes the student before syncing the registration.
+    alice.register_student("S1", "C1")
+
+    with pytest.raises(ConflictError):
+        bob.remove("Student", "S1")
+    assert list(bob.registry.get("Student", "S1").course_ids) == ["C1"]
+    bob.remove("Student", "S1")
+    wait_for(lambda: alice.registry.get("Student", "S1") is None, alice)
+    alice.close()
+    bob.close()
+
+
+def test_lost_connection_is_reported():
+    server, address, thread = serve_in_thread(SchoolService(), port=0)
+    alice = connect(address)
+    server.stop()
+    thread.join(5)
+
+    with pytest.raises(ConnectionError):
+        wait_for(lambda: False, alice)
+    with pytest.raises(ConnectionError):
+        alice.add_course("C1", "Algebra")
+    alice.close()
+
+
+def test_export_writes_the_mirror(address, tmp_path):
+    alice = connect(address)
+    alice.add_course("C1", "Algebra")
+    alice.add_student("Ann", 20, "ann@school.edu", "S1")
+    path = str(tmp_path / "roster.csv")
+
+    assert alice.export_file(path, entries=alice.snapshot()) == 2
+    assert bulk_io.validate(path).errors == []
+    alice.close()
@@ -0,0 +1,45 @@
+from service import SchoolService
+
+
+def enrolled_service():
+    service = SchoolService()
+    for course_id in ("C1", "C2"):
+        service.add_course(course_id, f"Course {course_id}")
+    service.add_student("Ann", 20, "ann@school.edu", "S1")
+    for course_id in ("C1", "C2"):
+        service.register_student("S1", course_id)
+    return service
+
+
+def test_edit_keeps_the_links_of_the_same_record():
+    service = enrolled_service()
+    service.edit("Student", "S1")
+    service.add_student("Ann Smith", 21, "ann@school.edu", "S1")
+
+    assert sorted(service.registry.get("Student", "S1").course_ids) == ["C1", "C2"]
+    service.edit("Course", "C1")
+    service.add_course("C1", "Algebra")
+    assert service.registry.members("C1") == ["S1"]
+
+
+def test_edit_followed_by_an_unrelated_add_drops_the_links():
+    service = enrolled_service()
+    service.edit("Student", "S1")
+    service.add_student("Bob", 22, "bob@school.edu", "S9")
+    service.add_student("Ann", 20, "ann@school.edu", "S1")
+
+    assert list(service.registry.get("Student", "S9").course_ids) == []
+    assert list(service.registry.get("Student", "S1").course_ids) == []
+    service.edit("Course", "C1")
+    service.add_course("C7", "Geometry")
+    assert service.registry.members("C7") == []
+
+
+def test_replacing_the_data_cancels_the_edit():
+    service = enrolled_service()
+    service.edit("Student", "S1")
+    service.replace(SchoolService().registry)
+    service.add_course("C1", "Course C1")
+    service.add_student("Ann", 20, "ann@school.edu", "S1")
+
+    assert list(service.registry.get("Student", "S1").course_ids) == []
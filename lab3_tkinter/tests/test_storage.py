@@ -0,0 +1,54 @@
+import pytest
+
+from binary_snapshot import SnapshotStorage
+from models import Course
+from service import SchoolService
+from storage import SQLiteStorage
+
+
+def test_sqlite_name_search_matches_the_memory_index(tmp_path):
+    memory = SchoolService()
+    service = SchoolService(SQLiteStorage(str(tmp_path / "school.db")))
+    for target in (memory, service):
+        for i, name in enumerate(["Ada", "Adam Lovelace", "Brother Ada", "Novel Writing", "Lovelace"]):
+            target.add_course(f"C{i}", name)
+            target.add_student(name, 20, f"s{i}@school.edu", f"S{i}")
+
+    for query in ["ada", "ovel", "ther ad", "zzz"]:
+        assert service.search("Name", query) == list(memory.search("Name", query))
+        assert service.search("Course", query, 2) == list(memory.search("Course", query, 2))
+    service.close()
+
+
+def test_sqlite_accepts_ids_that_are_not_strings(tmp_path):
+    service = SchoolService(SQLiteStorage(str(tmp_path / "school.db")))
+    service.registry.add_course(Course(7, "Algebra"))
+
+    assert service.search("Course", "alg") == [("Course", "7")]
+    service.remove("Course", "7")
+    assert service.search("Course", "alg") == []
+    service.close()
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite", "snapshot"])
+def test_short_queries_match_inside_names_and_ids(backend, tmp_path):
+    if backend == "memory":
+        service = SchoolService()
+    elif backend == "sqlite":
+        service = SchoolService(SQLiteStorage(str(tmp_path / "school.db")))
+    else:
+        path = str(tmp_path / "school.snap")
+        service = SchoolService(SnapshotStorage(path))
+    for record_id, name in [("AB1", "Bob"), ("OB2", "Obi"), ("XOB", "Rob Obst"), ("Z9", "Ann")]:
+        service.add_student(name, 20, f"{record_id}@school.edu", record_id)
+    if backend == "snapshot":
+        entries = service.snapshot()
+        service.save(entries, path)
+        service.saved(entries, path)
+    service.add_student("Job", 20, "job@school.edu", "OBX")
+
+    assert [record_id for _, record_id in service.search("Name", "ob")] == ["OB2", "AB1", "OBX", "XOB"]
+    assert list(service.search("Name", "ob", 2)) == [("Student", "OB2"), ("Student", "AB1")]
+    assert [record_id for _, record_id in service.search("ID", "ob")] == ["OB2", "OBX", "XOB"]
+    assert service.search("ID", "b", 1) == [("Student", "AB1")]
+    service.close()
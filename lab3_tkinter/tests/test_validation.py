@@ -0,0 +1,103 @@
+import sqlite3
+
+import pytest
+
+import bulk_io
+import persistence
+import validation
+from binary_snapshot import SnapshotStorage
+from service import SchoolService
+from storage import SQLiteStorage
+
+
+@pytest.fixture(params=["memory", "sqlite", "snapshot"])
+def service(request, tmp_path):
+    if request.param == "memory":
+        service = SchoolService()
+    elif request.param == "sqlite":
+        service = SchoolService(SQLiteStorage(str(tmp_path / "school.db")))
+    else:
+        service = SchoolService(SnapshotStorage(str(tmp_path / "school.snap")))
+    yield service
+    service.close()
+
+
+def test_repeated_email_is_rejected(service):
+    service.add_student("Ann", 20, "Ann@School.edu", "S1")
+
+    with pytest.raises(ValueError, match="already used by Student S1"):
+        service.add_student("Bob", 21, " ann@school.edu", "S2")
+    service.add_instructor("Ann", 40, "ann@school.edu", "I1")
+
+
+def test_removed_email_can_be_reused(service):
+    service.add_student("Ann", 20, "ann@school.edu", "S1")
+    service.remove("Student", "S1")
+
+    service.add_student("Bob", 21, "ann@school.edu", "S2")
+
+
+def test_snapshot_email_index_survives_save(tmp_path):
+    path = str(tmp_path / "school.snap")
+    service = SchoolService(SnapshotStorage(path))
+    service.add_student("Ann", 20, "ann@school.edu", "S1")
+    entries = service.snapshot()
+    service.save(entries, path)
+    service.saved(entries, path)
+
+    assert service.storage.find_by_email("Student", "ANN@school.edu") == "S1"
+    assert service.storage.find_by_email("Instructor", "ann@school.edu") is None
+
+
+def test_sqlite_email_column_is_added_to_old_databases(tmp_path):
+    path = str(tmp_path / "school.db")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE people (kind TEXT NOT NULL, id TEXT NOT NULL, id_key TEXT NOT NULL, "
+               "name TEXT NOT NULL, name_key TEXT NOT NULL, age INTEGER, email TEXT, PRIMARY KEY (kind, id))")
+    db.execute("INSERT INTO people VALUES ('Student', 'S1', 's1', 'Ann', 'ann', 20, ' Ann@School.edu')")
+    db.commit()
+    db.close()
+
+    storage = SQLiteStorage(path)
+    assert storage.find_by_email("Student", "ann@school.edu") == "S1"
+    storage.close()
+
+
+def test_command_line_import_is_validated(tmp_path, capsys):
+    data_path = str(tmp_path / "school.ndjson")
+    service = SchoolService()
+    service.add_student("Ann", 20, "ann@school.edu", "S1")
+    service.save(path=data_path)
+    roster = tmp_path / "roster.csv"
+    roster.write_text("type,id,name,age,email,courses\n"
+                      "Student,S2,Bob,21,ANN@school.edu,\n"
+                      "Student,S3,Cid,22,not an email,\n"
+                      "Student,S4,Dee,23,dee@school.edu,\n", encoding="utf-8")
+
+    assert bulk_io.main(["import", str(roster), "--data", data_path]) == 1
+    assert [record.record_id for record in persistence.load(data_path).records("Student")] == ["S1", "S4"]
+    assert "already used" in capsys.readouterr().err
+
+
+def test_repeated_ids_in_a_data_file_are_reported(tmp_path):
+    path = tmp_path / "school.ndjson"
+    path.write_text('{"type":"Course","course_id":"C1","course_name":"Algebra"}\n'
+                    '{"type":"Course","course_id":"C1","course_name":"Geometry"}\n', encoding="utf-8")
+    service = SchoolService()
+
+    loaded = service.read(str(path))
+    report = service.validate(loaded)
+    assert loaded.get("Course", "C1").course_name == "Algebra"
+    assert report.errors == [("Course C1", "Course ID C1 is used by more than one record; only the first was loaded.")]
+    assert report.checked == 2
+
+
+def test_large_batches_are_validated_in_worker_processes(monkeypatch):
+    monkeypatch.setattr(validation, "PARALLEL_THRESHOLD", 10)
+    monkeypatch.setattr(validation, "CHUNK_SIZE", 4)
+    rows = [(i, "Student", f"S{i}", f"Student {i}", f"s{i}@school.edu" if i % 3 else f"bad{i}") for i in range(20)]
+
+    parallel = validation.validate_rows(rows, workers=2)
+    serial = validation.validate_rows(rows, workers=1)
+    assert parallel.errors == serial.errors
+    assert len(parallel.errors) == 7
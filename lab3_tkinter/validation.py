@@ -0,0 +1,318 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from registry import RECORD_TYPES
+
+#: Pattern a whole email address must match: a local part, one ``@`` and a
+#: dotted domain, without whitespace.
+EMAIL_PATTERN = re.compile(r"[^@\s]+@[^@\s.]+(\.[^@\s.]+)+")
+
+#: Batches smaller than this are validated in this process: starting worker
+#: processes would cost more than the checks themselves.
+PARALLEL_THRESHOLD = 50000
+
+#: Number of records sent to a worker process at a time.
+CHUNK_SIZE = 10000
+
+PEOPLE_TYPES = ("Student", "Instructor")
+
+
+class ValidationReport:
+    """
+    Conflicts found while validating a batch of records.
+
+    Each conflict is a ``(key, message)`` pair, where ``key`` is whatever
+    identified the record to :func:`validate_rows`, e.g. its line number.
+
+    :ivar errors: Conflicts that make a record invalid.
+    :ivar warnings: Suspicious but valid records, such as repeated names.
+    :ivar checked: Number of records checked.
+    """
+
+    def __init__(self):
+        self.errors = []
+        self.warnings = []
+        self.checked = 0
+
+    @property
+    def rejected(self):
+        """Keys of the records with at least one error."""
+        return {key for key, _ in self.errors}
+
+    def summary(self):
+        """
+        Returns a one-line human-readable summary.
+
+        :rtype: str
+        """
+        return f"{self.checked} records checked, {len(self.errors)} error(s), {len(self.warnings)} warning(s)"
+
+
+def email_key(email):
+    """
+    Returns the form under which emails are compared: trimmed and lowercase.
+
+    :type email: str
+    :rtype: str
+    """
+    return str(email).strip().lower()
+
+
+def check_fields(record_type, record_id, email):
+    """
+    Checks the fields of a record that do not depend on other records.
+
+    :param record_type: One of ``"Student"``, ``"Instructor"`` or ``"Course"``.
+    :type record_type: str
+    :type record_id: str
+    :param email: The email, ignored for courses.
+    :type email: str
+    :return: Error messages, empty if the fields are valid.
+    :rtype: list[str]
+    """
+    errors = []
+    if not str(record_id).strip():
+        errors.append(f"{record_type} ID is missing.")
+    if record_type in PEOPLE_TYPES:
+        email = str(email).strip()
+        if not email:
+            errors.append("Email is missing.")
+        elif not EMAIL_PATTERN.fullmatch(email):
+            errors.append(f"{email!r} is not a valid email address.")
+    return errors
+
+
+def _check_chunk(rows):
+    return [(key, message)
+            for key, record_type, record_id, _, email in rows
+            for message in check_fields(record_type, record_id, email)]
+
+
+def _describe(key):
+    return f"line {key}" if isinstance(key, int) else str(key)
+
+
+def _record_row(key, record_type, record):
+    email = record.email if record_type in PEOPLE_TYPES else None
+    return key, record_type, str(record.record_id), record.display_name, email
+
+
+def validate_rows(rows, workers=None):
+    """
+    Validates a batch of records against each other.
+
+    Every record is checked with :func:`check_fields`; IDs and emails
+    repeated within the batch are errors and repeated names warnings. Field
+    checks of batches of at least :data:`PARALLEL_THRESHOLD` records run in
+    a process pool, in chunks of :data:`CHUNK_SIZE`, when more than one
+    CPU is available; duplicates are found
+    with one dictionary lookup per record. The first record with a given
+    ID or email is accepted, later ones are reported.
+
+    :param rows: ``(key, record_type, record_id, name, email)`` tuples.
+    :type rows: list[tuple]
+    :param workers: Maximum number of worker processes; defaults to the
+        number of CPUs. 1 disables the pool.
+    :type workers: int
+    :rtype: ValidationReport
+    """
+    report = ValidationReport()
+    report.checked = len(rows)
+    if len(rows) >= PARALLEL_THRESHOLD and (workers or os.cpu_count() or 1) > 1:
+        chunks = [rows[i:i + CHUNK_SIZE] for i in range(0, len(rows), CHUNK_SIZE)]
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for errors in pool.map(_check_chunk, chunks):
+                    report.errors.extend(errors)
+        except (OSError, NotImplementedError, BrokenProcessPool):
+            # No usable process support on this platform, e.g. no semaphores.
+            report.errors = _check_chunk(rows)
+    else:
+        report.errors = _check_chunk(rows)
+
+    ids = {record_type: {} for record_type in RECORD_TYPES}
+    emails = {record_type: {} for record_type in PEOPLE_TYPES}
+    names = {record_type: {} for record_type in RECORD_TYPES}
+    for key, record_type, record_id, name, email in rows:
+        first = ids[record_type].setdefault(record_id, key)
+        if first != key:
+            report.errors.append((key, f"{record_type} ID {record_id} is already used by {_describe(first)}."))
+        if record_type in PEOPLE_TYPES and str(email).strip():
+            first = emails[record_type].setdefault(email_key(email), key)
+            if first != key:
+                report.errors.append((key, f"Email {str(email).strip()} is already used by {_describe(first)}."))
+        first = names[record_type].setdefault(name, key)
+        if first != key:
+            report.warnings.append((key, f"{record_type} name {name!r} is also used by {_describe(first)}."))
+    return report
+
+
+def validate_registry(registry, workers=None):
+    """
+    Validates every record of a registry, e.g. one just loaded from a file.
+
+    Records are identified by ``"<record_type> <record_id>"`` keys in the
+    report. Records left out of the registry because their ID was repeated,
+    see :meth:`registry.Registry.load_record`, are reported as errors. Safe
+    to call from a worker thread on a registry no other thread changes.
+
+    :type registry: registry.Registry
+    :param workers: See :func:`validate_rows`.
+    :type workers: int
+    :rtype: ValidationReport
+    """
+    rows = [_record_row(f"{record_type} {record.record_id}", record_type, record)
+            for record_type in RECORD_TYPES
+            for record in registry.records(record_type)]
+    report = validate_rows(rows, workers)
+    for record_type, record in registry.duplicates:
+        record_id = record.record_id
+        report.errors.append((f"{record_type} {record_id}",
+                              f"{record_type} ID {record_id} is used by more than one record; "
+                              f"only the first was loaded."))
+    report.checked += len(registry.duplicates)
+    return report
+
+
+def validate_import(result, workers=None):
+    """
+    Validates the rows of a roster accepted by :func:`bulk_io.validate`.
+
+    Rows with errors are moved from ``result.records`` to ``result.errors``
+    and warnings are added to ``result.warnings``, keyed by line number.
+
+    :type result: bulk_io.ImportResult
+    :param workers: See :func:`validate_rows`.
+    :type workers: int
+    :return: The same result.
+    :rtype: bulk_io.ImportResult
+    """
+    report = validate_rows([_record_row(line, record_type, record)
+                            for line, record_type, record in result.records], workers)
+    rejected = report.rejected
+    result.records = [entry for entry in result.records if entry[0] not in rejected]
+    result.errors.extend(report.errors)
+    result.errors.sort()
+    result.warnings.extend(warning for warning in report.warnings if warning[0] not in rejected)
+    return result
+
+
+class Validator:
+    """
+    Checks new records against the records of a registry.
+
+    IDs are looked up with :meth:`registry.Registry.get` and names with
+    :meth:`registry.Registry.find_by_name`, which are indexed. Emails are
+    looked up in the storage backend of the registry, see
+    :meth:`storage.Storage.find_by_email`. Without one, they are indexed
+    here: the index is built from the registry on the first check, then kept
+    up to date as a registry listener. Each check therefore costs a few
+    indexed lookups, whatever the roster size.
+
+    :param registry: The registry holding the existing records.
+    :type registry: registry.Registry
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        self._emails = None
+        registry.add_listener(self.on_change)
+
+    def _email_index(self):
+        if self._emails is None:
+            self._emails = {record_type: {} for record_type in PEOPLE_TYPES}
+            for record_type in PEOPLE_TYPES:
+                for record in self.registry.records(record_type):
+                    self._index(record_type, record)
+        return self._emails
+
+    def _index(self, record_type, record):
+        key = email_key(record.email)
+        if key:
+            self._emails[record_type].setdefault(key, {})[str(record.record_id)] = None
+
+    def _email_owner(self, record_type, email):
+        storage = self.registry.storage
+        if storage is not None:
+            return storage.find_by_email(record_type, email)
+        owners = self._email_index()[record_type].get(email_key(email))
+        return next(iter(owners)) if owners else None
+
+    def on_change(self, event, record_type, record):
+        """Registry listener; see :meth:`registry.Registry.add_listener`."""
+        if self._emails is None:
+            return
+        if event == "add" and record_type in PEOPLE_TYPES:
+            self._index(record_type, record)
+        elif event == "remove" and record_type in PEOPLE_TYPES:
+            owners = self._emails[record_type].get(email_key(record.email))
+            if owners is not None:
+                owners.pop(str(record.record_id), None)
+                if not owners:
+                    del self._emails[record_type][email_key(record.email)]
+        elif event in ("clear", "reset"):
+            self._emails = None
+
+    def check(self, record_type, record, check_id=True):
+        """
+        Checks a record that is about to be added.
+
+        :param record_type: One of ``"Student"``, ``"Instructor"`` or ``"Course"``.
+        :type record_type: str
+        :param check_id: Whether to report an ID already in the registry.
+        :type check_id: bool
+        :return: ``(errors, warnings)`` lists of messages.
+        :rtype: tuple
+        """
+        record_id = str(record.record_id)
+        email = record.email if record_type in PEOPLE_TYPES else None
+        errors = check_fields(record_type, record_id, email)
+        if check_id and self.registry.get(record_type, record_id) is not None:
+            errors.append(f"{record_type} ID {record_id} already exists.")
+        if email is not None and email_key(email):
+            owner = self._email_owner(record_type, email)
+            if owner is not None:
+                errors.append(f"Email {email.strip()} is already used by {record_type} {owner}.")
+        warnings = []
+        other = self.registry.find_by_name(record_type, record.display_name)
+        if other is not None:
+            warnings.append(f"{record_type} {other.record_id} is also named {record.display_name}.")
+        return errors, warnings
+
+    def require(self, record_type, record):
+        """
+        Checks a record that is about to be added and rejects it if invalid.
+
+        :return: Warning messages.
+        :rtype: list[str]
+        :raises ValueError: If the record has errors, with every error message.
+        """
+        errors, warnings = self.check(record_type, record)
+        if errors:
+            raise ValueError(" ".join(errors))
+        return warnings
+
+    def filter_import(self, result):
+        """
+        Checks the records of a validated roster against the registry.
+
+        Records conflicting with existing ones are moved to ``result.errors``;
+        warnings go to ``result.warnings``. IDs already in the registry are
+        left to :func:`bulk_io.commit`, which reports them.
+
+        :type result: bulk_io.ImportResult
+        :return: The same result.
+        :rtype: bulk_io.ImportResult
+        """
+        kept = []
+        for line, record_type, record in result.records:
+            errors, warnings = self.check(record_type, record, check_id=False)
+            result.errors.extend((line, error) for error in errors)
+            if not errors:
+                result.warnings.extend((line, warning) for warning in warnings)
+                kept.append((line, record_type, record))
+        result.records = kept
+        result.errors.sort()
+        return result